@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""在总览图和牙齿裁剪图上绘制检测框与标签
+
+result 中每个疾病的 bbox 位于检测时的原图坐标系。本模块把图片解码并缩放到报告中的显示尺寸
+（总览图宽1120像素、牙齿图320像素，约为显示宽度的2倍），再把一张图上的全部检测框和标签
+画到同一张覆盖层上，最后与图片做一次NumPy混合后编码，不逐像素循环。牙齿图片中的框先换算到
+该牙 square_bbox 的坐标系。
+
+输出按 (图片内容哈希, 检测框哈希) 缓存在内存中，可选写入磁盘目录，图片和检测结果都未变化时
+直接复用。框的颜色按疾病区分，默认标签只写置信度；提供支持中文的字体（--font）时同时写出
+疾病名称。需要 NumPy 和 Pillow（pip install numpy Pillow）。
+
+用法示例：
+    python annotate.py ../result.json -o annotated --source-width 3730
+    python annotate.py ../result.json -o annotated --font /usr/share/fonts/NotoSansCJK-Regular.ttc
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，仅绘制检测框时需要
+    np = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow为可选依赖，仅绘制检测框时需要
+    Image = ImageDraw = ImageFont = None
+
+from crop_engine import CROP_DISPLAY_SIZE, CROP_FORMATS
+from image_derivatives import file_sha256
+from report_renderer import DISEASE_SHORT_NAMES, resolve_image_path
+
+# 绘制规则版本，修改颜色、线宽等绘制方式后递增，使缓存失效
+ANNOTATION_VERSION = 1
+
+# 总览图输出宽度（像素）；报告中总览图最宽显示560像素
+OVERVIEW_DISPLAY_WIDTH = 1120
+
+# 疾病标签 -> 框的颜色（RGB）
+LABEL_COLORS = {
+    'tooth abrasion': (255, 143, 0),
+    'general_caries': (229, 57, 53),
+    'twisted tooth': (30, 136, 229),
+}
+DEFAULT_LABEL_COLOR = (142, 36, 170)
+
+# 框内填充的不透明度
+FILL_ALPHA = 0.15
+
+# 标签文字颜色
+TEXT_COLOR = (255, 255, 255)
+
+# 框的颜色
+def label_color(label):
+    return LABEL_COLORS.get(label, DEFAULT_LABEL_COLOR)
+
+# 按图片尺寸选择线宽和字号
+def _line_width(width, height):
+    return max(2, round(min(width, height) / 200))
+
+def _font_size(width):
+    return max(11, round(width / 80))
+
+class DetectionAnnotator:
+    """绘制检测框并缓存结果，线程安全，可在多份报告间共享
+
+    cache_dir 不为None时，输出同时写入该目录（<图片哈希>-<检测框哈希><扩展名>），进程重启后依然有效。
+    """
+
+    def __init__(self, cache_dir=None, overview_width=OVERVIEW_DISPLAY_WIDTH, crop_size=CROP_DISPLAY_SIZE,
+                 fmt='webp', font_path=None):
+        if np is None or Image is None:
+            raise RuntimeError('绘制检测框需要安装 NumPy 和 Pillow：pip install numpy Pillow')
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.overview_width = overview_width
+        self.crop_size = crop_size
+        self.fmt = fmt
+        self.font_path = font_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._encoded = {}
+        # (绝对路径, mtime_ns, 大小) -> sha256，同一文件不重复计算哈希
+        self._hashes = {}
+        self._fonts = {}
+        self._text_masks = {}
+        self._lock = threading.Lock()
+
+    # 编码格式对应的MIME类型和扩展名
+    @property
+    def mime_type(self):
+        return CROP_FORMATS[self.fmt][1]
+
+    @property
+    def extension(self):
+        return CROP_FORMATS[self.fmt][2]
+
+    # 为一份result创建
+    def for_result(self, result_data, assets_root, source_width=None, cropper=None):
+        """返回该报告的 ReportAnnotations；result带 image_width 字段时以其作为原图宽度"""
+        return ReportAnnotations(self, result_data, assets_root, source_width or result_data.get('image_width'),
+                                 cropper)
+
+    # 文件内容哈希
+    def image_hash(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = file_sha256(path)
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    # 标签文字
+    def label_text(self, label, confidence):
+        """有中文字体时为 '磨损 97%'，否则只写置信度；没有置信度时不写百分比"""
+        percent = '' if confidence is None else f'{confidence:.0%}'
+        if self.font_path:
+            return f'{DISEASE_SHORT_NAMES.get(label, label)} {percent}'.rstrip()
+        return percent
+
+    # 标签字体
+    def _font(self, size):
+        with self._lock:
+            font = self._fonts.get(size)
+        if font is None:
+            if self.font_path:
+                font = ImageFont.truetype(self.font_path, size)
+            else:
+                font = ImageFont.load_default(size)
+            with self._lock:
+                self._fonts[size] = font
+        return font
+
+    # 标签文字的不透明度掩码
+    def text_mask(self, text, size):
+        """返回文字的 (高, 宽) float32 掩码（0~1），同一文字和字号只栅格化一次"""
+        key = (text, size)
+        with self._lock:
+            mask = self._text_masks.get(key)
+        if mask is None:
+            font = self._font(size)
+            left, top, right, bottom = font.getbbox(text)
+            image = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+            ImageDraw.Draw(image).text((-left, -top), text, fill=255, font=font)
+            mask = np.asarray(image, dtype=np.float32) / 255.0
+            with self._lock:
+                self._text_masks[key] = mask
+        return mask
+
+    # 在图片上绘制全部检测框
+    def draw(self, pixels, detections):
+        """在 (高, 宽, 3) 的uint8数组上原地绘制 [(标签, 置信度, [x1, y1, x2, y2])]，返回该数组
+
+        全部框的填充、边框和标签先写入同一张覆盖层（颜色与不透明度），再与图片做一次混合。
+        """
+        height, width = pixels.shape[:2]
+        overlay = np.zeros((height, width, 3), dtype=np.float32)
+        alpha = np.zeros((height, width), dtype=np.float32)
+        line = _line_width(width, height)
+        font_size = _font_size(width)
+        pad = max(1, font_size // 5)
+
+        boxes = np.array([box for _, _, box in detections], dtype=np.float64).reshape(-1, 4)
+        boxes[:, 0::2] = np.clip(boxes[:, 0::2], 0, width)
+        boxes[:, 1::2] = np.clip(boxes[:, 1::2], 0, height)
+        boxes = np.rint(boxes).astype(np.int64)
+
+        # 填充与边框
+        for (label, _, _), (x1, y1, x2, y2) in zip(detections, boxes):
+            if x2 - x1 < 1 or y2 - y1 < 1:
+                continue
+            color = label_color(label)
+            overlay[y1:y2, x1:x2] = color
+            np.maximum(alpha[y1:y2, x1:x2], FILL_ALPHA, out=alpha[y1:y2, x1:x2])
+            for region in ((slice(y1, min(y1 + line, y2)), slice(x1, x2)),
+                           (slice(max(y2 - line, y1), y2), slice(x1, x2)),
+                           (slice(y1, y2), slice(x1, min(x1 + line, x2))),
+                           (slice(y1, y2), slice(max(x2 - line, x1), x2))):
+                overlay[region] = color
+                alpha[region] = 1.0
+
+        # 标签：框左上角外侧（空间不够时放在框内），后画的框不遮住先画的标签
+        for (label, confidence, _), (x1, y1, x2, y2) in zip(detections, boxes):
+            if x2 - x1 < 1 or y2 - y1 < 1:
+                continue
+            caption = self.label_text(label, confidence)
+            if not caption:
+                continue
+            mask = self.text_mask(caption, font_size)
+            tag_h = min(mask.shape[0] + 2 * pad, height)
+            tag_w = min(mask.shape[1] + 2 * pad, width)
+            tx = min(x1, width - tag_w)
+            ty = y1 - tag_h if y1 - tag_h >= 0 else y1
+            ty = min(ty, height - tag_h)
+            tag_color = np.array(label_color(label), dtype=np.float32)
+            tag = np.broadcast_to(tag_color, (tag_h, tag_w, 3)).copy()
+            text = mask[:tag_h - pad, :tag_w - pad]
+            text_region = tag[pad:pad + text.shape[0], pad:pad + text.shape[1]]
+            text_region += (np.array(TEXT_COLOR, dtype=np.float32) - tag_color) * text[..., None]
+            overlay[ty:ty + tag_h, tx:tx + tag_w] = tag
+            alpha[ty:ty + tag_h, tx:tx + tag_w] = 1.0
+
+        a = alpha[..., None]
+        blended = pixels.astype(np.float32) * (1.0 - a) + overlay * a
+        np.copyto(pixels, np.clip(np.rint(blended), 0, 255).astype(np.uint8))
+        return pixels
+
+    # 绘制并编码
+    def _encode(self, image, detections):
+        pixels = np.array(image.convert('RGB'), dtype=np.uint8)
+        if detections:
+            self.draw(pixels, detections)
+        pil_format, _, _, options = CROP_FORMATS[self.fmt]
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, pil_format, **options)
+        return buffer.getvalue()
+
+    # 按 (图片哈希, 检测框哈希) 取缓存，未命中时调用 render() 得到显示尺寸的图片并绘制
+    def annotated(self, image_key, detections, output_size, render):
+        """返回编码后的字节；detections 为已换算到输出尺寸的框"""
+        spec = json.dumps([ANNOTATION_VERSION, self.fmt, self.font_path, list(output_size),
+                           [[label, None if conf is None else round(conf, 4), [round(v, 1) for v in box]] for label, conf, box in detections]],
+                          ensure_ascii=False)
+        name = (f"{hashlib.sha256(image_key.encode('utf-8')).hexdigest()[:16]}-"
+                f"{hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]}{self.extension}")
+        with self._lock:
+            data = self._encoded.get(name)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        disk_path = self.cache_dir / name if self.cache_dir is not None else None
+        if disk_path is not None and disk_path.exists():
+            data = disk_path.read_bytes()
+            self.disk_hits += 1
+        else:
+            data = self._encode(render(), detections)
+            self.misses += 1
+            if disk_path is not None:
+                tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, disk_path)
+        with self._lock:
+            self._encoded[name] = data
+        return data
+
+# 取出疾病框
+def _disease_boxes(diseases):
+    """返回 [(标签, 置信度, [x1, y1, x2, y2])]，跳过没有bbox的疾病；置信度为 null 时保留 None"""
+    return [(d.get('label', ''), None if d.get('confidence') is None else float(d['confidence']),
+             [float(v) for v in d['bbox']])
+            for d in diseases if d.get('bbox') and len(d['bbox']) == 4]
+
+# 换算坐标
+def remap_boxes(detections, origin, scale_x, scale_y):
+    """把框平移到 origin 为原点的坐标系后缩放"""
+    ox, oy = origin
+    return [(label, conf, [(box[0] - ox) * scale_x, (box[1] - oy) * scale_y,
+                           (box[2] - ox) * scale_x, (box[3] - oy) * scale_y])
+            for label, conf, box in detections]
+
+class ReportAnnotations:
+    """一份报告的带框图片：总览图和各牙齿图片"""
+
+    def __init__(self, annotator, result_data, assets_root, source_width=None, cropper=None):
+        self.annotator = annotator
+        self.assets_root = Path(assets_root)
+        self.source_width = source_width
+        self.cropper = cropper
+        self.diseased_teeth = result_data.get('diseased_teeth', [])
+        overview_rel = result_data.get('overview_image_path') or result_data.get('image') or '原始照片_overview.png'
+        self.overview_path = resolve_image_path(self.assets_root, overview_rel)
+
+    @property
+    def mime_type(self):
+        return self.annotator.mime_type
+
+    @property
+    def extension(self):
+        return self.annotator.extension
+
+    # 图例
+    def legend(self):
+        """返回报告中出现的 [(疾病简称, '#rrggbb')]"""
+        labels = dict.fromkeys(label for tooth in self.diseased_teeth
+                               for label, _, _ in _disease_boxes(tooth.get('diseases', [])))
+        return [(DISEASE_SHORT_NAMES.get(label, label), '#%02x%02x%02x' % label_color(label)) for label in labels]
+
+    # 带框的总览图
+    def overview(self):
+        """返回绘制了全部疾病框的总览图（缩放到显示宽度），总览图不存在时返回None"""
+        image_hash = self.annotator.image_hash(self.overview_path)
+        if image_hash is None:
+            return None
+        with Image.open(self.overview_path) as image:
+            source_size = image.size
+        width = min(self.annotator.overview_width, source_size[0])
+        height = max(1, round(source_size[1] * width / source_size[0]))
+        scale = width / (self.source_width or source_size[0])
+        detections = remap_boxes([box for tooth in self.diseased_teeth
+                                  for box in _disease_boxes(tooth.get('diseases', []))], (0, 0), scale, scale)
+
+        def render():
+            with Image.open(self.overview_path) as image:
+                image.draft('RGB', (width, height))
+                return image.convert('RGB').resize((width, height), Image.LANCZOS)
+
+        return self.annotator.annotated(image_hash, detections, (width, height), render)
+
+    # 带框的牙齿图片
+    def tooth(self, record):
+        """返回绘制了该牙疾病框的牙齿图片（record 为 report_model.ToothRecord），无法生成时返回None
+
+        框按 square_bbox 换算到牙齿图片坐标系；有裁剪引擎时图片从总览图裁剪，否则读取 square_crop_path。
+        """
+        if not record.square_bbox:
+            return None
+        sx1, sy1, sx2, sy2 = (float(v) for v in record.square_bbox)
+        if sx2 <= sx1 or sy2 <= sy1:
+            return None
+
+        if self.cropper is not None:
+            size = self.cropper.size
+            overview_hash = self.annotator.image_hash(self.overview_path)
+            if overview_hash is None:
+                return None
+            image_key = f'{overview_hash}:{self.cropper.scale}:{list(record.square_bbox)}'
+            render = lambda: self.cropper.crop(record.square_bbox)
+        else:
+            if not record.square_crop_path:
+                return None
+            image_path = resolve_image_path(self.assets_root, record.square_crop_path)
+            image_key = self.annotator.image_hash(image_path)
+            if image_key is None:
+                return None
+            size = self.annotator.crop_size
+
+            def render():
+                with Image.open(image_path) as image:
+                    image.draft('RGB', (size, size))
+                    return image.convert('RGB').resize((size, size), Image.LANCZOS)
+
+        detections = remap_boxes(_disease_boxes(record.diseases), (sx1, sy1), size / (sx2 - sx1), size / (sy2 - sy1))
+        detections = [d for d in detections if d[2][2] > 0 and d[2][3] > 0 and d[2][0] < size and d[2][1] < size]
+        return self.annotator.annotated(image_key, detections, (size, size), render)
+
+# 批量导出带框的图片
+def export_annotated(result_path, out_dir, source_width=None, fmt='webp', font_path=None, cache_dir=None):
+    """将带框的总览图和各牙齿图片写入out_dir，返回写出的文件列表"""
+    from report_model import as_report_model
+
+    result_path = Path(result_path)
+    with open(result_path, 'r', encoding='utf-8') as f:
+        result_data = json.load(f)
+
+    annotator = DetectionAnnotator(cache_dir, fmt=fmt, font_path=font_path)
+    annotations = annotator.for_result(result_data, result_path.parent, source_width)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    data = annotations.overview()
+    if data is not None:
+        target = out_dir / f'overview{annotator.extension}'
+        target.write_bytes(data)
+        written.append(target)
+    for index, record in enumerate(as_report_model(result_data).records):
+        data = annotations.tooth(record)
+        if data is None:
+            continue
+        target = out_dir / f'tooth_{record.fdi}_{index}{annotator.extension}'
+        target.write_bytes(data)
+        written.append(target)
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='在总览图和牙齿图片上绘制检测框')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--out-dir', required=True, help='输出目录')
+    parser.add_argument('--source-width', type=float, default=None, help='bbox坐标所在原图的宽度（总览图被缩小过时需要）')
+    parser.add_argument('--format', choices=sorted(CROP_FORMATS), default='webp', help='输出格式')
+    parser.add_argument('--font', default=None, help='标签字体文件（支持中文时标签写出疾病名称）')
+    parser.add_argument('--cache-dir', default=None, help='输出缓存目录')
+    args = parser.parse_args(argv)
+
+    written = export_annotated(args.result, args.out_dir, args.source_width, args.format, args.font, args.cache_dir)
+    print(f"已导出 {len(written)} 张带检测框的图片到 {args.out_dir}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
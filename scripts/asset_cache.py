@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""已编码图片（base64 data URI）的缓存
+
+缓存键为 文件路径 + 修改时间 + 文件大小，文件变化后自动失效。内存层按LRU淘汰，
+总大小不超过 max_bytes；可选的磁盘层（disk_dir）在进程重启后依然有效，
+使logo等品牌资源每次部署只编码一次。线程安全，可在并发渲染中共享。
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from report_renderer import image_file_to_base64_data_uri, image_to_base64
+
+# 默认内存预算与单项上限（按编码后的字符数计）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+class AssetCache:
+    """带内存预算和LRU淘汰的data URI缓存，可选磁盘层"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # 计算缓存键
+    def _key(self, image_path):
+        """返回 (绝对路径, mtime_ns, 大小)，文件不存在时返回None"""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        return (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+    # 磁盘层文件路径
+    def _disk_path(self, key):
+        digest = hashlib.sha256('\0'.join(str(k) for k in key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, digest + '.datauri')
+
+    # 读取磁盘层
+    def _load_from_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='ascii') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # 写入磁盘层（先写临时文件再替换，避免并发读到半个文件）
+    def _save_to_disk(self, key, data_uri):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='ascii') as f:
+                f.write(data_uri)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # 放入内存层并按LRU淘汰
+    def _store(self, key, data_uri):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data_uri
+            self._size += len(data_uri)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    # 获取图片的data URI
+    def data_uri(self, image_path):
+        """返回图片的base64 data URI
+
+        文件不存在，或编码后超过单项上限（应由调用方流式编码）时返回None。
+        """
+        key = self._key(image_path)
+        if key is None or key[2] * 4 // 3 > self.max_entry_bytes:
+            return None
+
+        with self._lock:
+            data_uri = self._entries.get(key)
+            if data_uri is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data_uri
+
+        data_uri = self._load_from_disk(key)
+        if data_uri is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            data_uri = image_file_to_base64_data_uri(str(image_path))
+            if data_uri is None:
+                return None
+            self._save_to_disk(key, data_uri)
+        self._store(key, data_uri)
+        return data_uri
+
+    # 获取图片的base64字符串（不含data URI前缀）
+    def base64(self, image_path):
+        """返回图片的base64字符串，语义同 report_renderer.image_to_base64"""
+        data_uri = self.data_uri(image_path)
+        if data_uri is None:
+            # 超过单项上限的文件不缓存，直接编码
+            return image_to_base64(str(image_path))
+        return data_uri[data_uri.index(',') + 1:]
+
+    # 当前内存占用
+    @property
+    def size(self):
+        return self._size
+
+    # 清空内存层
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""批量生成HTML报告：遍历目录或清单中的result文件，使用进程池并行渲染
+
+用法示例：
+    python batch_generate.py 输入目录 -o 输出目录
+    python batch_generate.py 清单.txt -o 输出目录 --workers 8
+    python batch_generate.py 输入目录 -o 输出目录 --incremental
+    python batch_generate.py 输入目录 -o 输出目录 --link-assets --inline-threshold 8192
+    python batch_generate.py 输入目录 -o 输出目录 --annotate 3730
+    python batch_generate.py nightly.jsonl.gz -o 输出目录 --stream --images-dir 图片目录
+    python batch_generate.py 输入目录 -o 输出目录 --metrics-log metrics.jsonl --prometheus 'report_{pid}.prom'
+"""
+
+import argparse
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from pathlib import Path
+
+import instrumentation
+from annotate import DetectionAnnotator
+from asset_cache import AssetCache
+from crop_engine import OverviewCropper
+from detection_merge import DEFAULT_IOU_THRESHOLD, DEFAULT_MIN_CONFIDENCE, merge_detections
+from image_derivatives import MANIFEST_NAME, load_manifest
+from incremental_build import BUILD_MANIFEST_SUFFIX, is_up_to_date, record_build, report_inputs, snapshot_inputs
+from linked_assets import DEFAULT_INLINE_THRESHOLD, HASH_LENGTH, LinkedAssets
+from precompress import precompress_tree
+from report_renderer import load_logos, load_result_json, render_report
+from result_stream import ResultSchemaError, is_data_file, iter_results, loads, validate_result
+from view_model import VIEW_MODEL_NAME
+
+# 每个工作进程各自持有的logo和图片缓存，只在进程启动时创建一次
+_worker_logos = None
+_worker_cache = None
+_worker_crop_source_width = None
+_worker_merge_options = None
+_worker_logo_dir = None
+_worker_build_options = None
+_worker_linked_assets = None
+_worker_annotator = None
+_worker_annotate_source_width = None
+
+# 默认商标目录（与 generate_new_report 相同的位置）
+DEFAULT_LOGO_DIR = Path(__file__).resolve().parent.parent.parent / '商标'
+
+# 增量模式下默认的图片编码磁盘缓存目录（位于输出目录中）
+INCREMENTAL_CACHE_DIR = '.asset-cache'
+
+# 流式模式下每个工作进程平均排队的记录数；主进程只持有这些记录
+STREAM_QUEUE_PER_WORKER = 4
+
+# 外链资源模式下的公共资源目录（位于输出目录中）
+LINKED_ASSETS_DIR = 'assets'
+
+# 带检测框图片的磁盘缓存子目录（位于图片编码缓存目录中）
+ANNOTATION_CACHE_SUBDIR = 'annotated'
+
+# result 旁的附属JSON文件（衍生图清单、视图模型），目录模式下不作为输入
+SIDECAR_NAMES = (MANIFEST_NAME, VIEW_MODEL_NAME)
+
+# stamp_report 按内容哈希命名的副本（如 result.3f2a9c1d0b7e4a65.json）
+FINGERPRINTED_NAME = re.compile(r'\.[0-9a-f]{%d}\.json$' % HASH_LENGTH)
+
+# 工作进程初始化
+def _init_worker(logo_dir, cache_dir=None, crop_source_width=None, merge_options=None, build_options=None,
+                 instrument_options=None, linked_options=None, annotate_source_width=None):
+    """工作进程启动时读取共享资源（logo）并创建图片缓存
+
+    crop_source_width 不为None时，牙齿图片从总览图按需裁剪（0表示bbox与总览图同一坐标系）；
+    merge_options 为 (iou_threshold, min_confidence) 时，渲染前先做检测结果去重；
+    build_options 不为None时（增量模式），每份报告渲染后在旁边写出构建清单；
+    instrument_options 为 (JSON日志路径, Prometheus文件路径) 时启用分阶段统计；
+    linked_options 为 (公共资源目录, 内联阈值) 时使用外链资源模式；
+    annotate_source_width 不为None时在图片上绘制检测框（含义同 crop_source_width）。
+    """
+    global _worker_logos, _worker_cache, _worker_crop_source_width, _worker_merge_options
+    global _worker_logo_dir, _worker_build_options, _worker_linked_assets
+    global _worker_annotator, _worker_annotate_source_width
+    _worker_crop_source_width = crop_source_width
+    _worker_merge_options = merge_options
+    _worker_build_options = build_options
+    if instrument_options is not None:
+        instrumentation.enable(*instrument_options)
+    _worker_linked_assets = LinkedAssets(*linked_options) if linked_options is not None else None
+    _worker_annotate_source_width = annotate_source_width
+    if annotate_source_width is not None:
+        annotation_cache = Path(cache_dir) / ANNOTATION_CACHE_SUBDIR if cache_dir is not None else None
+        _worker_annotator = DetectionAnnotator(annotation_cache)
+    if logo_dir is None:
+        logo_dir = DEFAULT_LOGO_DIR
+    _worker_logo_dir = logo_dir
+    _worker_cache = AssetCache(disk_dir=cache_dir)
+    _worker_logos = load_logos(logo_dir, _worker_cache)
+
+# 在工作进程中渲染一份报告
+def _render_one(result_path, output_path):
+    """渲染单份报告，返回 (输入, 输出, 耗时秒数)"""
+    start = time.perf_counter()
+    with instrumentation.report_trace(result_path):
+        _render_one_traced(result_path, output_path)
+    return result_path, output_path, time.perf_counter() - start
+
+# 渲染单份报告（启用统计时位于该报告的统计范围内）
+def _render_one_traced(result_path, output_path):
+    result_data = load_result_json(result_path)
+    data_dir = Path(result_path).parent
+    fingerprints = None
+    if _worker_build_options is not None:
+        inputs = report_inputs(result_path, result_data, data_dir, _worker_logo_dir)
+        fingerprints = snapshot_inputs(output_path, inputs)
+    _render_data(result_data, data_dir, output_path)
+    if fingerprints is not None:
+        record_build(output_path, fingerprints, _worker_build_options)
+
+# 按工作进程的配置渲染已读取的result数据
+def _render_data(result_data, data_dir, out):
+    """out 为输出路径或可写的文本类文件对象"""
+    if _worker_merge_options is not None:
+        with instrumentation.stage('merge_detections'):
+            result_data = merge_detections(result_data, *_worker_merge_options)
+    manifest = load_manifest(data_dir / MANIFEST_NAME)
+    cropper = None
+    if _worker_crop_source_width is not None:
+        with instrumentation.stage('overview_decode'):
+            cropper = OverviewCropper.from_result(result_data, data_dir, _worker_crop_source_width or None)
+    annotations = None
+    if _worker_annotator is not None:
+        annotations = _worker_annotator.for_result(result_data, data_dir, _worker_annotate_source_width or None,
+                                                   cropper)
+    render_report(result_data, data_dir, out, logos=_worker_logos, cache=_worker_cache,
+                  derivatives=manifest['images'] if manifest else None, cropper=cropper,
+                  linked_assets=_worker_linked_assets, annotations=annotations)
+
+# 在工作进程中渲染为字符串（供按需渲染服务使用）
+def _render_html(result_source, data_dir, report_id=None):
+    """result_source 为result文件路径或result JSON字节串，返回HTML字符串"""
+    data_dir = Path(data_dir)
+    with instrumentation.report_trace(report_id or str(result_source)[:64]):
+        if isinstance(result_source, bytes):
+            result_data = validate_result(loads(result_source))
+        else:
+            result_data = load_result_json(result_source)
+        out = io.StringIO()
+        _render_data(result_data, data_dir, out)
+    return out.getvalue()
+
+# 在工作进程中渲染流中的一条记录
+def _render_record(record_id, result_data, data_dir, output_path):
+    """渲染已读取的一条记录，返回 (报告ID, 输出, 耗时秒数)"""
+    start = time.perf_counter()
+    with instrumentation.report_trace(record_id):
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        _render_data(result_data, Path(data_dir), output_path)
+    return record_id, output_path, time.perf_counter() - start
+
+# 是否为result旁的附属文件
+def is_sidecar(path):
+    """衍生图清单、视图模型、增量构建清单和按内容哈希命名的副本都不是病例数据"""
+    name = Path(path).name
+    return name in SIDECAR_NAMES or name.endswith(BUILD_MANIFEST_SUFFIX) or bool(FINGERPRINTED_NAME.search(name))
+
+# 收集输入文件
+def collect_inputs(source, pattern='*.json'):
+    """返回 [(result文件, 相对路径)]；source可以是目录（跳过附属文件），也可以是每行一个路径的清单文件"""
+    source = Path(source)
+    if source.is_dir():
+        return [(p, p.relative_to(source)) for p in sorted(source.rglob(pattern))
+                if p.is_file() and not is_sidecar(p)]
+
+    inputs = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = Path(line)
+            if not path.is_absolute():
+                path = source.parent / path
+            try:
+                rel = path.relative_to(source.parent)
+            except ValueError:
+                rel = Path(path.name)
+            inputs.append((path, rel))
+    return inputs
+
+# 收集流式模式的数据文件
+def collect_stream_sources(source, pattern=None):
+    """source 为目录时返回其中的数据文件（.jsonl/.ndjson/.json，可为.gz，跳过附属文件），否则返回 [source]
+
+    指定 pattern 时按通配符匹配。
+    """
+    source = Path(source)
+    if not source.is_dir():
+        return [source]
+    if pattern:
+        return [p for p, _ in collect_inputs(source, pattern)]
+    return [p for p in sorted(source.rglob('*')) if p.is_file() and is_data_file(p) and not is_sidecar(p)]
+
+# 计算输出路径
+def output_path_for(output_dir, rel_path):
+    """result.json 输出为同级的 report.html，其他文件输出为同名 .html"""
+    rel_path = Path(rel_path)
+    name = 'report.html' if rel_path.stem == 'result' else rel_path.stem + '.html'
+    return Path(output_dir) / rel_path.parent / name
+
+# 百分位数（最近秩法）
+def percentile(sorted_values, pct):
+    """返回已排序列表的pct百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+# 批量生成
+def generate_batch(inputs, output_dir, workers=None, logo_dir=None, cache_dir=None, crop_source_width=None,
+                   merge_options=None, incremental=False, instrument_options=None, inline_threshold=None,
+                   annotate_source_width=None):
+    """并行渲染所有输入，返回统计信息字典
+
+    incremental 为True时，先在主进程中对照各报告旁的构建清单检查输入，只渲染有变化的报告；
+    未指定 cache_dir 时使用输出目录下的磁盘缓存，未变化的图片不再重新编码。
+    instrument_options 为 (JSON日志路径, Prometheus文件路径) 时，各工作进程记录每份报告的分阶段统计。
+    inline_threshold 不为None时使用外链资源模式：样式、logo和超过该字节数的图片写入输出目录下的
+    assets/ 并以链接引用。
+    annotate_source_width 不为None时总览图和牙齿图片带检测框（bbox所在原图宽度，0表示与总览图一致）。
+    """
+    workers = workers or os.cpu_count() or 1
+    durations = []
+    failures = []
+
+    start = time.perf_counter()
+    jobs = [(result_path, output_path_for(output_dir, rel)) for result_path, rel in inputs]
+    build_options = None
+    linked_options = None
+    if inline_threshold is not None:
+        linked_options = (str(Path(output_dir) / LINKED_ASSETS_DIR), inline_threshold)
+    if incremental:
+        build_options = {'merge': merge_options, 'crop_source_width': crop_source_width,
+                         'inline_threshold': inline_threshold, 'annotate_source_width': annotate_source_width}
+        jobs = [(result_path, output_path) for result_path, output_path in jobs
+                if not is_up_to_date(output_path, build_options)]
+        if cache_dir is None:
+            cache_dir = Path(output_dir) / INCREMENTAL_CACHE_DIR
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker,
+                                 initargs=(logo_dir, cache_dir, crop_source_width, merge_options, build_options,
+                                           instrument_options, linked_options, annotate_source_width)) as executor:
+            futures = {
+                executor.submit(_render_one, result_path, output_path): result_path
+                for result_path, output_path in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    _, _, elapsed = future.result()
+                    durations.append(elapsed)
+                except Exception as e:
+                    failures.append((futures[future], e))
+                    print(f"生成报告失败: {futures[future]}: {e}", file=sys.stderr)
+    wall = time.perf_counter() - start
+
+    durations.sort()
+    return {
+        'total': len(inputs),
+        'succeeded': len(durations),
+        'skipped': len(inputs) - len(jobs),
+        'failed': len(failures),
+        'workers': workers,
+        'wall_seconds': wall,
+        'reports_per_second': len(durations) / wall if wall > 0 else 0.0,
+        'p50_seconds': percentile(durations, 50),
+        'p95_seconds': percentile(durations, 95),
+    }
+
+# 流式批量生成
+def generate_stream(sources, output_dir, workers=None, logo_dir=None, cache_dir=None, crop_source_width=None,
+                    merge_options=None, instrument_options=None, inline_threshold=None, annotate_source_width=None,
+                    images_dir=None, strict=False):
+    """逐条读取 JSONL / 大型JSON 文件中的result并渲染为 <输出目录>/<报告ID>.html，返回统计信息字典
+
+    记录由 result_stream 边读边校验后直接提交给进程池；主进程至多持有进程数×4条待渲染的记录，
+    内存占用与输入文件大小无关。图片相对于 images_dir（默认各输入文件所在目录）查找。
+    格式不合格的记录报告位置后跳过，strict 为True时抛出 ResultSchemaError。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * STREAM_QUEUE_PER_WORKER
+    durations = []
+    invalid = []
+    failures = []
+    seen_ids = set()
+    linked_options = None
+    if inline_threshold is not None:
+        linked_options = (str(Path(output_dir) / LINKED_ASSETS_DIR), inline_threshold)
+
+    def report_invalid(record):
+        invalid.append(record)
+        print(f"跳过格式错误的记录: {record}", file=sys.stderr)
+
+    def collect(done):
+        for future in done:
+            record_id = pending.pop(future)
+            try:
+                durations.append(future.result()[2])
+            except Exception as e:
+                failures.append((record_id, e))
+                print(f"生成报告失败: {record_id}: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(logo_dir, cache_dir, crop_source_width, merge_options, None,
+                                       instrument_options, linked_options, annotate_source_width)) as executor:
+        for record in iter_results(sources, on_invalid=None if strict else report_invalid):
+            record_id = record.record_id
+            if record_id in seen_ids:
+                # 重复的ID加上来源和位置；改名后仍可能与其他记录的ID相同，继续编号直到不重复
+                base_id = f"{record_id}-{record.source.name.split('.')[0]}-{record.position}"
+                record_id, suffix = base_id, 1
+                while record_id in seen_ids:
+                    suffix += 1
+                    record_id = f'{base_id}-{suffix}'
+            seen_ids.add(record_id)
+            data_dir = Path(images_dir) if images_dir is not None else record.source.parent
+            output_path = Path(output_dir) / f'{record_id}.html'
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(_render_record, record_id, record.data, str(data_dir), output_path)] = record_id
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    wall = time.perf_counter() - start
+
+    durations.sort()
+    return {
+        'total': len(durations) + len(failures) + len(invalid),
+        'succeeded': len(durations),
+        'skipped': 0,
+        'invalid': len(invalid),
+        'failed': len(failures),
+        'workers': workers,
+        'wall_seconds': wall,
+        'reports_per_second': len(durations) / wall if wall > 0 else 0.0,
+        'p50_seconds': percentile(durations, 50),
+        'p95_seconds': percentile(durations, 95),
+    }
+
+# 打印吞吐量统计
+def print_summary(stats):
+    """打印吞吐量统计"""
+    print(f"共 {stats['total']} 份，成功 {stats['succeeded']} 份，跳过 {stats['skipped']} 份（未变化），"
+          f"失败 {stats['failed']} 份（{stats['workers']} 个进程）")
+    if stats.get('invalid'):
+        print(f"格式错误 {stats['invalid']} 份（已跳过）")
+    print(f"总耗时 {stats['wall_seconds']:.2f} 秒，吞吐量 {stats['reports_per_second']:.2f} 份/秒")
+    print(f"单份渲染耗时 p50 {stats['p50_seconds'] * 1000:.1f} ms，p95 {stats['p95_seconds'] * 1000:.1f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量生成口腔健康评估报告')
+    parser.add_argument('source', help='包含result文件的目录，或每行一个result路径的清单文件；'
+                                       '--stream 模式下为JSONL/JSON数据文件或包含它们的目录')
+    parser.add_argument('-o', '--output-dir', required=True, help='报告输出目录')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='工作进程数（默认等于CPU核数）')
+    parser.add_argument('--pattern', default=None,
+                        help='目录模式下匹配result文件的通配符（默认 *.json；--stream 模式默认读取全部数据文件）')
+    parser.add_argument('--logo-dir', default=None, help='商标图片目录')
+    parser.add_argument('--cache-dir', default=None, help='已编码图片的磁盘缓存目录（跨进程重启复用）')
+    parser.add_argument('--crop-from-overview', type=float, default=None, metavar='SOURCE_WIDTH',
+                        help='从总览图按square_bbox裁剪牙齿图片，参数为bbox所在原图宽度（0表示与总览图一致）')
+    parser.add_argument('--annotate', type=float, default=None, metavar='SOURCE_WIDTH',
+                        help='在总览图和牙齿图片上绘制检测框，参数为bbox所在原图宽度（0表示与总览图一致，需要NumPy）')
+    parser.add_argument('--merge', action='store_true', help='渲染前按牙齿合并重复记录并对疾病框做NMS（需要NumPy）')
+    parser.add_argument('--iou', type=float, default=DEFAULT_IOU_THRESHOLD, help='--merge 使用的IoU阈值')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE, help='--merge 使用的置信度阈值')
+    parser.add_argument('--incremental', action='store_true', help='只重新生成输入或生成器有变化的报告')
+    parser.add_argument('--stream', action='store_true',
+                        help='逐条读取多病例数据文件（.jsonl/.ndjson，可为.gz；或result数组的JSON文件），'
+                             '输出 <报告ID>.html')
+    parser.add_argument('--images-dir', default=None, help='--stream 模式下查找图片的目录（默认数据文件所在目录）')
+    parser.add_argument('--strict', action='store_true', help='--stream 模式下遇到格式错误的记录时停止')
+    parser.add_argument('--link-assets', action='store_true', help='样式、logo和较大的图片写入输出目录下的assets/并以链接引用')
+    parser.add_argument('--inline-threshold', type=int, default=DEFAULT_INLINE_THRESHOLD,
+                        help='--link-assets 模式下不超过该字节数的图片仍然内联')
+    parser.add_argument('--precompress', action='store_true', help='生成后为输出目录中的HTML、CSS等写出 .gz/.br 预压缩文件')
+    parser.add_argument('--metrics-log', default=None, help="每份报告的分阶段统计JSON日志路径（'-'表示标准错误）")
+    parser.add_argument('--prometheus', default=None, help='Prometheus文本格式统计文件路径（可含 {pid}，每个进程一份）')
+    args = parser.parse_args(argv)
+    if args.stream and args.incremental:
+        parser.error('--stream 不支持 --incremental')
+
+    merge_options = (args.iou, args.min_confidence) if args.merge else None
+    instrument_options = None
+    if args.metrics_log or args.prometheus:
+        instrument_options = (args.metrics_log, args.prometheus)
+    inline_threshold = args.inline_threshold if args.link_assets else None
+
+    if args.stream:
+        sources = collect_stream_sources(args.source, args.pattern)
+        try:
+            stats = generate_stream(sources, args.output_dir, args.workers, args.logo_dir, args.cache_dir,
+                                    args.crop_from_overview, merge_options, instrument_options, inline_threshold,
+                                    args.annotate, args.images_dir, args.strict)
+        except ResultSchemaError as e:
+            print(f"记录格式错误: {e}", file=sys.stderr)
+            return 1
+    else:
+        inputs = collect_inputs(args.source, args.pattern or '*.json')
+        if not inputs:
+            print(f"未找到任何result文件: {args.source}")
+            return 1
+        stats = generate_batch(inputs, args.output_dir, args.workers, args.logo_dir, args.cache_dir,
+                               args.crop_from_overview, merge_options, args.incremental, instrument_options,
+                               inline_threshold, args.annotate)
+    print_summary(stats)
+    if args.precompress:
+        compressed = precompress_tree(args.output_dir, args.workers)
+        print(f"预压缩：写出 {compressed['written']} 个，未变化 {compressed['unchanged']} 个，"
+              f"跳过 {compressed['skipped']} 个")
+    return 0 if stats['failed'] == 0 and not stats.get('invalid') else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
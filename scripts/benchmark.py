@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""报告生成基准测试：生成合成result数据，逐阶段计时并记录峰值内存和输出大小
+
+合成数据的牙齿记录数、每颗牙的疾病数、重复记录比例和图片大小均可配置；图片内容为
+随机字节（报告只做base64内联，不解码图片），固定随机种子保证多次运行输入一致。
+结果保存为JSON，--compare 可与保存的基线对比，耗时或峰值内存超过阈值的阶段记为回退。
+
+用法示例：
+    python benchmark.py --teeth 8 32 128 --diseases 2 --duplicate-rate 0.2 -o bench.json
+    python benchmark.py --teeth 8 32 128 --diseases 2 --duplicate-rate 0.2 --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import update_report
+from generate_new_report import generate_html_report
+from report_model import as_report_model
+from report_renderer import (
+    DISEASE_NAMES,
+    LOGO1_NAME,
+    LOGO2_NAME,
+    generate_cause_analysis_html,
+    generate_summary_html,
+    generate_tooth_chart_svg,
+    load_logos,
+    load_result_json,
+    render_report,
+)
+
+# 基准结果格式版本
+BENCHMARK_VERSION = 1
+
+# 默认回退阈值：中位耗时或峰值内存比基线高出该比例即视为回退
+DEFAULT_THRESHOLD = 0.15
+
+# 中位耗时低于该值（秒）的阶段不参与耗时回退判定，避免计时噪声误报
+NOISE_FLOOR_SECONDS = 0.001
+
+# 恒牙FDI编号
+PERMANENT_FDI = [f'{q}{n}' for q in (1, 2, 3, 4) for n in range(1, 9)]
+
+# 写入随机字节的“图片”
+def _write_image(path, size, rng):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'\x89PNG\r\n\x1a\n' + rng.randbytes(max(0, size - 8)))
+
+# 随机bbox
+def _random_bbox(rng, extent=3700.0, size=500.0):
+    x = rng.uniform(0, extent - size)
+    y = rng.uniform(0, extent / 2 - size)
+    return [x, y, x + rng.uniform(size / 2, size), y + rng.uniform(size / 2, size)]
+
+# 生成合成result数据
+def generate_synthetic_result(out_dir, teeth=16, diseases_per_tooth=2, duplicate_rate=0.0,
+                              image_kb=300, overview_kb=1500, seed=0):
+    """在out_dir下写出 result.json、图片和logo，返回result.json路径
+
+    teeth 为牙齿记录数；duplicate_rate 为重复已有牙齿编号的记录比例（检测器输出的重复记录）；
+    记录数超过32时多出的部分同样以重复编号出现。
+    """
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    labels = list(DISEASE_NAMES)
+
+    _write_image(out_dir / 'images' / 'overview.png', overview_kb * 1024, rng)
+    _write_image(out_dir / '商标' / LOGO1_NAME, 20 * 1024, rng)
+    _write_image(out_dir / '商标' / LOGO2_NAME, 20 * 1024, rng)
+
+    unique = rng.sample(PERMANENT_FDI, min(len(PERMANENT_FDI), teeth))
+    used = []
+    records = []
+    for index in range(teeth):
+        if used and (rng.random() < duplicate_rate or len(used) >= len(unique)):
+            fdi = rng.choice(used)
+        else:
+            fdi = unique[len(used)]
+            used.append(fdi)
+        crop_path = f'images/tooth_{index}.png'
+        _write_image(out_dir / crop_path, image_kb * 1024, rng)
+        records.append({
+            'tooth_fdi': fdi,
+            'diseases': [
+                {'label': rng.choice(labels), 'confidence': rng.uniform(0.3, 1.0), 'bbox': _random_bbox(rng)}
+                for _ in range(diseases_per_tooth)
+            ],
+            'square_crop_path': crop_path,
+            'square_bbox': _random_bbox(rng, size=900.0),
+            'tooth_bbox': _random_bbox(rng),
+        })
+
+    result_path = out_dir / 'result.json'
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({'image': 'images/overview.png', 'diseased_teeth': records}, f, ensure_ascii=False, indent=2)
+    return result_path
+
+# 输出大小（字节）
+def _output_bytes(value):
+    if isinstance(value, Path):
+        return value.stat().st_size
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (tuple, list)):
+        return sum(_output_bytes(v) for v in value if v is not None)
+    if value is None:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+# 测量单个阶段
+def measure(func, repeat=5):
+    """运行func repeat次计时，再在tracemalloc下运行一次取峰值内存，返回统计字典"""
+    durations = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds_min': min(durations),
+        'seconds_median': statistics.median(durations),
+        'peak_bytes': peak,
+        'output_bytes': _output_bytes(value),
+    }
+
+# 对一份合成数据运行全部阶段
+def run_scenario(work_dir, repeat=5, **params):
+    """生成合成数据并测量各阶段，返回 {阶段名: 统计}"""
+    result_path = generate_synthetic_result(work_dir, **params)
+    work_dir = Path(work_dir)
+    logo_dir = work_dir / '商标'
+    output_path = work_dir / 'report.html'
+    result_data = load_result_json(result_path)
+    model = as_report_model(result_data)
+    logos = load_logos(logo_dir)
+    cause_analysis = update_report.generate_cause_analysis(model)
+
+    stages = {
+        'load_result_json': lambda: load_result_json(result_path),
+        'load_logos': lambda: load_logos(logo_dir),
+        'report_model': lambda: as_report_model(result_data),
+        'tooth_chart_svg': lambda: generate_tooth_chart_svg(model),
+        'cause_analysis_html': lambda: generate_cause_analysis_html(model),
+        'summary_html': lambda: generate_summary_html(model),
+        'update_report.generate_cause_analysis': lambda: update_report.generate_cause_analysis(model),
+        'update_report.generate_comprehensive_summary':
+            lambda: update_report.generate_comprehensive_summary(model, cause_analysis),
+        'render_report': lambda: render_report(result_data, work_dir, output_path, logos=logos),
+        # create_report_simple.main 的调用序列（读取result、logo并渲染），其入口固定读写脚本目录
+        'create_report_simple': lambda: render_report(load_result_json(result_path), work_dir, output_path,
+                                                      logos=load_logos(logo_dir)),
+        'generate_html_report': lambda: generate_html_report(result_path, output_path, logos=load_logos(logo_dir),
+                                                             verbose=False),
+    }
+    return {name: measure(func, repeat) for name, func in stages.items()}
+
+# 场景名称
+def scenario_name(params):
+    return ','.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+# 与基线对比
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """返回回退列表 [(场景, 阶段, 指标, 基线值, 当前值)]"""
+    regressions = []
+    for scenario, stages in results['scenarios'].items():
+        base_stages = baseline.get('scenarios', {}).get(scenario)
+        if not base_stages:
+            continue
+        for stage, stats in stages.items():
+            base = base_stages.get(stage)
+            if not base:
+                continue
+            for metric in ('seconds_median', 'peak_bytes'):
+                if metric == 'seconds_median' and stats[metric] < NOISE_FLOOR_SECONDS:
+                    continue
+                if base[metric] > 0 and stats[metric] > base[metric] * (1 + threshold):
+                    regressions.append((scenario, stage, metric, base[metric], stats[metric]))
+    return regressions
+
+# 打印结果表
+def print_results(results):
+    for scenario, stages in results['scenarios'].items():
+        print(f"\n[{scenario}]")
+        print(f"{'阶段':<46}{'中位耗时(ms)':>8}{'峰值内存(KB)':>8}{'输出(KB)':>8}")
+        for stage, stats in stages.items():
+            print(f"{stage:<48}{stats['seconds_median'] * 1000:>12.2f}{stats['peak_bytes'] / 1024:>14.1f}"
+                  f"{stats['output_bytes'] / 1024:>12.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='报告生成基准测试')
+    parser.add_argument('--teeth', type=int, nargs='+', default=[16], help='牙齿记录数（可给多个值测试规模曲线）')
+    parser.add_argument('--diseases', type=int, default=2, help='每颗牙的疾病数')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='重复牙齿编号的记录比例')
+    parser.add_argument('--image-kb', type=int, default=300, help='每张牙齿裁剪图的大小（KB）')
+    parser.add_argument('--overview-kb', type=int, default=1500, help='总览图的大小（KB）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个阶段的计时次数')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    parser.add_argument('-o', '--output', default=None, help='结果JSON输出路径')
+    parser.add_argument('--compare', default=None, help='与该基线结果JSON对比')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='判定回退的相对阈值')
+    args = parser.parse_args(argv)
+
+    results = {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'scenarios': {},
+    }
+    for teeth in args.teeth:
+        params = {'teeth': teeth, 'diseases_per_tooth': args.diseases, 'duplicate_rate': args.duplicate_rate,
+                  'image_kb': args.image_kb, 'overview_kb': args.overview_kb, 'seed': args.seed}
+        with tempfile.TemporaryDirectory(prefix='report-bench-') as work_dir:
+            results['scenarios'][scenario_name(params)] = run_scenario(work_dir, args.repeat, **params)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项回退（阈值 {args.threshold:.0%}）：")
+            for scenario, stage, metric, base, current in regressions:
+                print(f"  [{scenario}] {stage} {metric}: {base:.6g} -> {current:.6g}（{current / base - 1:+.1%}）")
+            return 1
+        print(f"\n与基线相比无回退（阈值 {args.threshold:.0%}）")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
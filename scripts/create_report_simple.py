@@ -1,419 +1,39 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""简化版报告生成脚本 - 使用相对路径"""
+"""简化版报告生成脚本 - 使用相对路径（渲染逻辑见 report_renderer）"""
 
-import json
-import base64
+import sys
 from pathlib import Path
 
-# 获取当前脚本目录
-SCRIPT_DIR = Path(__file__).parent.resolve()
-BASE_DIR = SCRIPT_DIR.parent.parent
-
-def load_json():
-    with open(SCRIPT_DIR / 'result.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def img_to_base64(path):
-    if path and path.exists():
-        with open(path, 'rb') as f:
-            return base64.b64encode(f.read()).decode('utf-8')
-    return None
-
-def get_problem_teeth(result_data):
-    """获取有问题的牙齿编号"""
-    teeth_set = set()
-    for tooth_data in result_data.get('diseased_teeth', []):
-        tooth_num = tooth_data.get('tooth_fdi', '')
-        if tooth_num:
-            teeth_set.add(tooth_num)
-    return sorted(teeth_set, key=lambda x: int(x))
-
-def generate_tooth_chart_svg(problem_teeth):
-    """生成牙齿图表SVG"""
-    svg = '''<svg width="800" height="600" xmlns="http://www.w3.org/2000/svg">
-  <defs>
-    <style>
-      .tooth-normal { fill: #E8F5E9; stroke: #4CAF50; stroke-width: 2; }
-      .tooth-problem { fill: #FFF9C4; stroke: #FBC02D; stroke-width: 3; }
-      .tooth-text { font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; fill: #2E7D32; }
-      .tooth-problem-text { font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; fill: #F57F17; }
-      .arch-label { font-family: Arial, sans-serif; font-size: 16px; font-weight: bold; fill: #2E7D32; }
-    </style>
-  </defs>
-  
-  <g id="upper-arch">
-    <text x="400" y="30" text-anchor="middle" class="arch-label">上颌 (Maxillary)</text>
-'''
-    
-    # 上颌牙齿 (1-16)
-    upper = [
-        ('1', 50, 80, 30, 25), ('2', 90, 80, 30, 25), ('3', 130, 80, 30, 25),
-        ('4', 170, 70, 25, 20), ('5', 200, 70, 25, 20),
-        ('6', 230, 60, 20, 18),
-        ('7', 255, 50, 18, 15), ('8', 275, 45, 15, 12),
-        ('9', 295, 45, 15, 12), ('10', 315, 50, 18, 15),
-        ('11', 340, 60, 20, 18),
-        ('12', 370, 70, 25, 20), ('13', 400, 70, 25, 20),
-        ('14', 440, 80, 30, 25), ('15', 480, 80, 30, 25), ('16', 520, 80, 30, 25),
-    ]
-    
-    for num, x, y, w, h in upper:
-        is_problem = num in problem_teeth
-        cls = 'tooth-problem' if is_problem else 'tooth-normal'
-        txt_cls = 'tooth-problem-text' if is_problem else 'tooth-text'
-        svg += f'    <rect x="{x}" y="{y}" width="{w}" height="{h}" rx="3" class="{cls}"/>\n'
-        svg += f'    <text x="{x+w/2}" y="{y+h/2+5}" text-anchor="middle" class="{txt_cls}">{num}</text>\n'
-    
-    svg += '''  </g>
-  
-  <g id="lower-arch">
-    <text x="400" y="350" text-anchor="middle" class="arch-label">下颌 (Mandibular)</text>
-'''
-    
-    # 下颌牙齿 (17-32)
-    lower = [
-        ('17', 50, 400, 30, 25), ('18', 90, 400, 30, 25), ('19', 130, 400, 30, 25),
-        ('20', 170, 410, 25, 20), ('21', 200, 410, 25, 20),
-        ('22', 230, 420, 20, 18),
-        ('23', 255, 430, 18, 15), ('24', 275, 435, 15, 12),
-        ('25', 295, 435, 15, 12), ('26', 315, 430, 18, 15),
-        ('27', 340, 420, 20, 18),
-        ('28', 370, 410, 25, 20), ('29', 400, 410, 25, 20),
-        ('30', 440, 400, 30, 25), ('31', 480, 400, 30, 25), ('32', 520, 400, 30, 25),
-    ]
-    
-    for num, x, y, w, h in lower:
-        is_problem = num in problem_teeth
-        cls = 'tooth-problem' if is_problem else 'tooth-normal'
-        txt_cls = 'tooth-problem-text' if is_problem else 'tooth-text'
-        svg += f'    <rect x="{x}" y="{y}" width="{w}" height="{h}" rx="3" class="{cls}"/>\n'
-        svg += f'    <text x="{x+w/2}" y="{y+h/2+5}" text-anchor="middle" class="{txt_cls}">{num}</text>\n'
-    
-    svg += '''  </g>
-  
-  <g id="legend">
-    <rect x="600" y="100" width="180" height="100" fill="#F5F5F5" stroke="#4CAF50" stroke-width="2" rx="5"/>
-    <text x="690" y="125" text-anchor="middle" font-family="Arial" font-size="14" font-weight="bold" fill="#2E7D32">图例</text>
-    <rect x="610" y="140" width="20" height="15" fill="#E8F5E9" stroke="#4CAF50" stroke-width="1"/>
-    <text x="635" y="152" font-family="Arial" font-size="12" fill="#2E7D32">正常</text>
-    <rect x="610" y="165" width="20" height="15" fill="#FFF9C4" stroke="#FBC02D" stroke-width="2"/>
-    <text x="635" y="177" font-family="Arial" font-size="12" fill="#F57F17">有问题</text>
-  </g>
-</svg>'''
-    return svg
-
-def generate_cause_analysis(result_data):
-    """生成病因分析HTML"""
-    analysis = {
-        'tooth_abrasion': {'teeth': set(), 'causes': [
-            '刷牙方式不当（横向刷牙、用力过猛）',
-            '使用硬毛牙刷或磨料过多的牙膏',
-            '饮食习惯（酸性食物、硬质食物）',
-            '夜磨牙或紧咬牙习惯',
-            '年龄因素导致的生理性磨损'
-        ]},
-        'general_caries': {'teeth': set(), 'causes': [
-            '口腔卫生不良，牙菌斑堆积',
-            '高糖饮食，频繁摄入含糖食物',
-            '唾液分泌不足，口腔自洁能力下降',
-            '牙齿结构缺陷或发育不良',
-            '缺乏定期口腔检查和预防性治疗'
-        ]},
-        'twisted_tooth': {'teeth': set(), 'causes': [
-            '遗传因素，家族性牙齿排列异常',
-            '乳牙早失或滞留导致恒牙萌出异常',
-            '牙弓空间不足，牙齿拥挤',
-            '不良口腔习惯（咬唇、吐舌等）',
-            '颌骨发育异常'
-        ]}
-    }
-    
-    disease_map = {
-        'tooth abrasion': 'tooth_abrasion',
-        'general_caries': 'general_caries',
-        'twisted tooth': 'twisted_tooth'
-    }
-    
-    disease_names = {
-        'tooth_abrasion': '牙齿磨损',
-        'general_caries': '龋齿',
-        'twisted_tooth': '牙齿扭转'
-    }
-    
-    for tooth_data in result_data.get('diseased_teeth', []):
-        tooth_num = tooth_data.get('tooth_fdi', '')
-        for disease in tooth_data.get('diseases', []):
-            label = disease.get('label', '')
-            key = disease_map.get(label)
-            if key:
-                analysis[key]['teeth'].add(tooth_num)
-    
-    html = '<div class="section"><h3>🔬 病因分析</h3>'
-    
-    for key, name in disease_names.items():
-        if analysis[key]['teeth']:
-            teeth_list = sorted(list(analysis[key]['teeth']), key=lambda x: int(x))
-            html += f'''
-      <div style="margin-bottom: 20px; padding: 15px; background: #F9FBE7; border-left: 4px solid #8BC34A; border-radius: 5px;">
-        <h4 style="margin: 0 0 10px 0; color: #558B2F; font-size: 18px;">{name}</h4>
-        <p style="margin: 5px 0; color: #555;"><strong>涉及牙齿：</strong>{', '.join(teeth_list)}号牙</p>
-        <p style="margin: 5px 0; color: #555;"><strong>可能原因：</strong></p>
-        <ul style="margin: 10px 0; padding-left: 20px; color: #666;">
-'''
-            for cause in analysis[key]['causes']:
-                html += f'          <li>{cause}</li>\n'
-            html += '        </ul>\n      </div>\n'
-    
-    html += '</div>'
-    return html
-
-def generate_summary(result_data):
-    """生成总结HTML"""
-    total_teeth = len(result_data.get('diseased_teeth', []))
-    total_diseases = sum(len(t.get('diseases', [])) for t in result_data.get('diseased_teeth', []))
-    
-    disease_counts = {}
-    for tooth_data in result_data.get('diseased_teeth', []):
-        for disease in tooth_data.get('diseases', []):
-            label = disease.get('label', '')
-            disease_counts[label] = disease_counts.get(label, 0) + 1
-    
-    names = {
-        'tooth abrasion': '牙齿磨损',
-        'general_caries': '龋齿',
-        'twisted tooth': '牙齿扭转'
-    }
-    
-    html = f'''
-    <div class="section">
-      <h3>📊 检测概况</h3>
-      <p>本次检测共发现 <strong style="color: #FBC02D;">{total_teeth}</strong> 颗牙齿存在健康问题，共检测到 <strong style="color: #FBC02D;">{total_diseases}</strong> 处病变。</p>
-    </div>
-    
-    <div class="section">
-      <h3>🔍 主要问题分布</h3>
-      <ul style="line-height: 2;">
-'''
-    
-    for label, count in disease_counts.items():
-        name = names.get(label, label)
-        html += f'        <li><strong>{name}</strong>：{count} 处</li>\n'
-    
-    html += '''      </ul>
-    </div>
-    
-    <div class="section">
-      <h3>💡 健康建议</h3>
-      <ul style="line-height: 2;">
-        <li>建议尽快到专业口腔医疗机构进行详细检查和治疗</li>
-        <li>改善口腔卫生习惯，使用正确的刷牙方法（建议使用巴氏刷牙法）</li>
-        <li>定期进行口腔检查和清洁（建议每6个月一次）</li>
-        <li>注意饮食健康，减少高糖食物和酸性饮料的摄入</li>
-        <li>如有夜磨牙习惯，建议佩戴防护牙套</li>
-        <li>使用含氟牙膏，增强牙齿抗龋能力</li>
-      </ul>
-    </div>
-'''
-    return html
-
-def main():
-    # 读取数据
-    result_data = load_json()
-    
-    # 读取logo
-    logo1_path = BASE_DIR / '商标' / 'd36e30836df4c84348b7eda21da5b003.png'
-    logo2_path = BASE_DIR / '商标' / '2170b51c9ac9a84ceef03a49c3de8690.png'
-    logo1_b64 = img_to_base64(logo1_path)
-    logo2_b64 = img_to_base64(logo2_path)
-    
-    # 读取overview图片
-    overview_path = SCRIPT_DIR / '原始照片_overview.png'
-    overview_b64 = img_to_base64(overview_path)
-    
-    # 生成内容
-    problem_teeth = get_problem_teeth(result_data)
-    tooth_chart = generate_tooth_chart_svg(problem_teeth)
-    cause_analysis = generate_cause_analysis(result_data)
-    summary = generate_summary(result_data)
-    
-    total_teeth = len(result_data.get('diseased_teeth', []))
-    total_diseases = sum(len(t.get('diseases', [])) for t in result_data.get('diseased_teeth', []))
-    
-    # 生成牙齿详细图片HTML
-    tooth_images_html = ''
-    disease_names_map = {
-        'tooth abrasion': '磨损',
-        'general_caries': '龋齿',
-        'twisted tooth': '扭转'
-    }
-    
-    for tooth_data in result_data.get('diseased_teeth', []):
-        tooth_num = tooth_data.get('tooth_fdi', '')
-        diseases = tooth_data.get('diseases', [])
-        img_name = Path(tooth_data.get('square_crop_path', '')).name
-        img_path = SCRIPT_DIR / img_name
-        img_b64 = img_to_base64(img_path)
-        
-        if img_b64:
-            disease_labels = [d.get('label', '') for d in diseases]
-            disease_text = '、'.join([disease_names_map.get(l, l) for l in disease_labels if l in disease_names_map])
-            tooth_images_html += f'''          <div class="cell">
-            <img src="data:image/png;base64,{img_b64}" alt="牙齿 {tooth_num}">
-            <div class="meta">
-              <strong>{tooth_num}号牙</strong><br>
-              {disease_text}
-            </div>
-          </div>
-'''
-    
-    # 生成完整HTML
-    html = f'''<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1"> 
-  <title>口腔健康评估报告</title>
-  <style>
-    * {{ box-sizing: border-box; }}
-    body {{ margin: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'PingFang SC', 'Microsoft YaHei', 'Helvetica Neue', Arial, 'Noto Sans SC', sans-serif; background:#ffffff; color:#222; }}
-    .page {{ width: 100%; max-width: 1080px; margin: 24px auto 72px; background:#ffffff; padding: 28px 32px 40px; border-radius: 12px; box-shadow: 0 12px 36px rgba(0,0,0,.08);}} 
-    .topbar {{ height: 10px; background: linear-gradient(90deg, #4CAF50 0%, #8BC34A 50%, #FFEB3B 100%); width: 50%; border-radius: 6px; margin-top: 4px; }}
-    .header {{ display:flex; align-items: center; justify-content: space-between; margin: 18px 0 12px; }}
-    .badge {{ display:inline-block; padding: 6px 12px; border-radius: 8px; background: linear-gradient(135deg, #4CAF50 0%, #8BC34A 100%); color:#fff; font-weight:600; margin-right: 12px; }}
-    h1 {{ margin: 0; font-size: 48px; letter-spacing:1px; color: #2E7D32; }}
-    .report-tag {{ color:#4CAF50; }}
-    .logo {{ height: 80px; width: auto; display:block; object-fit: contain; }}
-    .logo-large {{ height: 150px; width: auto; display:block; object-fit: contain; }}
-    .cover {{ display:flex; flex-direction: column; align-items:center; justify-content:center; padding: 80px 32px 120px; text-align:center; background: linear-gradient(135deg, #E8F5E9 0%, #F1F8E9 50%, #FFF9C4 100%); border-radius: 12px; }}
-    .cover h1 {{ font-size: 42px; margin: 18px 0 8px; color: #2E7D32; }}
-    .cover .subtitle {{ color:#4CAF50; font-size: 18px; margin-top: 4px; }}
-    .cover-summary {{ margin-top: 40px; padding: 30px; background: rgba(255,255,255,0.9); border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); max-width: 600px; }}
-    .cover-summary h2 {{ color: #2E7D32; font-size: 24px; margin: 0 0 15px 0; }}
-    .cover-summary .stat {{ display: flex; justify-content: space-around; margin: 20px 0; }}
-    .cover-summary .stat-item {{ text-align: center; }}
-    .cover-summary .stat-number {{ font-size: 36px; font-weight: bold; color: #FBC02D; margin: 5px 0; }}
-    .cover-summary .stat-label {{ font-size: 14px; color: #666; }}
-    .layout {{ display:grid; grid-template-columns: 1fr 460px; gap: 28px; margin-top: 10px; }}
-    @media (max-width: 980px){{ .layout {{ grid-template-columns: 1fr; }} }}
-    .section {{ margin-bottom: 18px; background:#ffffff; border:1px solid #C8E6C9; border-radius:10px; padding:14px 16px; }}
-    .section h3 {{ margin: 0 0 6px; color:#2E7D32; font-size: 20px; display:flex; align-items:center; }}
-    .section h3::before {{ content:""; display:inline-block; width: 12px; height: 12px; border:2px solid #4CAF50; border-radius:50%; margin-right: 8px; }}
-    .section p {{ margin: 0; line-height: 1.8; color:#444; }}
-    .right h3 {{ color:#4CAF50; margin: 6px 0; font-size: 20px; }}
-    .chips {{ display:flex; flex-wrap:wrap; gap: 8px 10px; margin: 6px 0 12px; }}
-    .chip {{ background: linear-gradient(135deg, #4CAF50 0%, #8BC34A 100%); color:#fff; border-radius: 999px; padding: 6px 12px; font-weight: 700; min-width: 42px; text-align:center; font-size: 14px; }}
-    .grid {{ display: grid; grid-template-columns: repeat(3, minmax(0, 1fr)); gap: 14px; }}
-    @media (max-width: 980px){{ .grid {{ grid-template-columns: repeat(2, minmax(0, 1fr)); }} }}
-    .cell {{ background:#ffffff; padding: 8px; border:1px solid #C8E6C9; border-radius: 10px; }}
-    .cell img {{ width: 100%; aspect-ratio: 1 / 1; object-fit: cover; border-radius: 8px; display:block; }}
-    .meta {{ font-size: 13px; color:#555; margin-top: 6px; line-height: 1.55; }}
-    footer {{ margin-top: 24px; color:#666; font-size: 14px; }}
-    .legend {{ margin-top: 6px; font-size: 12px; color:#4CAF50; }}
-    .tooth-chart {{ width: 100%; max-width: 800px; margin: 20px auto; background: #F9FBE7; padding: 20px; border-radius: 10px; border: 2px solid #8BC34A; }}
-    .tooth-chart svg {{ width: 100%; height: auto; }}
-    @page {{ size: A4; margin: 12mm; }}
-    @media print {{
-      body {{ -webkit-print-color-adjust: exact; print-color-adjust: exact; font-size: 12px; }}
-      .page {{ break-after: page; page-break-after: always; box-shadow: none; max-width: 100%; margin: 0; border-radius: 0; page-break-inside: avoid; }}
-      .header h1 {{ font-size: 28px; }}
-      .badge {{ padding: 4px 10px; font-size: 12px; }}
-      .section {{ margin-bottom: 10px; padding: 10px 12px; }}
-      .section h3 {{ font-size: 16px; }}
-      .section p {{ line-height: 1.6; }}
-      .right h3 {{ font-size: 16px; }}
-      .chips {{ gap: 6px 8px; }}
-      .logo {{ height: 60px; }}
-    }}
-  </style>
-</head>
-<body>
-  <div class="page cover">
-    <img class="logo-large" src="data:image/png;base64,{logo2_b64 or ''}" alt="Logo">
-    <h1>口腔健康评估报告</h1>
-    <p class="subtitle">Oral Health Assessment Report</p>
-    
-    <div class="cover-summary">
-      <h2>📋 检测概览</h2>
-      <div class="stat">
-        <div class="stat-item">
-          <div class="stat-number">{total_teeth}</div>
-          <div class="stat-label">问题牙齿</div>
-        </div>
-        <div class="stat-item">
-          <div class="stat-number">{total_diseases}</div>
-          <div class="stat-label">病变数量</div>
-        </div>
-      </div>
-      <p style="margin: 15px 0 0 0; color: #555; line-height: 1.6;">
-        本报告基于AI智能分析技术，对您的口腔健康状况进行了全面评估。
-        建议您根据报告结果，及时咨询专业口腔医生，制定个性化的治疗方案。
-      </p>
-    </div>
-  </div>
-
-  <div class="page">
-    <div class="topbar"></div>
-    <div class="header">
-      <div>
-        <span class="badge">AI智能分析</span>
-        <h1>口腔健康<span class="report-tag">评估报告</span></h1>
-      </div>
-      <div><img class="logo" src="data:image/png;base64,{logo1_b64 or ''}" alt="Logo"></div>
-    </div>
-    
-    <div class="layout">
-      <div class="left">
-        {summary}
-        
-        {cause_analysis}
-        
-        <div class="section">
-          <h3>🦷 牙齿问题分布图</h3>
-          <div class="tooth-chart">
-            {tooth_chart}
-          </div>
-          <p class="legend">注：黄色标记表示存在问题的牙齿</p>
-        </div>
-        
-        <div class="section">
-          <h3>📸 整体视图</h3>
-          <img src="data:image/png;base64,{overview_b64 or ''}" alt="整体视图" style="width: 100%; border-radius: 8px; border: 2px solid #C8E6C9;">
-        </div>
-      </div>
-      
-      <div class="right">
-        <h3>🔍 详细检测结果</h3>
-        <div class="chips">
-'''
-    
-    for tooth_num in problem_teeth:
-        html += f'          <span class="chip">{tooth_num}</span>\n'
-    
-    html += f'''        </div>
-        
-        <div class="grid">
-{tooth_images_html}
-        </div>
-      </div>
-    </div>
-    
-    <footer>
-      <p>本报告由AI智能分析系统生成，仅供参考。具体诊断和治疗方案请咨询专业口腔医生。</p>
-      <p style="margin-top: 10px; color: #4CAF50;">© 渡生科技 - 专业口腔健康解决方案</p>
-    </footer>
-  </div>
-</body>
-</html>'''
-    
-    # 保存文件
-    output_path = SCRIPT_DIR / 'report.html'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+from incremental_build import is_up_to_date, record_build, report_inputs, snapshot_inputs
+from linked_assets import LinkedAssets
+from report_renderer import load_logos, load_result_json, render_report
+
+def main(incremental=False, link_assets=False):
+    # 获取当前脚本目录
+    script_dir = Path(__file__).parent.resolve()
+    base_dir = script_dir.parent.parent
+    result_path = script_dir / 'result.json'
+    output_path = script_dir / 'report.html'
+    build_options = {'linked_assets': link_assets}
+    
+    # 增量模式：输入和生成器都未变化时跳过
+    if incremental and is_up_to_date(output_path, build_options):
+        print(f"✅ 输入未变化，跳过生成: {output_path}")
+        return output_path
+    
+    result_data = load_result_json(result_path)
+    if incremental:
+        fingerprints = snapshot_inputs(output_path, report_inputs(result_path, result_data, script_dir, base_dir / '商标'))
+    # 外链模式：样式、logo和较大的图片写入 assets/ 并以链接引用
+    linked = LinkedAssets(script_dir / 'assets') if link_assets else None
+    output_path = render_report(result_data, script_dir, output_path,
+                                logos=load_logos(base_dir / '商标'), linked_assets=linked)
+    if incremental:
+        record_build(output_path, fingerprints, build_options)
     
     print(f"✅ 报告已生成: {output_path}")
     return output_path
 
 if __name__ == '__main__':
-    main()
-
+    main(incremental='--incremental' in sys.argv[1:], link_assets='--link-assets' in sys.argv[1:])
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""按 square_bbox 从总览图按需裁剪牙齿图片
+
+总览图只解码一次，所有牙齿的裁剪都来自同一份解码后的图像，并直接缩放到显示尺寸
+编码，不再需要逐颗读取 原始照片_tooth_N.png。需要 Pillow（pip install Pillow）。
+
+用法示例（把裁剪结果写成文件，便于检查）：
+    python crop_engine.py ../result.json -o crops --source-width 3200
+"""
+
+import argparse
+import base64
+import io
+import json
+import sys
+import threading
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow为可选依赖，仅按需裁剪时需要
+    Image = None
+
+# 裁剪图的默认显示边长（像素），约为报告网格单元格宽度的2倍以适配高清屏
+CROP_DISPLAY_SIZE = 320
+
+# 编码格式 -> (Pillow格式名, MIME类型, 扩展名, 保存参数)
+CROP_FORMATS = {
+    'webp': ('WEBP', 'image/webp', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg', {'quality': 85, 'optimize': True}),
+}
+
+class OverviewCropper:
+    """解码一次总览图，按 square_bbox 从共享图像中裁剪并编码
+
+    bbox 坐标位于检测时使用的原图坐标系中；当总览图被缩小过时，通过 source_width
+    （原图宽度）换算到总览图像素坐标。实例可在多个线程间共享。
+    """
+
+    def __init__(self, overview_path, source_width=None, size=CROP_DISPLAY_SIZE, fmt='webp'):
+        if Image is None:
+            raise RuntimeError('按需裁剪需要安装 Pillow：pip install Pillow')
+        with Image.open(overview_path) as image:
+            self._image = image.convert('RGB')
+        self.scale = self._image.width / source_width if source_width else 1.0
+        self.size = size
+        self.fmt = fmt
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    # 根据result数据创建
+    @classmethod
+    def from_result(cls, result_data, assets_root, source_width=None, **kwargs):
+        """从result中的总览图路径创建；result带 image_width 字段时以其作为原图宽度"""
+        from report_renderer import resolve_image_path
+        overview_rel = result_data.get('overview_image_path') or result_data.get('image') or '原始照片_overview.png'
+        overview_path = resolve_image_path(assets_root, overview_rel)
+        return cls(overview_path, source_width or result_data.get('image_width'), **kwargs)
+
+    # 裁剪为显示尺寸的图像
+    def crop(self, bbox):
+        """返回缩放到 size×size 的裁剪图（超出总览图的部分以黑色填充）"""
+        x1, y1, x2, y2 = (round(v * self.scale) for v in bbox)
+        region = self._image.crop((x1, y1, max(x2, x1 + 1), max(y2, y1 + 1)))
+        return region.resize((self.size, self.size), Image.LANCZOS)
+
+    # 编码裁剪图
+    def encode(self, bbox):
+        """返回裁剪图编码后的字节；同一bbox只编码一次"""
+        key = tuple(bbox)
+        with self._lock:
+            data = self._encoded.get(key)
+        if data is None:
+            pil_format, _, _, options = CROP_FORMATS[self.fmt]
+            buffer = io.BytesIO()
+            self.crop(bbox).save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            with self._lock:
+                self._encoded[key] = data
+        return data
+
+    # 编码格式对应的扩展名
+    @property
+    def extension(self):
+        return CROP_FORMATS[self.fmt][2]
+
+    # 裁剪图的data URI
+    def data_uri(self, bbox):
+        """返回裁剪图的base64 data URI，可直接用于 <img src>"""
+        mime_type = CROP_FORMATS[self.fmt][1]
+        return f"data:{mime_type};base64,{base64.b64encode(self.encode(bbox)).decode('ascii')}"
+
+# 批量导出所有牙齿的裁剪图
+def export_crops(result_path, out_dir, source_width=None, size=CROP_DISPLAY_SIZE, fmt='webp'):
+    """将result中每颗牙齿的裁剪图写入out_dir，返回写出的文件列表"""
+    result_path = Path(result_path)
+    with open(result_path, 'r', encoding='utf-8') as f:
+        result_data = json.load(f)
+
+    cropper = OverviewCropper.from_result(result_data, result_path.parent, source_width, size=size, fmt=fmt)
+    ext = CROP_FORMATS[fmt][2]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for index, tooth_data in enumerate(result_data.get('diseased_teeth', [])):
+        bbox = tooth_data.get('square_bbox')
+        if not bbox:
+            continue
+        target = out_dir / f"tooth_{tooth_data.get('tooth_fdi', '')}_{index}{ext}"
+        target.write_bytes(cropper.encode(bbox))
+        written.append(target)
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='从总览图按 square_bbox 裁剪牙齿图片')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--out-dir', required=True, help='裁剪图输出目录')
+    parser.add_argument('--source-width', type=float, default=None, help='bbox坐标所在原图的宽度（总览图被缩小过时需要）')
+    parser.add_argument('--size', type=int, default=CROP_DISPLAY_SIZE, help='裁剪图边长')
+    parser.add_argument('--format', choices=sorted(CROP_FORMATS), default='webp', help='输出格式')
+    args = parser.parse_args(argv)
+
+    written = export_crops(args.result, args.out_dir, args.source_width, args.size, args.format)
+    print(f"已导出 {len(written)} 张裁剪图到 {args.out_dir}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
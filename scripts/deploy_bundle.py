@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""导出报告页面的发布目录：只复制页面运行时实际请求的文件
+
+文件清单与 service_worker.py 的预缓存清单相同：页面本身、静态引用的图片和样式、数据文件、
+result 引用的图片及其衍生图、牙齿分布图用到的状态图（或精灵图），另加页面旁已生成的 sw.js。
+images/Processed image 中的 Original file.psd、Original image.* 等源文件以及未用到的状态图
+不会进入发布目录。目标文件大小和修改时间未变时不重新复制。
+
+用法示例：
+    python sprite_atlas.py ../report.html        # 可选，先把状态图打包为精灵图
+    python deploy_bundle.py ../report.html ../result.json -o ../dist
+    python deploy_bundle.py ../report.html ../result.json -o ../dist --precompress
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from precompress import precompress_tree
+from service_worker import SERVICE_WORKER_NAME, precache_urls
+
+# 复制单个文件
+def _copy_if_changed(source, target):
+    """目标不存在或大小、修改时间不同时复制，返回是否复制"""
+    try:
+        src_stat = source.stat()
+        dst_stat = target.stat()
+        if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+            return False
+    except FileNotFoundError:
+        pass
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
+    return True
+
+# 导出发布目录
+def export_bundle(report_path, result_path, out_dir):
+    """复制页面运行时请求的文件到 out_dir（保持相对路径），返回 (复制的文件列表, 未变化数, 缺失的地址列表)"""
+    report_path = Path(report_path)
+    page_dir = report_path.resolve().parent
+    out_dir = Path(out_dir).resolve()
+    if out_dir == page_dir:
+        raise ValueError('发布目录不能是页面所在目录')
+
+    urls = precache_urls(report_path, result_path)
+    if (page_dir / SERVICE_WORKER_NAME).is_file():
+        urls.append(SERVICE_WORKER_NAME)
+
+    copied = []
+    unchanged = 0
+    missing = []
+    for url in urls:
+        source = (page_dir / url).resolve()
+        if not source.is_file():
+            missing.append(url)
+            continue
+        if page_dir not in source.parents:
+            print(f"跳过页面目录之外的文件: {url}", file=sys.stderr)
+            continue
+        target = out_dir / source.relative_to(page_dir)
+        if _copy_if_changed(source, target):
+            copied.append(target)
+        else:
+            unchanged += 1
+    return copied, unchanged, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='导出报告页面的发布目录（不含源文件）')
+    parser.add_argument('report', help='report.html 路径')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--output', required=True, help='发布目录')
+    parser.add_argument('--precompress', action='store_true',
+                        help='为复制的文本文件生成 .gz/.br 预压缩版本（见 precompress.py）')
+    args = parser.parse_args(argv)
+
+    copied, unchanged, missing = export_bundle(args.report, args.result, args.output)
+    for url in missing:
+        print(f"警告: 文件不存在，未导出: {url}", file=sys.stderr)
+    print(f"发布目录: {args.output}（复制 {len(copied)} 个文件，{unchanged} 个未变化）")
+    if args.precompress:
+        compressed = precompress_tree(args.output)
+        print(f"预压缩：写出 {compressed['written']} 个，未变化 {compressed['unchanged']} 个，"
+              f"跳过 {compressed['skipped']} 个")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
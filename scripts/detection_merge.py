@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""渲染前的检测结果去重：按牙齿合并记录，并对疾病框做按标签的非极大值抑制（NMS）
+
+检测器输出中同一颗牙可能出现多条记录，同一颗牙上同一种疾病也可能有多个重叠框。
+本模块先按 tooth_fdi 合并记录，再把所有疾病框放进同一组NumPy数组，
+按 (牙齿, 标签) 分组一次性完成NMS和置信度过滤，适用于上千个框的输出。需要 NumPy。
+
+用法示例：
+    python detection_merge.py ../result.json -o merged.json --iou 0.5 --min-confidence 0.3
+"""
+
+import argparse
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，仅去重时需要
+    np = None
+
+# 默认IoU阈值与置信度阈值
+DEFAULT_IOU_THRESHOLD = 0.5
+DEFAULT_MIN_CONFIDENCE = 0.0
+
+# 分组NMS
+def batched_nms(boxes, scores, groups, iou_threshold=DEFAULT_IOU_THRESHOLD):
+    """对 (N, 4) 的 [x1, y1, x2, y2] 框按组做NMS，返回长度为N的保留掩码
+
+    不同组的框通过坐标平移互不重叠，因此所有组可以在同一轮贪心中处理。
+    """
+    count = len(boxes)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+
+    span = float(boxes.max() - boxes.min()) + 1.0
+    shifted = boxes - boxes.min() + (groups.astype(np.float64) * span)[:, None]
+    x1, y1, x2, y2 = shifted.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    order = np.argsort(-scores, kind='stable')
+    while order.size:
+        i = order[0]
+        keep[i] = True
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        union = areas[i] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+# 按牙齿合并记录
+def merge_teeth(diseased_teeth):
+    """按 tooth_fdi 合并记录，保留首条记录的图片与坐标字段，疾病列表依次拼接"""
+    merged = {}
+    for tooth_data in diseased_teeth:
+        fdi = tooth_data.get('tooth_fdi', '')
+        if fdi not in merged:
+            merged[fdi] = dict(tooth_data, diseases=[])
+        merged[fdi]['diseases'].extend(tooth_data.get('diseases', []))
+    return list(merged.values())
+
+# 去重主流程
+def merge_detections(result_data, iou_threshold=DEFAULT_IOU_THRESHOLD, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """返回去重后的result副本：牙齿记录唯一，同一牙齿同一标签的重叠框只保留置信度最高者
+
+    置信度低于 min_confidence 的疾病被丢弃，没有剩余疾病的牙齿也一并移除。
+    没有 bbox 的疾病不参与抑制。
+    """
+    if np is None:
+        raise RuntimeError('检测结果去重需要安装 NumPy：pip install numpy')
+
+    teeth = merge_teeth(result_data.get('diseased_teeth', []))
+
+    # 展平为结构化数组：每个疾病一行
+    tooth_index = []
+    label_index = []
+    scores = []
+    boxes = []
+    label_ids = {}
+    for t, tooth_data in enumerate(teeth):
+        for disease in tooth_data['diseases']:
+            tooth_index.append(t)
+            label_index.append(label_ids.setdefault(disease.get('label', ''), len(label_ids)))
+            scores.append(float(disease.get('confidence', 0.0)))
+            bbox = disease.get('bbox')
+            boxes.append(bbox if bbox and len(bbox) == 4 else (np.nan,) * 4)
+
+    tooth_index = np.asarray(tooth_index, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    groups = tooth_index * max(len(label_ids), 1) + np.asarray(label_index, dtype=np.int64)
+
+    keep = scores >= min_confidence
+    has_box = ~np.isnan(boxes).any(axis=1)
+    candidates = np.flatnonzero(keep & has_box)
+    nms_keep = batched_nms(boxes[candidates], scores[candidates], groups[candidates], iou_threshold)
+    keep[candidates[~nms_keep]] = False
+
+    # 按原顺序重建每颗牙齿的疾病列表
+    kept_teeth = []
+    row = 0
+    for tooth_data in teeth:
+        diseases = []
+        for disease in tooth_data['diseases']:
+            if keep[row]:
+                diseases.append(disease)
+            row += 1
+        if diseases:
+            kept_teeth.append(dict(tooth_data, diseases=diseases))
+
+    return dict(result_data, diseased_teeth=kept_teeth)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='合并重复牙齿并对疾病框做NMS')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--output', required=True, help='去重后的result输出路径')
+    parser.add_argument('--iou', type=float, default=DEFAULT_IOU_THRESHOLD, help='NMS的IoU阈值')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE, help='置信度阈值')
+    args = parser.parse_args(argv)
+
+    with open(args.result, 'r', encoding='utf-8') as f:
+        result_data = json.load(f)
+    merged = merge_detections(result_data, args.iou, args.min_confidence)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+
+    before = sum(len(t.get('diseases', [])) for t in result_data.get('diseased_teeth', []))
+    after = sum(len(t['diseases']) for t in merged['diseased_teeth'])
+    print(f"牙齿记录 {len(result_data.get('diseased_teeth', []))} -> {len(merged['diseased_teeth'])}，病变 {before} -> {after}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""生成响应式图片衍生图（不同宽度的WebP/JPEG），供报告通过 srcset/sizes 引用
+
+衍生图按源文件内容的sha256命名并缓存在磁盘上，源文件未变化时不会重新生成。
+同时在result.json旁写出 derivatives.json 清单，report.html 和 report_renderer
+据此输出 srcset。清单中还记录每张图片的原始宽高和一个约几百字节的模糊缩略图
+（data URI），页面先显示缩略图并预留图片尺寸，图片接近视口时才加载原图。
+需要 Pillow（pip install Pillow）。
+
+用法示例：
+    python image_derivatives.py ../result.json
+    python image_derivatives.py ../result.json --widths 256 512 1024 --format jpeg
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageFilter
+except ImportError:  # Pillow为可选依赖，仅生成衍生图时需要
+    Image = ImageFilter = None
+
+# 默认衍生图宽度（像素）
+DERIVATIVE_WIDTHS = (256, 512, 1024)
+
+# 输出格式 -> (Pillow格式名, 扩展名, 保存参数)
+OUTPUT_FORMATS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# 占位缩略图宽度（像素）、模糊半径和WebP质量
+PLACEHOLDER_WIDTH = 24
+PLACEHOLDER_BLUR = 1
+PLACEHOLDER_QUALITY = 40
+
+# 清单文件名（位于result.json旁）
+MANIFEST_NAME = 'derivatives.json'
+MANIFEST_VERSION = 1
+
+# 计算文件sha256
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件内容的sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# 选择需要生成的宽度
+def target_widths(source_width, widths=DERIVATIVE_WIDTHS):
+    """不放大图片：只保留小于源宽度的档位，并补上源宽度作为最大一档"""
+    selected = sorted(w for w in widths if w < source_width)
+    if not selected or selected[-1] < min(source_width, max(widths)):
+        selected.append(min(source_width, max(widths)))
+    return selected
+
+# 保存单张衍生图
+def _save_variant(image, width, target, fmt):
+    pil_format, _, options = OUTPUT_FORMATS[fmt]
+    height = max(1, round(image.height * width / image.width))
+    variant = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+    if pil_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    variant.save(tmp_path, pil_format, **options)
+    os.replace(tmp_path, target)
+
+# 生成占位缩略图
+def placeholder_data_uri(image, width=PLACEHOLDER_WIDTH):
+    """返回轻微模糊的小缩略图（WebP data URI），页面放大显示作为加载前的占位"""
+    height = max(1, round(image.height * width / image.width))
+    thumb = image.convert('RGB')
+    thumb.thumbnail((width, height), Image.LANCZOS)
+    thumb = thumb.filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR))
+    buffer = io.BytesIO()
+    thumb.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+# 为单张图片生成衍生图
+def build_derivatives(source_path, out_dir, widths=DERIVATIVE_WIDTHS, fmt='webp', previous=None):
+    """生成衍生图并返回清单条目 {'sha256', 'width', 'height', 'placeholder', 'variants': [{'width', 'file'}]}
+
+    previous 为上一次清单中的同一条目；源文件哈希未变且文件齐全时直接复用，不解码图片。
+    """
+    out_dir = Path(out_dir)
+    sha = file_sha256(source_path)
+    ext = OUTPUT_FORMATS[fmt][1]
+
+    if previous and previous.get('sha256') == sha and previous.get('format') == fmt and previous.get('placeholder'):
+        if all((out_dir / Path(v['file']).name).exists() for v in previous.get('variants', [])):
+            return previous
+
+    if Image is None:
+        raise RuntimeError('生成衍生图需要安装 Pillow：pip install Pillow')
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(source_path) as image:
+        image.load()
+        variants = []
+        for width in target_widths(image.width, widths):
+            target = out_dir / f"{sha[:16]}-{width}{ext}"
+            if not target.exists():
+                _save_variant(image, width, target, fmt)
+            variants.append({'width': width, 'file': target.name})
+        return {'sha256': sha, 'format': fmt, 'width': image.width, 'height': image.height,
+                'placeholder': placeholder_data_uri(image), 'variants': variants}
+
+# 收集result中引用的图片
+def referenced_images(result_data):
+    """返回result中引用的总览图和牙齿裁剪图路径（去重、保持顺序）"""
+    paths = [result_data.get('overview_image_path') or result_data.get('image')]
+    paths += [t.get('square_crop_path') for t in result_data.get('diseased_teeth', [])]
+    return list(dict.fromkeys(p for p in paths if p))
+
+# 读取清单
+def load_manifest(manifest_path):
+    """读取derivatives.json，不存在或版本不符时返回空清单"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+# 为一份result生成全部衍生图和清单
+def build_manifest(result_path, out_dir=None, widths=DERIVATIVE_WIDTHS, fmt='webp'):
+    """生成result引用的所有图片的衍生图，并在result旁写出derivatives.json
+
+    清单中的路径均相对于result所在目录（报告页面也位于该目录）。
+    """
+    result_path = Path(result_path)
+    base_dir = result_path.parent
+    out_dir = Path(out_dir) if out_dir is not None else base_dir / 'images' / 'derivatives'
+    manifest_path = base_dir / MANIFEST_NAME
+
+    with open(result_path, 'r', encoding='utf-8') as f:
+        result_data = json.load(f)
+
+    previous = (load_manifest(manifest_path) or {}).get('images', {})
+    images = {}
+    for rel_path in referenced_images(result_data):
+        source = base_dir / rel_path
+        if not source.exists():
+            print(f"跳过不存在的图片: {source}", file=sys.stderr)
+            continue
+        entry = build_derivatives(source, out_dir, widths, fmt, previous.get(rel_path))
+        prefix = os.path.relpath(out_dir, base_dir).replace(os.sep, '/')
+        entry = dict(entry, variants=[dict(v, path=f"{prefix}/{v['file']}") for v in entry['variants']])
+        images[rel_path] = entry
+
+    manifest = {'version': MANIFEST_VERSION, 'images': images}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为报告图片生成响应式衍生图')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--out-dir', default=None, help='衍生图输出目录（默认 result旁的 images/derivatives）')
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DERIVATIVE_WIDTHS), help='衍生图宽度')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='webp', help='输出格式')
+    args = parser.parse_args(argv)
+
+    manifest = build_manifest(args.result, args.out_dir, tuple(args.widths), args.format)
+    count = sum(len(e['variants']) for e in manifest['images'].values())
+    print(f"已处理 {len(manifest['images'])} 张图片，共 {count} 个衍生图")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""增量构建：在每份报告旁记录输入文件的内容哈希，输入未变化时跳过渲染
+
+构建清单（report.html.build.json）记录：
+  - 生成器版本：渲染相关模块源码的哈希，模板或生成逻辑修改后所有报告自动重建；
+  - 渲染选项（如去重阈值、裁剪参数）；
+  - 每个输入文件（result、引用的图片、derivatives.json、logo）的大小、修改时间和sha256。
+
+检查时先比较文件大小和修改时间，一致则直接认为内容未变，不读取文件；不一致时才重新
+计算sha256，内容相同（例如文件被复制或touch过）仍视为未变化。因此对未变化的归档重新
+运行只需要一次目录扫描。图片的编码结果由 AssetCache 的磁盘层按文件复用，衍生图由
+image_derivatives 按源文件哈希复用，只有变化的图片才会重新处理。
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from image_derivatives import MANIFEST_NAME, file_sha256, referenced_images
+from report_renderer import LOGO1_NAME, LOGO2_NAME, resolve_image_path
+
+# 构建清单文件名后缀与版本
+BUILD_MANIFEST_SUFFIX = '.build.json'
+BUILD_MANIFEST_VERSION = 1
+
+# 影响报告输出的生成器源码（相对于本模块所在目录）
+GENERATOR_SOURCES = ('batch_generate.py', 'result_stream.py', 'report_renderer.py', 'report_model.py',
+                     'crop_engine.py', 'detection_merge.py', 'linked_assets.py', 'annotate.py')
+
+# 生成器版本
+@lru_cache(maxsize=None)
+def generator_version():
+    """返回渲染相关模块源码的sha256，源码变化即视为新版本"""
+    digest = hashlib.sha256()
+    script_dir = Path(__file__).resolve().parent
+    for name in GENERATOR_SOURCES:
+        digest.update(name.encode('utf-8'))
+        digest.update((script_dir / name).read_bytes())
+    return digest.hexdigest()
+
+# 构建清单路径
+def manifest_path_for(output_path):
+    return Path(str(output_path) + BUILD_MANIFEST_SUFFIX)
+
+# 文件指纹
+def file_fingerprint(path, previous=None):
+    """返回 {'size', 'mtime_ns', 'sha256'}，文件不存在时返回None
+
+    previous 为上次记录的指纹；大小和修改时间都未变时直接沿用其sha256，不读取文件。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        return previous
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': file_sha256(path)}
+
+# 统一渲染选项的格式（元组与列表等价）
+def _normalize_options(options):
+    return json.loads(json.dumps(options or {}, sort_keys=True))
+
+# 读取构建清单
+def load_build_manifest(output_path):
+    """读取输出旁的构建清单，不存在、损坏或版本不符时返回None"""
+    try:
+        with open(manifest_path_for(output_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != BUILD_MANIFEST_VERSION:
+        return None
+    return manifest
+
+# 写出构建清单（先写临时文件再替换）
+def _save_build_manifest(output_path, manifest):
+    path = manifest_path_for(output_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# 判断报告是否需要重建
+def is_up_to_date(output_path, options=None):
+    """输出存在、生成器版本和选项一致、且所有记录的输入内容未变时返回True
+
+    只有修改时间变化而内容相同的输入会刷新清单中的记录，下次检查不必再计算哈希。
+    """
+    if not Path(output_path).exists():
+        return False
+    manifest = load_build_manifest(output_path)
+    if manifest is None:
+        return False
+    if manifest.get('generator') != generator_version() or manifest.get('options') != _normalize_options(options):
+        return False
+
+    inputs = manifest.get('inputs', {})
+    refreshed = {}
+    for path, previous in inputs.items():
+        current = file_fingerprint(path, previous)
+        if (current or {}).get('sha256') != (previous or {}).get('sha256'):
+            return False
+        refreshed[path] = current
+
+    if refreshed != inputs:
+        _save_build_manifest(output_path, dict(manifest, inputs=refreshed))
+    return True
+
+# 收集一份报告的输入文件
+def report_inputs(result_path, result_data, assets_root, logo_dir=None):
+    """返回影响报告内容的全部输入文件路径：result、derivatives.json、引用的图片和logo
+
+    不存在的文件同样返回，记录为缺失；之后出现时会触发重建。
+    """
+    assets_root = Path(assets_root)
+    paths = [Path(result_path), assets_root / MANIFEST_NAME]
+    paths += [resolve_image_path(assets_root, rel_path) for rel_path in referenced_images(result_data)]
+    if logo_dir is not None:
+        paths += [Path(logo_dir) / LOGO1_NAME, Path(logo_dir) / LOGO2_NAME]
+    return list(dict.fromkeys(str(p.resolve()) for p in paths))
+
+# 记录输入文件指纹
+def snapshot_inputs(output_path, input_paths):
+    """在渲染前记录输入文件指纹，渲染期间被修改的文件在下次检查时会触发重建
+
+    同时删除旧的构建清单，渲染中途失败时输出不会被误判为最新。
+    """
+    previous = (load_build_manifest(output_path) or {}).get('inputs', {})
+    fingerprints = {path: file_fingerprint(path, previous.get(path)) for path in input_paths}
+    try:
+        os.remove(manifest_path_for(output_path))
+    except OSError:
+        pass
+    return fingerprints
+
+# 写出构建清单
+def record_build(output_path, fingerprints, options=None):
+    """渲染完成后在输出旁写出构建清单，fingerprints 来自 snapshot_inputs()"""
+    manifest = {
+        'version': BUILD_MANIFEST_VERSION,
+        'generator': generator_version(),
+        'options': _normalize_options(options),
+        'inputs': fingerprints,
+    }
+    _save_build_manifest(output_path, manifest)
+    return manifest
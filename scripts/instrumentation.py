@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""渲染流水线的分阶段计时与内存统计
+
+启用后，每份报告在 report_trace() 内渲染，各阶段（读取JSON、logo、各HTML区块、图片
+编码等）用 stage() 包裹，记录耗时、读取/写出字节数和tracemalloc峰值内存。每份报告
+结束时输出一行JSON日志，并可累计写入Prometheus文本格式文件（供node_exporter的
+textfile collector采集）。
+
+未启用时没有活动的trace：stage() 直接返回共享的空上下文，count_read() 只做一次
+线程局部变量查找，渲染输出和性能不受影响。
+
+tracemalloc 统计的是整个进程的内存，同一进程内多线程并发渲染时峰值会互相叠加；
+需要准确的单份峰值时请使用进程池（batch_generate）。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# 当前线程的活动trace
+_local = threading.local()
+
+# 全局配置，enable() 之前为None
+_config = None
+_config_lock = threading.Lock()
+
+class _NoopStage:
+    """未启用时 stage() 返回的空上下文"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_STAGE = _NoopStage()
+
+class _Stage:
+    """一个阶段的统计，支持嵌套"""
+    __slots__ = ('trace', 'name', 'start', 'bytes_read', 'bytes_written', 'mem_base', 'mem_peak')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        stack = self.trace.stack
+        if self.trace.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_base = self.mem_peak = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.trace.stack
+        stack.pop()
+        peak_bytes = 0
+        if self.trace.trace_memory:
+            self.mem_peak = max(self.mem_peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.mem_peak - self.mem_base
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, self.mem_peak)
+        if stack:
+            stack[-1].bytes_read += self.bytes_read
+            stack[-1].bytes_written += self.bytes_written
+        self.trace.record(self.name, elapsed, self.bytes_read, self.bytes_written, peak_bytes)
+        return False
+
+class ReportTrace:
+    """一份报告的全部阶段统计"""
+
+    def __init__(self, report_id, trace_memory=True):
+        self.report_id = report_id
+        self.trace_memory = trace_memory
+        self.stack = []
+        # 阶段名 -> {'seconds', 'bytes_read', 'bytes_written', 'peak_bytes', 'calls'}
+        self.stages = {}
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    # 累计阶段统计（同名阶段多次出现时相加，峰值取最大）
+    def record(self, name, seconds, bytes_read, bytes_written, peak_bytes):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {'seconds': 0.0, 'bytes_read': 0, 'bytes_written': 0, 'peak_bytes': 0, 'calls': 0}
+        entry['seconds'] += seconds
+        entry['bytes_read'] += bytes_read
+        entry['bytes_written'] += bytes_written
+        entry['peak_bytes'] = max(entry['peak_bytes'], peak_bytes)
+        entry['calls'] += 1
+
+    def count_read(self, nbytes):
+        if self.stack:
+            self.stack[-1].bytes_read += nbytes
+
+    def count_written(self, nbytes):
+        if self.stack:
+            self.stack[-1].bytes_written += nbytes
+
+class CountingWriter:
+    """包装文本输出，把写出的UTF-8字节数计入当前阶段"""
+
+    def __init__(self, out, trace):
+        self._out = out
+        self._trace = trace
+
+    def write(self, text):
+        self._trace.count_written(len(text.encode('utf-8')))
+        return self._out.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._out, name)
+
+# 启用统计
+def enable(log_file=None, prometheus_path=None, trace_memory=True):
+    """启用分阶段统计
+
+    log_file 为JSON日志输出路径（None或'-'表示标准错误）；prometheus_path 为Prometheus
+    文本文件路径，可包含 {pid} 占位符以便多进程各写一份；trace_memory 为False时不启动tracemalloc。
+    """
+    global _config
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    log_stream = sys.stderr if log_file in (None, '-') else open(log_file, 'a', encoding='utf-8')
+    if prometheus_path:
+        prometheus_path = prometheus_path.replace('{pid}', str(os.getpid()))
+    with _config_lock:
+        _config = {
+            'log_stream': log_stream,
+            'prometheus_path': prometheus_path,
+            'trace_memory': trace_memory,
+            'totals': {},
+            'reports': 0,
+            'report_seconds': 0.0,
+        }
+
+# 关闭统计
+def disable():
+    global _config
+    with _config_lock:
+        config, _config = _config, None
+    if config is not None and config['log_stream'] is not sys.stderr:
+        config['log_stream'].close()
+
+def enabled():
+    return _config is not None
+
+# 当前线程的活动trace
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+# 阶段上下文
+def stage(name):
+    """返回阶段上下文；没有活动trace时返回共享的空上下文"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NOOP_STAGE
+    return trace.stage(name)
+
+# 记录读取的字节数
+def count_read(nbytes):
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.count_read(nbytes)
+
+# 包装输出流
+def counting_writer(out):
+    """有活动trace时返回统计写出字节数的包装，否则原样返回out"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return out
+    return CountingWriter(out, trace)
+
+# 单份报告的统计范围
+@contextmanager
+def report_trace(report_id):
+    """在此范围内渲染的阶段归入同一份报告，结束时输出日志
+
+    未启用或已处于另一个report_trace内时不做任何事（外层负责输出）。
+    """
+    config = _config
+    if config is None or getattr(_local, 'trace', None) is not None:
+        yield None
+        return
+
+    trace = ReportTrace(report_id, config['trace_memory'])
+    _local.trace = trace
+    status = 'ok'
+    try:
+        with trace.stage('total'):
+            yield trace
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        _local.trace = None
+        _emit(config, trace, status)
+
+# 输出日志并更新Prometheus文件
+def _emit(config, trace, status):
+    total = trace.stages.pop('total')
+    line = {
+        'event': 'report_render',
+        'report': str(trace.report_id),
+        'status': status,
+        'pid': os.getpid(),
+        'seconds': round(total['seconds'], 6),
+        'bytes_read': total['bytes_read'],
+        'bytes_written': total['bytes_written'],
+        'peak_bytes': total['peak_bytes'],
+        'stages': {name: dict(entry, seconds=round(entry['seconds'], 6)) for name, entry in trace.stages.items()},
+    }
+    with _config_lock:
+        config['log_stream'].write(json.dumps(line, ensure_ascii=False) + '\n')
+        config['log_stream'].flush()
+        config['reports'] += 1
+        config['report_seconds'] += total['seconds']
+        for name, entry in trace.stages.items():
+            totals = config['totals'].setdefault(name, {'seconds': 0.0, 'bytes_read': 0, 'bytes_written': 0,
+                                                        'peak_bytes': 0, 'calls': 0})
+            totals['seconds'] += entry['seconds']
+            totals['bytes_read'] += entry['bytes_read']
+            totals['bytes_written'] += entry['bytes_written']
+            totals['peak_bytes'] = max(totals['peak_bytes'], entry['peak_bytes'])
+            totals['calls'] += entry['calls']
+        if config['prometheus_path']:
+            _write_prometheus(config)
+
+# 写出Prometheus文本格式（先写临时文件再替换）
+def _write_prometheus(config):
+    lines = [
+        '# HELP report_renders_total Reports rendered.',
+        '# TYPE report_renders_total counter',
+        f"report_renders_total {config['reports']}",
+        '# HELP report_render_seconds_total Wall time spent rendering reports.',
+        '# TYPE report_render_seconds_total counter',
+        f"report_render_seconds_total {config['report_seconds']:.6f}",
+    ]
+    metrics = (
+        ('report_stage_seconds_total', 'counter', 'Wall time per pipeline stage.', 'seconds'),
+        ('report_stage_calls_total', 'counter', 'Invocations per pipeline stage.', 'calls'),
+        ('report_stage_bytes_read_total', 'counter', 'Bytes read per pipeline stage.', 'bytes_read'),
+        ('report_stage_bytes_written_total', 'counter', 'Bytes written per pipeline stage.', 'bytes_written'),
+        ('report_stage_peak_bytes', 'gauge', 'Largest tracemalloc peak seen per pipeline stage.', 'peak_bytes'),
+    )
+    for metric, kind, help_text, key in metrics:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for name, totals in sorted(config['totals'].items()):
+            value = totals[key]
+            value = f'{value:.6f}' if isinstance(value, float) else str(value)
+            lines.append(f'{metric}{{stage="{name}"}} {value}')
+
+    path = config['prometheus_path']
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
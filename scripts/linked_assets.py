@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""外链资源模式：共享样式、logo和较大的图片写入公共资源目录，报告中以链接引用
+
+资源文件按内容哈希命名（如 report.3f2a9c1d0b7e4a65.css），内容不变则文件名不变，
+可以在服务器上设置 Cache-Control: public, max-age=31536000, immutable。多份报告共用
+同一份样式和logo，浏览器打开第N份报告时只需下载该报告自己的图片。
+小于 inline_threshold 字节的图片仍以data URI内联，省去一次请求。
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+# 默认内联阈值（字节）：不超过该大小的图片直接内联
+DEFAULT_INLINE_THRESHOLD = 8 * 1024
+
+# 资源文件名中内容哈希的长度
+HASH_LENGTH = 16
+
+class LinkedAssets:
+    """带内容哈希文件名的公共资源目录，线程安全，可在多份报告间共享
+
+    base_url 为资源目录的访问地址前缀；为None时，链接按报告文件与资源目录的相对路径生成。
+    """
+
+    def __init__(self, asset_dir, inline_threshold=DEFAULT_INLINE_THRESHOLD, base_url=None):
+        self.asset_dir = Path(asset_dir).resolve()
+        self.asset_dir.mkdir(parents=True, exist_ok=True)
+        self.inline_threshold = inline_threshold
+        self.base_url = base_url.rstrip('/') if base_url else None
+        # (绝对路径, mtime_ns, 大小) 或 内容键 -> 资源文件名
+        self._published = {}
+        self._lock = threading.Lock()
+
+    # 写出资源文件（已存在则跳过；先写临时文件再替换）
+    def _write(self, name, data):
+        target = self.asset_dir / name
+        if target.exists():
+            return
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    # 查找已发布的资源
+    def published(self, key):
+        with self._lock:
+            return self._published.get(key)
+
+    # 发布一段内容
+    def publish_bytes(self, data, stem, ext, key=None):
+        """写出 <stem>.<哈希><ext> 并返回文件名；key 用于跳过重复哈希（如logo的base64字符串）"""
+        if key is not None:
+            name = self.published(key)
+            if name is not None:
+                return name
+        name = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+        self._write(name, data)
+        if key is not None:
+            with self._lock:
+                self._published[key] = name
+        return name
+
+    # 发布一个文件
+    def publish_file(self, path):
+        """按文件内容哈希发布，返回资源文件名；文件未变化时不重新读取"""
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        name = self.published(key)
+        if name is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            name = self.publish_bytes(data, 'img', os.path.splitext(str(path))[1].lower() or '.png')
+            with self._lock:
+                self._published[key] = name
+        return name
+
+    # 是否应内联
+    def should_inline(self, size):
+        return size <= self.inline_threshold
+
+    # 某份报告中引用资源的地址
+    def url(self, name, report_dir=None):
+        if self.base_url is not None:
+            return f"{self.base_url}/{name}"
+        if report_dir is None:
+            return f"{self.asset_dir.name}/{name}"
+        return os.path.relpath(self.asset_dir / name, report_dir).replace(os.sep, '/')
+
+    # 绑定到一份报告
+    def for_report(self, output_path):
+        """返回用于某份报告的视图，链接相对于该报告所在目录"""
+        return ReportAssets(self, Path(output_path).resolve().parent if output_path is not None else None)
+
+class ReportAssets:
+    """LinkedAssets 针对单份报告的视图，由 write_report 使用"""
+    __slots__ = ('assets', 'report_dir')
+
+    def __init__(self, assets, report_dir):
+        self.assets = assets
+        self.report_dir = report_dir
+
+    def should_inline(self, size):
+        return self.assets.should_inline(size)
+
+    # 共享样式表地址
+    def css_url(self, css):
+        name = self.assets.publish_bytes(css.encode('utf-8'), 'report', '.css', key=('css', css))
+        return self.assets.url(name, self.report_dir)
+
+    # logo地址（logo以base64传入，按字符串本身记忆，每个进程只解码一次）
+    def logo_url(self, logo_base64):
+        key = ('logo', logo_base64)
+        name = self.assets.published(key)
+        if name is None:
+            name = self.assets.publish_bytes(base64.b64decode(logo_base64), 'logo', '.png', key=key)
+        return self.assets.url(name, self.report_dir)
+
+    # 图片文件地址
+    def file_url(self, path):
+        return self.assets.url(self.assets.publish_file(path), self.report_dir)
+
+    # 已编码图片数据的地址
+    def bytes_url(self, data, ext):
+        return self.assets.url(self.assets.publish_bytes(data, 'img', ext), self.report_dir)
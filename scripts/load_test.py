@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""报告服务器压力测试：模拟多台设备同时通过长连接请求报告
+
+每个并发连接依次请求给定路径（HTTP/1.1 keep-alive），统计吞吐量、延迟分位数、
+状态码和传输字节数。--revalidate 模拟浏览器带 If-None-Match 重新校验缓存。
+
+用法示例：
+    python load_test.py http://127.0.0.1:8000 /report.html /result.json -c 20 -n 2000
+    python load_test.py http://127.0.0.1:8000 /report.html -c 50 --duration 10 --revalidate
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from urllib.parse import urlsplit
+
+from batch_generate import percentile
+
+# 读取一个响应
+async def read_response(reader):
+    """返回 (状态码, 响应头, 正文)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return status, headers, body
+
+# 单个连接的请求循环
+async def _client(host, port, paths, deadline, budget, accept_encoding, revalidate, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    index = 0
+    try:
+        while time.perf_counter() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            path = paths[index % len(paths)]
+            index += 1
+            lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}']
+            if accept_encoding:
+                lines.append(f'Accept-Encoding: {accept_encoding}')
+            if revalidate and path in etags:
+                lines.append(f'If-None-Match: {etags[path]}')
+            start = time.perf_counter()
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+            status, headers, body = await read_response(reader)
+            results['latencies'].append(time.perf_counter() - start)
+            results['statuses'][status] = results['statuses'].get(status, 0) + 1
+            results['bytes'] += len(body)
+            if 'etag' in headers:
+                etags[path] = headers['etag']
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                results['reconnects'] += 1
+    finally:
+        writer.close()
+
+# 运行压力测试
+async def run_load_test(base_url, paths, connections=20, requests=1000, duration=None,
+                        accept_encoding='br, gzip', revalidate=False):
+    """返回统计信息字典；duration 不为None时按时长运行，否则共发送 requests 个请求"""
+    parts = urlsplit(base_url)
+    host = parts.hostname or '127.0.0.1'
+    port = parts.port or 80
+    results = {'latencies': [], 'statuses': {}, 'bytes': 0, 'reconnects': 0, 'errors': 0}
+    budget = [requests if duration is None else float('inf')]
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else float('inf')
+    outcomes = await asyncio.gather(*[
+        _client(host, port, paths, deadline, budget, accept_encoding, revalidate, results)
+        for _ in range(connections)
+    ], return_exceptions=True)
+    wall = time.perf_counter() - start
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            results['errors'] += 1
+            print(f"连接出错: {outcome!r}", file=sys.stderr)
+
+    latencies = sorted(results.pop('latencies'))
+    results.update({
+        'requests': len(latencies),
+        'wall_seconds': wall,
+        'requests_per_second': len(latencies) / wall if wall > 0 else 0.0,
+        'p50_seconds': percentile(latencies, 50),
+        'p95_seconds': percentile(latencies, 95),
+        'p99_seconds': percentile(latencies, 99),
+        'max_seconds': latencies[-1] if latencies else 0.0,
+    })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='报告服务器压力测试')
+    parser.add_argument('url', help='服务器地址，如 http://127.0.0.1:8000')
+    parser.add_argument('paths', nargs='+', help='依次请求的路径')
+    parser.add_argument('-c', '--connections', type=int, default=20, help='并发连接数')
+    parser.add_argument('-n', '--requests', type=int, default=1000, help='请求总数')
+    parser.add_argument('--duration', type=float, default=None, help='按时长运行（秒），忽略 -n')
+    parser.add_argument('--accept-encoding', default='br, gzip', help="Accept-Encoding 请求头（''表示不压缩）")
+    parser.add_argument('--revalidate', action='store_true', help='重复请求时带 If-None-Match')
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run_load_test(args.url, args.paths, args.connections, args.requests, args.duration,
+                                      args.accept_encoding, args.revalidate))
+    statuses = '，'.join(f'{status}: {count}' for status, count in sorted(stats['statuses'].items()))
+    print(f"共 {stats['requests']} 个请求（{args.connections} 个连接），状态码 {statuses}")
+    print(f"总耗时 {stats['wall_seconds']:.2f} 秒，吞吐量 {stats['requests_per_second']:.1f} 请求/秒，"
+          f"传输 {stats['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"延迟 p50 {stats['p50_seconds'] * 1000:.1f} ms，p95 {stats['p95_seconds'] * 1000:.1f} ms，"
+          f"p99 {stats['p99_seconds'] * 1000:.1f} ms，最大 {stats['max_seconds'] * 1000:.1f} ms")
+    return 0 if stats['errors'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""人群统计：汇总大量检测结果，按牙位统计患病率、置信度分布和疾病共现，输出JSON和HTML看板
+
+单份报告中的病变计数（update_report.generate_cause_analysis、report_renderer.generate_summary_html）
+逐条遍历即可；跨几十万份result的统计则先把全部病变展平为一组NumPy数组（每个病变一行：
+患者序号、牙位、标签编号、置信度、bbox），再用排序去重和 np.bincount 一次性分组计算：
+  - 各疾病在每个牙位的患病率（患有该病的患者数 / 患者总数）；
+  - 各疾病的置信度直方图、均值和 p10/p50/p90，以及框面积中位数；
+  - 疾病共现矩阵（同一颗牙 / 同一名患者），以及磨损与扭转同时出现的条件概率和提升度。
+输入与 batch_generate.py --stream 相同：result.json、JSONL（可为 .gz）或result数组的JSON文件，
+逐条读取并校验，内存只随病变数量增长。需要 NumPy。
+
+用法示例：
+    python population_stats.py 导出.jsonl.gz -o stats.json --html dashboard.html
+    python population_stats.py 结果目录 -o stats.json                    # 目录中的 result.json
+    python population_stats.py 导出目录 --pattern '*.jsonl.gz' --html dashboard.html
+"""
+
+import argparse
+import html
+import json
+import math
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，仅统计时需要
+    np = None
+
+from annotate import DEFAULT_LABEL_COLOR, LABEL_COLORS
+from batch_generate import collect_inputs
+from report_renderer import DISEASE_NAMES
+from result_stream import JSON_BACKEND, InvalidRecord, ResultSchemaError, iter_results
+
+# 置信度直方图的分箱数（0~1等分）
+DEFAULT_BINS = 20
+
+# 置信度分位数（最近秩法，与 batch_generate.percentile 一致）
+CONFIDENCE_PERCENTILES = (10, 50, 90)
+
+# 重点关注共现的一对疾病
+COOCCURRENCE_PAIR = ('tooth abrasion', 'twisted tooth')
+
+# 缺少 bbox 的病变使用的占位坐标
+MISSING_BOX = (math.nan,) * 4
+
+class DetectionTable:
+    """全部病变的列式存储：每个病变一行，labels[label[i]] 为第i个病变的标签"""
+    __slots__ = ('patient', 'fdi', 'label', 'confidence', 'bbox', 'labels', 'patient_count')
+
+    def __init__(self, patient, fdi, label, confidence, bbox, labels, patient_count):
+        self.patient = patient
+        self.fdi = fdi
+        self.label = label
+        self.confidence = confidence
+        self.bbox = bbox
+        self.labels = labels
+        self.patient_count = patient_count
+
+    def __len__(self):
+        return len(self.patient)
+
+# 读取病变
+def load_detections(paths, on_invalid=None):
+    """逐条读取result并展平为 DetectionTable；on_invalid 的含义同 result_stream.iter_results
+
+    读取时追加到 array.array 中（每个病变只占二十多字节），读完后零拷贝转换为NumPy数组。
+    没有病变的患者同样计入患者总数。
+    """
+    if np is None:
+        raise RuntimeError('人群统计需要安装 NumPy：pip install numpy')
+
+    patient = array('i')
+    fdi = array('h')
+    label = array('h')
+    confidence = array('f')
+    bbox = array('f')
+    label_ids = {}
+    patient_count = 0
+    for record in iter_results(paths, on_invalid):
+        # 先换算整条记录的牙位编号，无法放入列数组的记录与格式错误的记录同样处理，不留下半条记录
+        teeth = record.data.get('diseased_teeth', ())
+        try:
+            record_fdi = array('h', [int(tooth['tooth_fdi']) for tooth in teeth])
+        except (ValueError, OverflowError) as e:
+            invalid = InvalidRecord(record.source, record.position, f'牙位编号无法统计: {e}')
+            if on_invalid is None:
+                raise ResultSchemaError(str(invalid))
+            on_invalid(invalid)
+            continue
+        for tooth_fdi, tooth in zip(record_fdi, teeth):
+            for disease in tooth.get('diseases', ()):
+                patient.append(patient_count)
+                fdi.append(tooth_fdi)
+                label.append(label_ids.setdefault(disease['label'], len(label_ids)))
+                score = disease.get('confidence')
+                confidence.append(math.nan if score is None else score)
+                box = disease.get('bbox')
+                bbox.extend(MISSING_BOX if box is None else box)
+        patient_count += 1
+
+    return DetectionTable(
+        np.frombuffer(patient, dtype=np.int32),
+        np.frombuffer(fdi, dtype=np.int16),
+        np.frombuffer(label, dtype=np.int16),
+        np.frombuffer(confidence, dtype=np.float32),
+        np.frombuffer(bbox, dtype=np.float32).reshape(-1, 4),
+        list(label_ids),
+        patient_count,
+    )
+
+# 排序去重
+def sorted_unique(keys):
+    """返回排序后去重的整数键（比 np.unique 的哈希去重快，且结果有序）"""
+    keys = np.sort(keys)
+    if keys.size:
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys
+
+# 有序键的组下标
+def run_index(sorted_keys):
+    """相同的键编为同一下标（0, 0, 1, 2, 2, ...），返回 (下标数组, 组数)"""
+    if not sorted_keys.size:
+        return sorted_keys.astype(np.int64), 0
+    index = np.cumsum(np.concatenate(([False], sorted_keys[1:] != sorted_keys[:-1])))
+    return index, int(index[-1]) + 1
+
+# 分组分位数
+def group_percentiles(groups, values, group_count, pcts):
+    """返回 (组数, 分位数个数) 的数组；各组按最近秩取值，空组为NaN
+
+    按组号（小整数）稳定排序一次，再对每组用 np.partition 选出所需名次，不必对数值整体排序。
+    """
+    result = np.full((group_count, len(pcts)), np.nan)
+    grouped = values[np.argsort(groups, kind='stable')]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+    for g in np.flatnonzero(counts):
+        count = int(counts[g])
+        ranks = [max(1, -(-count * pct // 100)) - 1 for pct in pcts]
+        segment = np.partition(grouped[starts[g]:starts[g] + count], ranks)
+        result[g] = segment[ranks]
+    return result
+
+# 共现矩阵
+def co_occurrence(owners, labels, label_count):
+    """owners/labels 为去重后的 (所有者, 标签) 对，返回 label_count × label_count 的计数矩阵
+
+    对角线为患有该病的所有者数，(i, j) 为同时患有 i 和 j 的所有者数。owners 须已排序。
+    """
+    owner_index, owner_count = run_index(owners)
+    presence = np.zeros((owner_count, label_count), dtype=np.int32)
+    presence[owner_index, labels] = 1
+    return presence.T @ presence
+
+# 保留指定位数的小数（NaN转为None）
+def _rounded(value, digits=4):
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+# 计算统计
+def summarize(table, bins=DEFAULT_BINS):
+    """返回可直接写出为JSON的统计字典"""
+    label_count = max(len(table.labels), 1)
+    patients = max(table.patient_count, 1)
+    label = table.label.astype(np.int64)
+
+    # 牙位编号压缩为连续下标（编号为两位数，查表即可），(患者, 牙位) 组成牙齿键
+    fdi = table.fdi.astype(np.int64)
+    fdi_codes = np.flatnonzero(np.bincount(fdi)) if fdi.size else fdi
+    lookup = np.zeros(int(fdi_codes[-1]) + 1 if fdi_codes.size else 1, dtype=np.int64)
+    lookup[fdi_codes] = np.arange(len(fdi_codes))
+    fdi_index = lookup[fdi]
+    fdi_count = max(len(fdi_codes), 1)
+    tooth_key = table.patient.astype(np.int64) * fdi_count + fdi_index
+
+    # (牙齿, 标签) 与 (患者, 标签) 去重：同一颗牙同一病变的多个框只计一次
+    tooth_pairs = sorted_unique(tooth_key * label_count + label)
+    pair_tooth, pair_label = np.divmod(tooth_pairs, label_count)
+    pair_fdi = pair_tooth % fdi_count
+    patient_pairs = sorted_unique(table.patient.astype(np.int64) * label_count + label)
+    pair_patient, patient_label = np.divmod(patient_pairs, label_count)
+
+    detections = np.bincount(label, minlength=label_count)
+    teeth = np.bincount(pair_label, minlength=label_count)
+    label_patients = np.bincount(patient_label, minlength=label_count)
+    by_fdi = np.bincount(pair_label * fdi_count + pair_fdi,
+                         minlength=label_count * fdi_count).reshape(label_count, fdi_count)
+
+    # 置信度：直方图、均值、分位数（缺少置信度的病变不计入）
+    scored = ~np.isnan(table.confidence)
+    scores = table.confidence[scored].astype(np.float64)
+    scored_label = label[scored]
+    bin_index = np.minimum((scores * bins).astype(np.int64), bins - 1)
+    histogram = np.bincount(scored_label * bins + bin_index,
+                            minlength=label_count * bins).reshape(label_count, bins)
+    scored_count = np.bincount(scored_label, minlength=label_count)
+    means = np.bincount(scored_label, weights=scores, minlength=label_count) / np.maximum(scored_count, 1)
+    quantiles = group_percentiles(scored_label, scores, label_count, CONFIDENCE_PERCENTILES)
+
+    # 框面积（原图像素²）中位数
+    boxed = ~np.isnan(table.bbox).any(axis=1)
+    boxes = table.bbox[boxed].astype(np.float64)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    median_areas = group_percentiles(label[boxed], areas, label_count, (50,))[:, 0]
+
+    labels = []
+    for i, name in enumerate(table.labels):
+        labels.append({
+            'label': name,
+            'name': DISEASE_NAMES.get(name, name),
+            'detections': int(detections[i]),
+            'teeth': int(teeth[i]),
+            'patients': int(label_patients[i]),
+            'prevalence': _rounded(label_patients[i] / patients),
+            'confidence': {
+                'count': int(scored_count[i]),
+                'mean': _rounded(means[i]) if scored_count[i] else None,
+                **{f'p{pct}': _rounded(quantiles[i, j]) for j, pct in enumerate(CONFIDENCE_PERCENTILES)},
+                'histogram': histogram[i].tolist(),
+            },
+            'median_box_area': _rounded(median_areas[i], 1),
+        })
+
+    prevalence_by_fdi = {}
+    for i, name in enumerate(table.labels):
+        columns = np.flatnonzero(by_fdi[i])
+        prevalence_by_fdi[name] = {
+            str(fdi_codes[c]): {'patients': int(by_fdi[i, c]), 'prevalence': _rounded(by_fdi[i, c] / patients)}
+            for c in columns
+        }
+
+    tooth_matrix = co_occurrence(pair_tooth, pair_label, label_count)
+    patient_matrix = co_occurrence(pair_patient, patient_label, label_count)
+
+    return {
+        'patients': table.patient_count,
+        'detections': len(table),
+        'teeth': run_index(pair_tooth)[1],
+        'fdi': [int(code) for code in fdi_codes],
+        'confidence_bins': np.linspace(0, 1, bins + 1).round(4).tolist(),
+        'labels': labels,
+        'prevalence_by_fdi': prevalence_by_fdi,
+        'co_occurrence': {
+            'labels': list(table.labels),
+            'teeth': tooth_matrix[:len(table.labels), :len(table.labels)].tolist(),
+            'patients': patient_matrix[:len(table.labels), :len(table.labels)].tolist(),
+        },
+        'pair': pair_statistics(table.labels, tooth_matrix, patient_matrix, table.patient_count),
+    }
+
+# 重点疾病对的共现
+def pair_statistics(labels, tooth_matrix, patient_matrix, patient_count, pair=COOCCURRENCE_PAIR):
+    """返回两种疾病在同一颗牙 / 同一名患者上同时出现的计数、条件概率和提升度；任一疾病未出现时返回None
+
+    牙齿层面只有患病的牙齿出现在result中，缺少健康牙齿的总数，因此只给出条件概率；
+    患者层面另给出提升度（同时患病的比例 / 两者独立时的期望比例）。
+    """
+    if pair[0] not in labels or pair[1] not in labels:
+        return None
+    a, b = labels.index(pair[0]), labels.index(pair[1])
+    stats = {'labels': list(pair)}
+    for level, matrix in (('teeth', tooth_matrix), ('patients', patient_matrix)):
+        both, first, second = int(matrix[a, b]), int(matrix[a, a]), int(matrix[b, b])
+        stats[level] = {
+            'both': both,
+            'first': first,
+            'second': second,
+            'p_second_given_first': _rounded(both / first) if first else None,
+            'p_first_given_second': _rounded(both / second) if second else None,
+        }
+    people = stats['patients']
+    if patient_count and people['first'] and people['second']:
+        people['lift'] = _rounded(people['both'] * patient_count / (people['first'] * people['second']))
+    return stats
+
+# 疾病颜色
+def _label_color(label, alpha=1.0):
+    r, g, b = LABEL_COLORS.get(label, DEFAULT_LABEL_COLOR)
+    return f'rgba({r}, {g}, {b}, {alpha:.3f})'
+
+# 数值（缺失时显示破折号）
+def _value(value):
+    return '—' if value is None else value
+
+# 百分比
+def _percent(value):
+    return '—' if value is None else f'{value * 100:.1f}%'
+
+# 置信度直方图（内联SVG）
+def _histogram_svg(label, counts, width=320, height=90):
+    peak = max(max(counts), 1)
+    bar = width / len(counts)
+    bars = ''.join(
+        f'<rect x="{i * bar:.1f}" y="{height - c / peak * height:.1f}" width="{bar - 1:.1f}" '
+        f'height="{c / peak * height:.1f}"><title>{i / len(counts):.2f}–{(i + 1) / len(counts):.2f}：{c}</title></rect>'
+        for i, c in enumerate(counts) if c
+    )
+    return (f'<svg viewBox="0 0 {width} {height + 14}" width="{width}" height="{height + 14}" '
+            f'fill="{_label_color(label)}">{bars}'
+            f'<text x="0" y="{height + 12}" font-size="10" fill="#666">0</text>'
+            f'<text x="{width}" y="{height + 12}" font-size="10" fill="#666" text-anchor="end">1</text></svg>')
+
+# 共现矩阵表格
+def _matrix_table(names, matrix):
+    header = ''.join(f'<th>{html.escape(name)}</th>' for name in names)
+    rows = ''.join(
+        f'<tr><th>{html.escape(name)}</th>' + ''.join(f'<td>{count}</td>' for count in row) + '</tr>'
+        for name, row in zip(names, matrix)
+    )
+    return f'<table><tr><th></th>{header}</tr>{rows}</table>'
+
+# 生成HTML看板
+def render_dashboard(summary):
+    """返回自包含的HTML看板（无外部资源）"""
+    labels = summary['labels']
+    names = [entry['name'] for entry in labels]
+    fdi_columns = [str(code) for code in summary['fdi']]
+
+    overview_rows = ''.join(
+        f"<tr><th><span class=\"swatch\" style=\"background: {_label_color(e['label'])}\"></span>"
+        f"{html.escape(e['name'])}</th><td>{e['detections']}</td><td>{e['teeth']}</td><td>{e['patients']}</td>"
+        f"<td>{_percent(e['prevalence'])}</td><td>{_value(e['confidence']['mean'])}</td>"
+        f"<td>{_value(e['confidence']['p50'])}</td><td>{_value(e['median_box_area'])}</td></tr>"
+        for e in labels
+    )
+
+    heat_rows = ''
+    for e in labels:
+        by_fdi = summary['prevalence_by_fdi'].get(e['label'], {})
+        peak = max((cell['prevalence'] for cell in by_fdi.values()), default=0) or 1
+        cells = ''
+        for code in fdi_columns:
+            cell = by_fdi.get(code)
+            if cell is None:
+                cells += '<td></td>'
+                continue
+            cells += (f"<td style=\"background: {_label_color(e['label'], 0.1 + 0.8 * cell['prevalence'] / peak)}\" "
+                      f"title=\"{code}号牙 {html.escape(e['name'])}：{cell['patients']} 人\">"
+                      f"{cell['prevalence'] * 100:.1f}</td>")
+        heat_rows += f"<tr><th>{html.escape(e['name'])}</th>{cells}</tr>"
+    fdi_header = ''.join(f'<th>{code}</th>' for code in fdi_columns)
+
+    histograms = ''.join(
+        f"<figure><figcaption>{html.escape(e['name'])}（{e['confidence']['count']} 处，"
+        f"p10 {_value(e['confidence']['p10'])} / p50 {_value(e['confidence']['p50'])} / "
+        f"p90 {_value(e['confidence']['p90'])}）</figcaption>"
+        f"{_histogram_svg(e['label'], e['confidence']['histogram'])}</figure>"
+        for e in labels
+    )
+
+    pair_html = ''
+    pair = summary.get('pair')
+    if pair:
+        first, second = (DISEASE_NAMES.get(label, label) for label in pair['labels'])
+        teeth, people = pair['teeth'], pair['patients']
+        pair_html = (
+            f'<p>同一颗牙同时存在{first}和{second}：<strong>{teeth["both"]}</strong> 颗；'
+            f'{first}的牙齿中 {_percent(teeth["p_second_given_first"])} 同时{second}，'
+            f'{second}的牙齿中 {_percent(teeth["p_first_given_second"])} 同时{first}。</p>'
+            f'<p>同一名患者同时存在：<strong>{people["both"]}</strong> 人；'
+            f'{first}患者中 {_percent(people["p_second_given_first"])} 同时{second}，提升度 {_value(people.get("lift"))}'
+            f'（大于1表示两者倾向于同时出现）。</p>'
+        )
+
+    return f'''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>人群口腔健康统计</title>
+<style>
+  body {{ font-family: -apple-system, "PingFang SC", "Microsoft YaHei", sans-serif; color: #333; margin: 0; background: #F5F7F0; }}
+  main {{ max-width: 1200px; margin: 0 auto; padding: 24px; }}
+  h1 {{ color: #558B2F; }}
+  section {{ background: #fff; border-radius: 8px; padding: 16px 20px; margin-bottom: 20px; box-shadow: 0 1px 3px rgba(0,0,0,0.08); }}
+  h2 {{ font-size: 18px; color: #558B2F; margin-top: 0; }}
+  .cards {{ display: flex; gap: 16px; flex-wrap: wrap; }}
+  .card {{ flex: 1; min-width: 140px; background: #F9FBE7; border-left: 4px solid #8BC34A; padding: 10px 14px; }}
+  .card strong {{ display: block; font-size: 24px; color: #33691E; }}
+  .scroll {{ overflow-x: auto; }}
+  table {{ border-collapse: collapse; font-size: 13px; }}
+  th, td {{ border: 1px solid #E0E0E0; padding: 4px 8px; text-align: right; white-space: nowrap; }}
+  th {{ background: #FAFAFA; text-align: left; }}
+  .swatch {{ display: inline-block; width: 10px; height: 10px; margin-right: 6px; border-radius: 2px; }}
+  figure {{ display: inline-block; margin: 0 24px 12px 0; }}
+  figcaption {{ font-size: 13px; margin-bottom: 4px; }}
+  .note {{ color: #888; font-size: 12px; }}
+</style>
+</head>
+<body>
+<main>
+<h1>📊 人群口腔健康统计</h1>
+<section>
+  <div class="cards">
+    <div class="card"><strong>{summary['patients']}</strong>患者</div>
+    <div class="card"><strong>{summary['teeth']}</strong>患病牙齿</div>
+    <div class="card"><strong>{summary['detections']}</strong>病变</div>
+    <div class="card"><strong>{summary.get('invalid', 0)}</strong>格式错误（未计入）</div>
+  </div>
+</section>
+<section>
+  <h2>各疾病概况</h2>
+  <div class="scroll"><table>
+    <tr><th>疾病</th><th>病变</th><th>牙齿</th><th>患者</th><th>患病率</th><th>平均置信度</th><th>置信度中位数</th><th>框面积中位数（像素²）</th></tr>
+    {overview_rows}
+  </table></div>
+</section>
+<section>
+  <h2>按牙位患病率（%）</h2>
+  <div class="scroll"><table><tr><th></th>{fdi_header}</tr>{heat_rows}</table></div>
+  <p class="note">患病率 = 该牙位患有该病的患者数 / 患者总数；颜色深浅按每种疾病的最高值归一化。</p>
+</section>
+<section>
+  <h2>置信度分布</h2>
+  {histograms}
+</section>
+<section>
+  <h2>疾病共现</h2>
+  {pair_html}
+  <div class="cards">
+    <div><p>同一颗牙（颗）</p>{_matrix_table(names, summary['co_occurrence']['teeth'])}</div>
+    <div><p>同一名患者（人）</p>{_matrix_table(names, summary['co_occurrence']['patients'])}</div>
+  </div>
+</section>
+</main>
+</body>
+</html>
+'''
+
+# 写出文件
+def _write_text(path, text):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='汇总大量检测结果的人群统计')
+    parser.add_argument('sources', nargs='+',
+                        help='result.json、JSONL/JSON数据文件（可为.gz），或包含它们的目录')
+    parser.add_argument('--pattern', default='result.json', help='目录中匹配数据文件的通配符（如 *.jsonl.gz）')
+    parser.add_argument('-o', '--output', default=None, help='统计JSON输出路径')
+    parser.add_argument('--html', default=None, help='HTML看板输出路径')
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS, help='置信度直方图分箱数')
+    args = parser.parse_args(argv)
+    if not args.output and not args.html:
+        parser.error('至少需要 -o 或 --html 之一')
+
+    paths = []
+    for source in map(Path, args.sources):
+        if source.is_dir():
+            paths.extend(p for p, _ in collect_inputs(source, args.pattern))
+        else:
+            paths.append(source)
+
+    invalid = []
+
+    def report_invalid(record):
+        invalid.append(record)
+        print(f"跳过格式错误的记录: {record}", file=sys.stderr)
+
+    start = time.perf_counter()
+    table = load_detections(paths, report_invalid)
+    loaded = time.perf_counter()
+    summary = summarize(table, args.bins)
+    summary['invalid'] = len(invalid)
+    aggregated = time.perf_counter()
+
+    if args.output:
+        _write_text(args.output, json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.html:
+        _write_text(args.html, render_dashboard(summary))
+    print(f"患者 {summary['patients']} 名，病变 {summary['detections']} 处，格式错误 {len(invalid)} 份")
+    print(f"读取 {loaded - start:.2f} 秒（{JSON_BACKEND}），统计 {aggregated - loaded:.2f} 秒")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""为静态部署的文本资源生成预压缩文件（.gz / .br），供服务器直接返回压缩版本
+
+对目录中的 HTML、CSS、JS、JSON、SVG 等文本文件，以最高压缩级别在旁边写出
+report.html.gz 和 report.html.br（nginx 的 gzip_static/brotli_static、Netlify 等可直接使用）。
+多个文件并行压缩（zlib和brotli压缩时释放GIL，使用线程池即可）。
+
+压缩结果是确定的：gzip头中的时间戳固定为0、不写文件名，同样的输入总是得到同样的字节；
+压缩文件的修改时间设为与源文件相同，内容未变时不会重写，ETag在重复构建间保持不变。
+压缩后不比原文件小的不生成（并删除旧的压缩文件）。
+.br 需要 brotli（pip install brotli），未安装时只生成 .gz；此时源文件已变化的旧 .br 会被删除，
+服务器不会再返回过期的压缩内容。
+
+用法示例：
+    python precompress.py ..
+    python precompress.py 输出目录 -j 8
+"""
+
+import argparse
+import gzip
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，仅生成 .br 时需要
+    brotli = None
+
+from incremental_build import BUILD_MANIFEST_SUFFIX
+
+# 需要预压缩的文本资源扩展名
+TEXT_EXTENSIONS = ('.html', '.htm', '.css', '.js', '.mjs', '.json', '.svg', '.txt', '.xml', '.webmanifest')
+
+# gzip压缩
+def gzip_bytes(data):
+    """最高级别gzip压缩，头部时间戳为0，输出只取决于输入"""
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+# brotli压缩
+def brotli_bytes(data):
+    if brotli is None:
+        raise RuntimeError('生成 .br 需要安装 brotli：pip install brotli')
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11, lgwin=24)
+
+# 扩展名 -> 压缩函数
+ENCODERS = {
+    '.gz': gzip_bytes,
+    '.br': brotli_bytes,
+}
+
+# 当前可用的压缩格式
+def available_encodings():
+    return [ext for ext in ENCODERS if ext != '.br' or brotli is not None]
+
+# 是否为需要预压缩的文本资源
+def is_text_asset(path):
+    name = os.path.basename(str(path))
+    if name.startswith('.') or name.endswith('.tmp') or name.endswith(BUILD_MANIFEST_SUFFIX):
+        return False
+    return os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS
+
+# 原子写出并同步修改时间
+def _write_sibling(target, data, st):
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp_path, target)
+
+# 预压缩单个文件
+def precompress_file(path, encodings=None):
+    """为path生成各格式的压缩文件，返回 {扩展名: 状态}
+
+    状态为 'written'（已写出）、'unchanged'（已是最新）、'skipped'（压缩后不更小）或
+    'removed'（本次不生成的格式，旧压缩文件已过期而删除）。
+    压缩文件的修改时间与源文件一致时视为最新，不读取源文件。
+    """
+    path = str(path)
+    encodings = available_encodings() if encodings is None else encodings
+    st = os.stat(path)
+    statuses = {}
+    for ext in ENCODERS:
+        if ext in encodings:
+            continue
+        try:
+            existing = os.stat(path + ext)
+        except OSError:
+            continue
+        if existing.st_mtime_ns != st.st_mtime_ns:
+            os.remove(path + ext)
+            statuses[ext] = 'removed'
+    data = None
+    for ext in encodings:
+        target = path + ext
+        try:
+            existing = os.stat(target)
+        except OSError:
+            existing = None
+        if existing is not None and existing.st_mtime_ns == st.st_mtime_ns:
+            statuses[ext] = 'unchanged'
+            continue
+
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        compressed = ENCODERS[ext](data)
+        if len(compressed) >= len(data):
+            if existing is not None:
+                os.remove(target)
+            statuses[ext] = 'skipped'
+            continue
+
+        if existing is not None and existing.st_size == len(compressed):
+            with open(target, 'rb') as f:
+                if f.read() == compressed:
+                    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    statuses[ext] = 'unchanged'
+                    continue
+        _write_sibling(target, compressed, st)
+        statuses[ext] = 'written'
+    return statuses
+
+# 收集目录中的文本资源
+def collect_text_assets(root):
+    """递归收集root下的文本资源，跳过隐藏目录（如 .asset-cache）和 __pycache__"""
+    root = Path(root)
+    if root.is_file():
+        return [root] if is_text_asset(root) else []
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d != '__pycache__')
+        found.extend(Path(dirpath) / name for name in sorted(filenames) if is_text_asset(name))
+    return found
+
+# 并行预压缩
+def precompress_paths(paths, workers=None, encodings=None):
+    """并行预压缩给定文件，返回各状态的计数"""
+    encodings = available_encodings() if encodings is None else encodings
+    stats = {'files': 0, 'written': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+    paths = list(paths)
+    if not paths:
+        return stats
+    with ThreadPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(paths))) as executor:
+        for statuses in executor.map(lambda p: precompress_file(p, encodings), paths):
+            stats['files'] += 1
+            for status in statuses.values():
+                stats[status] += 1
+    return stats
+
+# 预压缩整个目录
+def precompress_tree(root, workers=None, encodings=None):
+    return precompress_paths(collect_text_assets(root), workers, encodings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为文本资源生成 .gz/.br 预压缩文件')
+    parser.add_argument('paths', nargs='+', help='要处理的目录或文件')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='并行线程数（默认等于CPU核数）')
+    parser.add_argument('--no-brotli', action='store_true', help='只生成 .gz')
+    args = parser.parse_args(argv)
+
+    encodings = ['.gz'] if args.no_brotli else available_encodings()
+    if not args.no_brotli and brotli is None:
+        print("未安装 brotli，只生成 .gz（pip install brotli）", file=sys.stderr)
+    paths = [p for root in args.paths for p in collect_text_assets(root)]
+    stats = precompress_paths(paths, args.workers, encodings)
+    print(f"共 {stats['files']} 个文件：写出 {stats['written']} 个压缩文件，"
+          f"{stats['unchanged']} 个未变化，{stats['skipped']} 个因压缩后不更小而跳过")
+    if stats['removed']:
+        print(f"删除 {stats['removed']} 个源文件已变化、本次未重新生成的旧压缩文件")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""按需渲染服务：在报告服务器上提供渲染接口，请求时从保存的result生成报告
+
+    GET  /render/<结果ID>    渲染 结果目录/<ID>/result.json（或 结果目录/<ID>.json）
+    POST /render            渲染请求体中的result JSON（图片相对于结果目录查找）
+
+报告中的图片地址相对于result所在目录，渲染结果以 <base href="/<所在目录>/"> 指回该目录，
+图片由同一服务器的静态文件提供。
+
+渲染在进程池中进行，不阻塞事件循环；每个工作进程只读取一次logo。渲染结果（HTML及其
+gzip压缩版本）缓存在LRU中，键为result内容的sha256、模板版本（渲染相关源码的哈希，见
+incremental_build.generator_version）和图片所在目录，result或模板变化后自然失效。同一份尚未缓存的报告
+被并发请求时只渲染一次，其余请求等待同一个结果：候诊室里所有人同时扫码打开同一份报告时，
+只有第一个请求需要等待渲染。
+
+假定图片随result一同写入、之后不再修改；图片单独更新时请同时更新result。
+
+用法示例：
+    python render_service.py 结果目录 --port 8000 -j 4
+    curl http://127.0.0.1:8000/render/病例001
+    curl -X POST --data-binary @result.json http://127.0.0.1:8000/render
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+import batch_generate
+from incremental_build import file_fingerprint, generator_version
+from precompress import gzip_bytes
+from report_server import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    REVALIDATE_CACHE_CONTROL,
+    BadRequest,
+    ReportServer,
+    Response,
+    accepted_encodings,
+    error_response,
+    etag_matches,
+    lan_address,
+)
+
+# 默认缓存容量（字节，按HTML与gzip版本的大小之和计）
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 结果ID：字母、数字、中文、下划线、连字符和点，不能以点开头
+RESULT_ID_PATTERN = re.compile(r'^\w[\w.-]*$')
+
+# 工作进程中渲染并压缩
+def _render_entry(result_source, data_dir, base_href='/'):
+    """返回 (HTML字节串, gzip字节串)；页面的相对地址以 base_href 为基准解析"""
+    html = batch_generate._render_html(result_source, data_dir)
+    html = html.replace('<head>\n', f'<head>\n  <base href="{base_href}">\n', 1).encode('utf-8')
+    return html, gzip_bytes(html)
+
+class RenderCache:
+    """按字节数限制容量的LRU缓存：键 -> (HTML, gzip)"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        size = len(entry[0]) + len(entry[1])
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            old = self._entries.pop(key)
+            self.bytes -= len(old[0]) + len(old[1])
+        self._entries[key] = entry
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= len(old[0]) + len(old[1])
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+class RenderService:
+    """挂载到 ReportServer 上的按需渲染接口"""
+
+    def __init__(self, results_dir, workers=None, logo_dir=None, cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.results_dir = Path(results_dir).resolve()
+        self.workers = workers or os.cpu_count() or 1
+        self.logo_dir = logo_dir
+        self.cache_dir = cache_dir
+        self.cache = RenderCache(cache_bytes)
+        self.renders = 0
+        self.coalesced = 0
+        self.failures = 0
+        # 缓存键 -> 进行中的渲染（asyncio.Future）
+        self._inflight = {}
+        # result路径 -> 上次的文件指纹（大小和修改时间未变时不重新计算哈希）
+        self._fingerprints = {}
+        self._executor = None
+
+    # 挂载到服务器
+    def install(self, server):
+        server.routes['/render'] = self.handle_post
+        server.prefix_routes.append(('/render/', self.handle_get))
+        server.metrics.collectors.append(self.metric_lines)
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=batch_generate._init_worker,
+                                             initargs=(self.logo_dir, self.cache_dir))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # 缓存键：result内容哈希 + 模板版本 + 图片所在目录（内容相同的result可能引用不同目录中的图片）
+    @staticmethod
+    def cache_key(result_sha256, data_dir):
+        return f"{result_sha256}:{generator_version()}:{data_dir}"
+
+    # 查找结果ID对应的result文件
+    def result_path_for(self, result_id):
+        if not RESULT_ID_PATTERN.match(result_id):
+            return None
+        for candidate in (self.results_dir / result_id / 'result.json', self.results_dir / f'{result_id}.json'):
+            if candidate.is_file():
+                return candidate
+        return None
+
+    # 图片所在目录在静态文件中的地址
+    def base_href_for(self, data_dir):
+        """渲染结果挂在 /render/ 下，页面中相对于result目录的图片地址需要以该目录为基准"""
+        rel = Path(data_dir).resolve().relative_to(self.results_dir).as_posix()
+        return '/' if rel == '.' else f'/{quote(rel)}/'
+
+    # 获取渲染结果（缓存、合并并发请求）
+    async def render(self, key, result_source, data_dir):
+        """返回 ((HTML, gzip), 来源)，来源为 'hit'、'miss' 或 'coalesced'"""
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry, 'hit'
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), 'coalesced'
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        try:
+            entry = await loop.run_in_executor(self._executor, _render_entry, result_source, str(data_dir),
+                                               self.base_href_for(data_dir))
+        except Exception as e:
+            self.failures += 1
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            self.renders += 1
+            self.cache.put(key, entry)
+            future.set_result(entry)
+            return entry, 'miss'
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                future.cancel()
+
+    # 组装响应（支持 If-None-Match 与 gzip）
+    @staticmethod
+    def respond(request, key, entry, source):
+        html, gz = entry
+        etag = f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+        headers = {
+            'Content-Type': 'text/html; charset=utf-8',
+            'Cache-Control': REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+            'X-Render-Cache': source,
+        }
+        use_gzip = 'gzip' in accepted_encodings(request.headers.get('accept-encoding', '')) and len(gz) < len(html)
+        if use_gzip:
+            etag = f'{etag[:-1]}-gzip"'
+            headers['Content-Encoding'] = 'gzip'
+        headers['ETag'] = etag
+        if etag_matches(request.headers.get('if-none-match', ''), etag):
+            return Response(304, headers)
+        return Response(200, headers, gz if use_gzip else html)
+
+    async def _render_response(self, request, key, result_source, data_dir):
+        try:
+            entry, source = await self.render(key, result_source, data_dir)
+        except ValueError as e:
+            raise BadRequest(400, f'result 格式错误: {e}')
+        return self.respond(request, key, entry, source)
+
+    # GET /render/<结果ID>
+    async def handle_get(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return Response(405, {'Allow': 'GET, HEAD'}, b'')
+        result_path = self.result_path_for(request.path[len('/render/'):].strip('/'))
+        if result_path is None:
+            return error_response(404, '未找到该结果')
+
+        path = str(result_path)
+        previous = self._fingerprints.get(path)
+        fingerprint = await asyncio.get_running_loop().run_in_executor(None, file_fingerprint, path, previous)
+        if fingerprint is None:
+            return error_response(404, '未找到该结果')
+        self._fingerprints[path] = fingerprint
+        key = self.cache_key(fingerprint['sha256'], result_path.parent)
+        return await self._render_response(request, key, path, result_path.parent)
+
+    # POST /render
+    async def handle_post(self, request):
+        if request.method != 'POST':
+            return Response(405, {'Allow': 'POST'}, b'')
+        if not request.body:
+            return error_response(400, '请求体为空')
+        key = self.cache_key(hashlib.sha256(request.body).hexdigest(), self.results_dir)
+        return await self._render_response(request, key, request.body, self.results_dir)
+
+    def metric_lines(self):
+        return [
+            '# HELP report_render_cache_requests_total Render requests by cache outcome.',
+            '# TYPE report_render_cache_requests_total counter',
+            f'report_render_cache_requests_total{{outcome="hit"}} {self.cache.hits}',
+            f'report_render_cache_requests_total{{outcome="coalesced"}} {self.coalesced}',
+            f'report_render_cache_requests_total{{outcome="render"}} {self.renders}',
+            f'report_render_cache_requests_total{{outcome="failed"}} {self.failures}',
+            '# HELP report_render_cache_entries Reports held in the render cache.',
+            '# TYPE report_render_cache_entries gauge',
+            f'report_render_cache_entries {len(self.cache)}',
+            '# HELP report_render_cache_bytes Bytes held in the render cache.',
+            '# TYPE report_render_cache_bytes gauge',
+            f'report_render_cache_bytes {self.cache.bytes}',
+            '# HELP report_render_cache_evictions_total Entries evicted from the render cache.',
+            '# TYPE report_render_cache_evictions_total counter',
+            f'report_render_cache_evictions_total {self.cache.evictions}',
+            '# HELP report_render_inflight Renders currently in progress.',
+            '# TYPE report_render_inflight gauge',
+            f'report_render_inflight {len(self._inflight)}',
+        ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按需渲染报告的HTTP服务')
+    parser.add_argument('results_dir', help='保存result的目录（同时作为静态文件根目录）')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='渲染进程数（默认等于CPU核数）')
+    parser.add_argument('--logo-dir', default=None, help='商标图片目录')
+    parser.add_argument('--cache-dir', default=None, help='已编码图片的磁盘缓存目录')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help='渲染结果缓存容量（MB）')
+    args = parser.parse_args(argv)
+
+    server = ReportServer(args.results_dir, args.host, args.port)
+    service = RenderService(args.results_dir, args.workers, args.logo_dir, args.cache_dir,
+                            args.cache_mb * 1024 * 1024)
+    service.install(server)
+
+    async def run():
+        service.start()
+        await server.start()
+        print(f"按需渲染服务已启动: {service.results_dir}（{service.workers} 个渲染进程）")
+        print(f"  渲染接口: http://{lan_address()}:{server.port}/render/<结果ID>")
+        print(f"  统计信息: http://127.0.0.1:{server.port}/metrics")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n已停止")
+    finally:
+        service.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
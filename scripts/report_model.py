@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""报告数据模型：一次遍历 diseased_teeth，建立各区块共用的索引和统计
+
+同一颗牙在result中可能出现多次（如FDI 12、22各出现两次），模型以去重后的
+牙齿编号统计"问题牙齿"，所有区块读取同一份统计，数字保持一致。
+"""
+
+class ToothRecord:
+    """diseased_teeth 中的一条记录"""
+    __slots__ = ('fdi', 'labels', 'square_crop_path', 'square_bbox', 'tooth_bbox', 'diseases')
+
+    def __init__(self, tooth_data):
+        # 牙位编号统一为字符串（result中也可能写成整数）
+        fdi = tooth_data.get('tooth_fdi', '')
+        self.fdi = fdi if isinstance(fdi, str) else str(fdi)
+        self.diseases = tooth_data.get('diseases', [])
+        self.labels = [d.get('label', '') for d in self.diseases]
+        self.square_crop_path = tooth_data.get('square_crop_path', '')
+        self.square_bbox = tooth_data.get('square_bbox')
+        self.tooth_bbox = tooth_data.get('tooth_bbox')
+
+class ReportModel:
+    """按牙齿和按疾病标签索引的报告模型"""
+    __slots__ = ('records', 'by_tooth', 'label_counts', 'label_teeth', 'problem_teeth', 'total_diseases')
+
+    def __init__(self, result_data):
+        self.records = []
+        # 牙齿编号 -> 该牙齿的全部记录（保持出现顺序）
+        self.by_tooth = {}
+        # 疾病标签 -> 病变数量 / 涉及的牙齿编号集合（保持首次出现顺序）
+        self.label_counts = {}
+        self.label_teeth = {}
+        self.total_diseases = 0
+
+        for tooth_data in result_data.get('diseased_teeth', []):
+            record = ToothRecord(tooth_data)
+            self.records.append(record)
+            if record.fdi:
+                self.by_tooth.setdefault(record.fdi, []).append(record)
+            for label in record.labels:
+                self.label_counts[label] = self.label_counts.get(label, 0) + 1
+                self.label_teeth.setdefault(label, set()).add(record.fdi)
+            self.total_diseases += len(record.labels)
+
+        # 去重后按编号排序的问题牙齿
+        self.problem_teeth = sorted(self.by_tooth, key=lambda x: int(x))
+
+    # 某颗牙齿的全部疾病标签
+    def tooth_labels(self, fdi):
+        """返回该牙齿所有记录中的疾病标签（合并重复记录）"""
+        return [label for record in self.by_tooth.get(fdi, []) for label in record.labels]
+
+    # 某种疾病涉及的牙齿（按编号排序）
+    def teeth_with(self, label):
+        return sorted((t for t in self.label_teeth.get(label, ()) if t), key=lambda x: int(x))
+
+# 统一为 ReportModel
+def as_report_model(data):
+    """接受 ReportModel 或 result 字典，返回 ReportModel"""
+    if isinstance(data, ReportModel):
+        return data
+    return ReportModel(data)
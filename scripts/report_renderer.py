@@ -0,0 +1,628 @@
+# -*- coding: utf-8 -*-
+"""口腔健康评估报告渲染库
+
+render_report(result, assets_root, out) 是唯一的渲染入口：结果数据以dict传入，
+图片相对 assets_root 查找，输出写入路径或类文件对象。模块内没有全局可变状态，
+不依赖当前工作目录，可以在同一进程的多个线程中并发调用。
+"""
+
+import base64
+import os
+from pathlib import Path
+
+from instrumentation import count_read, counting_writer, current_trace, report_trace, stage
+from report_model import as_report_model
+from result_stream import loads
+
+# 商标图片文件名（位于 logo 目录下）
+LOGO1_NAME = 'd36e30836df4c84348b7eda21da5b003.png'
+LOGO2_NAME = '2170b51c9ac9a84ceef03a49c3de8690.png'
+
+# 疾病标签到中文名称的映射
+DISEASE_NAMES = {
+    'tooth abrasion': '牙齿磨损',
+    'general_caries': '龋齿',
+    'twisted tooth': '牙齿扭转'
+}
+
+# 图片网格中使用的简称
+DISEASE_SHORT_NAMES = {
+    'tooth abrasion': '磨损',
+    'general_caries': '龋齿',
+    'twisted tooth': '扭转'
+}
+
+# 各疾病的可能原因
+DISEASE_CAUSES = {
+    'tooth abrasion': [
+        '刷牙方式不当（横向刷牙、用力过猛）',
+        '使用硬毛牙刷或磨料过多的牙膏',
+        '饮食习惯（酸性食物、硬质食物）',
+        '夜磨牙或紧咬牙习惯',
+        '年龄因素导致的生理性磨损'
+    ],
+    'general_caries': [
+        '口腔卫生不良，牙菌斑堆积',
+        '高糖饮食，频繁摄入含糖食物',
+        '唾液分泌不足，口腔自洁能力下降',
+        '牙齿结构缺陷或发育不良',
+        '缺乏定期口腔检查和预防性治疗'
+    ],
+    'twisted tooth': [
+        '遗传因素，家族性牙齿排列异常',
+        '乳牙早失或滞留导致恒牙萌出异常',
+        '牙弓空间不足，牙齿拥挤',
+        '不良口腔习惯（咬唇、吐舌等）',
+        '颌骨发育异常'
+    ]
+}
+
+# 读取logo图片并转换为base64
+def image_to_base64(image_path):
+    """将图片转换为base64字符串"""
+    if not os.path.exists(image_path):
+        return None
+    with open(image_path, 'rb') as f:
+        img_data = f.read()
+        count_read(len(img_data))
+        return base64.b64encode(img_data).decode('utf-8')
+
+# 读取result.json
+def load_result_json(json_path):
+    """加载result.json数据（安装了orjson时使用orjson解析）；多病例的大型文件见 result_stream"""
+    with stage('load_result_json'):
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        if current_trace() is not None:
+            count_read(len(raw))
+        return loads(raw)
+
+# 读取两个logo
+def load_logos(logo_dir, cache=None):
+    """读取logo并返回 (logo1_base64, logo2_base64)；传入cache（AssetCache）时复用已编码结果"""
+    logo_dir = Path(logo_dir)
+    encode = cache.base64 if cache is not None else image_to_base64
+    with stage('load_logos'):
+        logo1_base64 = encode(str(logo_dir / LOGO1_NAME))
+        logo2_base64 = encode(str(logo_dir / LOGO2_NAME))
+    return logo1_base64, logo2_base64
+
+# 解析图片路径
+def resolve_image_path(base_dir, image_path):
+    """优先按相对路径查找图片，找不到时退回到base_dir下的同名文件"""
+    candidate = Path(base_dir) / image_path
+    if candidate.exists():
+        return candidate
+    return Path(base_dir) / Path(image_path).name
+
+# 生成牙齿问题二维图SVG
+def generate_tooth_chart_svg(result_data):
+    """生成牙齿问题二维图SVG（result_data 可以是 result 字典或 ReportModel）"""
+    problem_teeth = as_report_model(result_data).by_tooth
+    
+    # 生成SVG
+    svg = '''<svg width="800" height="600" xmlns="http://www.w3.org/2000/svg">
+  <defs>
+    <style>
+      .tooth-normal { fill: #E8F5E9; stroke: #4CAF50; stroke-width: 2; }
+      .tooth-problem { fill: #FFF9C4; stroke: #FBC02D; stroke-width: 3; }
+      .tooth-text { font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; fill: #2E7D32; }
+      .tooth-problem-text { font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; fill: #F57F17; }
+      .arch-label { font-family: Arial, sans-serif; font-size: 16px; font-weight: bold; fill: #2E7D32; }
+    </style>
+  </defs>
+  
+  <!-- 上颌 -->
+  <g id="upper-arch">
+    <text x="400" y="30" text-anchor="middle" class="arch-label">上颌 (Maxillary)</text>
+'''
+    
+    # 上颌牙齿位置 (1-16, 从右上到左上)
+    upper_positions = [
+        ('1', 50, 80), ('2', 90, 80), ('3', 130, 80),
+        ('4', 170, 70), ('5', 200, 70),
+        ('6', 230, 60),
+        ('7', 255, 50), ('8', 275, 45),
+        ('9', 295, 45), ('10', 315, 50),
+        ('11', 340, 60),
+        ('12', 370, 70), ('13', 400, 70),
+        ('14', 440, 80), ('15', 480, 80), ('16', 520, 80),
+    ]
+    
+    for tooth_num, x, y in upper_positions:
+        is_problem = tooth_num in problem_teeth
+        tooth_class = 'tooth-problem' if is_problem else 'tooth-normal'
+        text_class = 'tooth-problem-text' if is_problem else 'tooth-text'
+        w, h = (30, 25) if int(tooth_num) in [1,2,3,14,15,16] else (25, 20) if int(tooth_num) in [4,5,12,13] else (20, 18) if int(tooth_num) in [6,11] else (18, 15) if int(tooth_num) in [7,10] else (15, 12)
+        
+        svg += f'    <rect x="{x}" y="{y}" width="{w}" height="{h}" rx="3" class="{tooth_class}"/>\n'
+        svg += f'    <text x="{x+w/2}" y="{y+h/2+5}" text-anchor="middle" class="{text_class}">{tooth_num}</text>\n'
+    
+    svg += '''  </g>
+  
+  <!-- 下颌 -->
+  <g id="lower-arch">
+    <text x="400" y="350" text-anchor="middle" class="arch-label">下颌 (Mandibular)</text>
+'''
+    
+    # 下颌牙齿位置 (17-32, 从左下到右下)
+    lower_positions = [
+        ('17', 50, 400), ('18', 90, 400), ('19', 130, 400),
+        ('20', 170, 410), ('21', 200, 410),
+        ('22', 230, 420),
+        ('23', 255, 430), ('24', 275, 435),
+        ('25', 295, 435), ('26', 315, 430),
+        ('27', 340, 420),
+        ('28', 370, 410), ('29', 400, 410),
+        ('30', 440, 400), ('31', 480, 400), ('32', 520, 400),
+    ]
+    
+    for tooth_num, x, y in lower_positions:
+        is_problem = tooth_num in problem_teeth
+        tooth_class = 'tooth-problem' if is_problem else 'tooth-normal'
+        text_class = 'tooth-problem-text' if is_problem else 'tooth-text'
+        w, h = (30, 25) if int(tooth_num) in [17,18,19,30,31,32] else (25, 20) if int(tooth_num) in [20,21,28,29] else (20, 18) if int(tooth_num) in [22,27] else (18, 15) if int(tooth_num) in [23,26] else (15, 12)
+        
+        svg += f'    <rect x="{x}" y="{y}" width="{w}" height="{h}" rx="3" class="{tooth_class}"/>\n'
+        svg += f'    <text x="{x+w/2}" y="{y+h/2+5}" text-anchor="middle" class="{text_class}">{tooth_num}</text>\n'
+    
+    svg += '''  </g>
+  
+  <!-- 图例 -->
+  <g id="legend">
+    <rect x="600" y="100" width="180" height="120" fill="#F5F5F5" stroke="#4CAF50" stroke-width="2" rx="5"/>
+    <text x="690" y="125" text-anchor="middle" font-family="Arial" font-size="14" font-weight="bold" fill="#2E7D32">图例</text>
+    <rect x="610" y="140" width="20" height="15" fill="#E8F5E9" stroke="#4CAF50" stroke-width="1"/>
+    <text x="635" y="152" font-family="Arial" font-size="12" fill="#2E7D32">正常</text>
+    <rect x="610" y="165" width="20" height="15" fill="#FFF9C4" stroke="#FBC02D" stroke-width="2"/>
+    <text x="635" y="177" font-family="Arial" font-size="12" fill="#F57F17">有问题</text>
+  </g>
+</svg>'''
+    
+    return svg
+
+# 生成病因分析HTML
+def generate_cause_analysis_html(result_data):
+    """生成病因分析HTML（result_data 可以是 result 字典或 ReportModel）"""
+    model = as_report_model(result_data)
+    
+    html = '<div class="section"><h3>🔬 病因分析</h3>'
+    
+    for disease_key, disease_name in DISEASE_NAMES.items():
+        if model.label_counts.get(disease_key, 0) > 0:
+            teeth_list = model.teeth_with(disease_key)
+            html += f'''
+      <div style="margin-bottom: 20px; padding: 15px; background: #F9FBE7; border-left: 4px solid #8BC34A; border-radius: 5px;">
+        <h4 style="margin: 0 0 10px 0; color: #558B2F; font-size: 18px;">{disease_name}</h4>
+        <p style="margin: 5px 0; color: #555;"><strong>涉及牙齿：</strong>{', '.join(teeth_list)}号牙</p>
+        <p style="margin: 5px 0; color: #555;"><strong>可能原因：</strong></p>
+        <ul style="margin: 10px 0; padding-left: 20px; color: #666;">
+'''
+            for cause in DISEASE_CAUSES[disease_key]:
+                html += f'          <li>{cause}</li>\n'
+            html += '        </ul>\n      </div>\n'
+    
+    html += '</div>'
+    return html
+
+# 生成综合总结HTML
+def generate_summary_html(result_data):
+    """生成综合总结HTML（result_data 可以是 result 字典或 ReportModel）"""
+    model = as_report_model(result_data)
+    total_problem_teeth = len(model.problem_teeth)
+    total_diseases = model.total_diseases
+    
+    html = f'''
+    <div class="section">
+      <h3>📊 检测概况</h3>
+      <p>本次检测共发现 <strong style="color: #FBC02D;">{total_problem_teeth}</strong> 颗牙齿存在健康问题，共检测到 <strong style="color: #FBC02D;">{total_diseases}</strong> 处病变。</p>
+    </div>
+    
+    <div class="section">
+      <h3>🔍 主要问题分布</h3>
+      <ul style="line-height: 2;">
+'''
+    
+    for label, count in model.label_counts.items():
+        name = DISEASE_NAMES.get(label, label)
+        html += f'        <li><strong>{name}</strong>：{count} 处</li>\n'
+    
+    html += '''      </ul>
+    </div>
+    
+    <div class="section">
+      <h3>💡 健康建议</h3>
+      <ul style="line-height: 2;">
+        <li>建议尽快到专业口腔医疗机构进行详细检查和治疗</li>
+        <li>改善口腔卫生习惯，使用正确的刷牙方法（建议使用巴氏刷牙法）</li>
+        <li>定期进行口腔检查和清洁（建议每6个月一次）</li>
+        <li>注意饮食健康，减少高糖食物和酸性饮料的摄入</li>
+        <li>如有夜磨牙习惯，建议佩戴防护牙套</li>
+        <li>使用含氟牙膏，增强牙齿抗龋能力</li>
+      </ul>
+    </div>
+'''
+    
+    return html
+
+# 读取原始照片并转换为base64
+def image_file_to_base64_data_uri(image_path):
+    """将图片文件转换为base64 data URI"""
+    if not os.path.exists(image_path):
+        return None
+    mime_type = MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/png')
+    
+    with open(image_path, 'rb') as f:
+        img_data = f.read()
+        count_read(len(img_data))
+        base64_str = base64.b64encode(img_data).decode('utf-8')
+        return f"data:{mime_type};base64,{base64_str}"
+# 报告样式（内联模式写入 <style>，外链模式写入带内容哈希的CSS文件）
+REPORT_CSS = '''    * { box-sizing: border-box; }
+    body { margin: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'PingFang SC', 'Microsoft YaHei', 'Helvetica Neue', Arial, 'Noto Sans SC', sans-serif; background:#ffffff; color:#222; }
+    .page { width: 100%; max-width: 1080px; margin: 24px auto 72px; background:#ffffff; padding: 28px 32px 40px; border-radius: 12px; box-shadow: 0 12px 36px rgba(0,0,0,.08);} 
+    .topbar { height: 10px; background: linear-gradient(90deg, #4CAF50 0%, #8BC34A 50%, #FFEB3B 100%); width: 50%; border-radius: 6px; margin-top: 4px; }
+    .header { display:flex; align-items: center; justify-content: space-between; margin: 18px 0 12px; }
+    .badge { display:inline-block; padding: 6px 12px; border-radius: 8px; background: linear-gradient(135deg, #4CAF50 0%, #8BC34A 100%); color:#fff; font-weight:600; margin-right: 12px; }
+    h1 { margin: 0; font-size: 48px; letter-spacing:1px; color: #2E7D32; }
+    .report-tag { color:#4CAF50; }
+    .logo { height: 80px; width: auto; display:block; object-fit: contain; }
+    .logo-large { height: 150px; width: auto; display:block; object-fit: contain; }
+    .cover { display:flex; flex-direction: column; align-items:center; justify-content:center; padding: 80px 32px 120px; text-align:center; background: linear-gradient(135deg, #E8F5E9 0%, #F1F8E9 50%, #FFF9C4 100%); border-radius: 12px; }
+    .cover h1 { font-size: 42px; margin: 18px 0 8px; color: #2E7D32; }
+    .cover .subtitle { color:#4CAF50; font-size: 18px; margin-top: 4px; }
+    .cover-summary { margin-top: 40px; padding: 30px; background: rgba(255,255,255,0.9); border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); max-width: 600px; }
+    .cover-summary h2 { color: #2E7D32; font-size: 24px; margin: 0 0 15px 0; }
+    .cover-summary .stat { display: flex; justify-content: space-around; margin: 20px 0; }
+    .cover-summary .stat-item { text-align: center; }
+    .cover-summary .stat-number { font-size: 36px; font-weight: bold; color: #FBC02D; margin: 5px 0; }
+    .cover-summary .stat-label { font-size: 14px; color: #666; }
+    .layout { display:grid; grid-template-columns: 1fr 460px; gap: 28px; margin-top: 10px; }
+    @media (max-width: 980px){ .layout { grid-template-columns: 1fr; } }
+    .section { margin-bottom: 18px; background:#ffffff; border:1px solid #C8E6C9; border-radius:10px; padding:14px 16px; }
+    .section h3 { margin: 0 0 6px; color:#2E7D32; font-size: 20px; display:flex; align-items:center; }
+    .section h3::before { content:""; display:inline-block; width: 12px; height: 12px; border:2px solid #4CAF50; border-radius:50%; margin-right: 8px; }
+    .section p { margin: 0; line-height: 1.8; color:#444; }
+    .right h3 { color:#4CAF50; margin: 6px 0; font-size: 20px; }
+    .chips { display:flex; flex-wrap:wrap; gap: 8px 10px; margin: 6px 0 12px; }
+    .chip { background: linear-gradient(135deg, #4CAF50 0%, #8BC34A 100%); color:#fff; border-radius: 999px; padding: 6px 12px; font-weight: 700; min-width: 42px; text-align:center; font-size: 14px; }
+    .grid { display: grid; grid-template-columns: repeat(3, minmax(0, 1fr)); gap: 14px; }
+    @media (max-width: 980px){ .grid { grid-template-columns: repeat(2, minmax(0, 1fr)); } }
+    .cell { background:#ffffff; padding: 8px; border:1px solid #C8E6C9; border-radius: 10px; }
+    .cell img { width: 100%; height: auto; aspect-ratio: 1 / 1; object-fit: cover; border-radius: 8px; display:block; }
+    .meta { font-size: 13px; color:#555; margin-top: 6px; line-height: 1.55; }
+    footer { margin-top: 24px; color:#666; font-size: 14px; }
+    .legend { margin-top: 6px; font-size: 12px; color:#4CAF50; }
+    .score { color:#4CAF50; font-size: 28px; font-weight: 800; }
+    .tooth-chart { width: 100%; max-width: 800px; margin: 20px auto; background: #F9FBE7; padding: 20px; border-radius: 10px; border: 2px solid #8BC34A; }
+    .tooth-chart svg { width: 100%; height: auto; }
+    /* Print layout for consistent A4 pagination */
+    @page { size: A4; margin: 12mm; }
+    @media print {
+      body { -webkit-print-color-adjust: exact; print-color-adjust: exact; font-size: 12px; }
+      .page { break-after: page; page-break-after: always; box-shadow: none; max-width: 100%; margin: 0; border-radius: 0; page-break-inside: avoid; }
+      .header h1 { font-size: 28px; }
+      .badge { padding: 4px 10px; font-size: 12px; }
+      .section { margin-bottom: 10px; padding: 10px 12px; }
+      .section h3 { font-size: 16px; }
+      .section p { line-height: 1.6; }
+      .right h3 { font-size: 16px; }
+      .chips { gap: 6px 8px; }
+      .logo { height: 60px; }
+    }
+'''
+
+# 报告 <head> 部分，与数据无关；REPORT_HEAD 为内联样式版本
+REPORT_HEAD_START = '''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1"> 
+  <title>口腔健康评估报告</title>
+'''
+REPORT_HEAD_END = '''</head>
+<body>
+'''
+REPORT_HEAD = REPORT_HEAD_START + '  <style>\n' + REPORT_CSS + '  </style>\n' + REPORT_HEAD_END
+
+# 每次读取的原始字节数，取3的倍数使分块编码结果可以直接拼接
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+# 图片扩展名到MIME类型的映射
+MIME_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg'}
+
+# 分块写出图片的base64 data URI
+def write_image_data_uri(out, image_path, chunk_size=BASE64_CHUNK_SIZE):
+    """将图片以data URI形式分块编码并写入out，不在内存中保留整张图片；文件不存在时返回False"""
+    if not os.path.exists(image_path):
+        return False
+    mime_type = MIME_TYPES.get(os.path.splitext(str(image_path))[1].lower(), 'image/png')
+    out.write(f"data:{mime_type};base64,")
+    with open(image_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            count_read(len(chunk))
+            out.write(base64.b64encode(chunk).decode('ascii'))
+    return True
+
+# 写出图片data URI，优先使用缓存
+def write_image(out, image_path, cache=None):
+    """cache命中时直接写出已编码结果，否则分块编码；文件不存在时返回False"""
+    if cache is not None:
+        data_uri = cache.data_uri(image_path)
+        if data_uri is not None:
+            out.write(data_uri)
+            return True
+    return write_image_data_uri(out, image_path)
+
+# 网格缩略图与整体视图的 sizes 属性（与 .cell img / .left 的布局宽度对应）
+CELL_IMAGE_SIZES = '(max-width: 980px) 50vw, 150px'
+OVERVIEW_IMAGE_SIZES = '(max-width: 980px) 100vw, 560px'
+
+# 写出 <img> 的图片地址属性
+def write_img_src(out, image_path, rel_path, sizes, derivatives=None, cache=None, linked=None):
+    """写出 src 属性（含引号），返回需要并入 style 属性的占位背景（没有时为空字符串）
+
+    derivatives（image_derivatives 生成的清单中的 images 映射）里有 rel_path 的衍生图时，
+    以相对地址引用最大一档并附带 srcset/sizes；清单带占位缩略图时图片延迟加载，加载完成前
+    以缩略图作为背景。linked（linked_assets.ReportAssets）不为None且图片超过内联阈值时，
+    引用公共资源目录中按内容哈希命名的副本；否则内联data URI。
+    """
+    entry = (derivatives or {}).get(rel_path)
+    if entry and entry.get('variants'):
+        variants = entry['variants']
+        srcset = ', '.join(f"{v['path']} {v['width']}w" for v in variants)
+        out.write(f'src="{variants[-1]["path"]}" srcset="{srcset}" sizes="{sizes}"')
+        if entry.get('width') and entry.get('height'):
+            out.write(f' width="{entry["width"]}" height="{entry["height"]}"')
+        if entry.get('placeholder'):
+            out.write(' loading="lazy" decoding="async"')
+            return f"background: url({entry['placeholder']}) center / cover no-repeat; "
+        return ''
+    if linked is not None and os.path.exists(image_path) and not linked.should_inline(os.path.getsize(image_path)):
+        out.write(f'src="{linked.file_url(image_path)}"')
+        return ''
+    out.write('src="')
+    write_image(out, image_path, cache)
+    out.write('"')
+    return ''
+
+# 衍生图地址改为相对于报告页面
+def relocate_derivatives(derivatives, assets_root, page_dir):
+    """清单中的衍生图地址相对于result所在目录；报告写到其他目录时改写为相对于报告页面的地址"""
+    if not derivatives:
+        return derivatives
+    prefix = os.path.relpath(Path(assets_root).resolve(), Path(page_dir).resolve()).replace(os.sep, '/')
+    if prefix == '.':
+        return derivatives
+    return {rel_path: dict(entry, variants=[dict(v, path=f"{prefix}/{v['path']}") for v in entry.get('variants', [])])
+            for rel_path, entry in derivatives.items()}
+
+# 写出已编码图片的 src 属性
+def write_encoded_src(out, data, mime_type, ext, linked=None):
+    """linked 不为None且超过内联阈值时写入公共资源目录并引用，否则内联data URI"""
+    if linked is not None and not linked.should_inline(len(data)):
+        out.write(f'src="{linked.bytes_url(data, ext)}"')
+    else:
+        out.write(f'src="data:{mime_type};base64,{base64.b64encode(data).decode("ascii")}"')
+
+# 渲染完整HTML报告
+def render_report(result, assets_root, out, logos=None, logo_dir=None, cache=None, derivatives=None,
+                  cropper=None, linked_assets=None, annotations=None):
+    """渲染完整的HTML报告
+
+    result 为已解析的result数据；assets_root 为查找总览图和牙齿裁剪图的根目录；
+    out 为输出文件路径或可写的文本类文件对象。logos 可传入预先读取的
+    (logo1_base64, logo2_base64)，否则从 logo_dir（默认 assets_root/商标）读取。
+    cache 为可选的 AssetCache，用于复用logo和图片的编码结果。
+    derivatives 为可选的衍生图映射（见 image_derivatives），有衍生图的图片以 srcset 引用而不内联；
+    写入路径时衍生图地址改写为相对于输出文件，写入文件对象时保持相对于 assets_root。
+    cropper 为可选的 crop_engine.OverviewCropper，提供时牙齿图片按 square_bbox 从总览图裁剪。
+    linked_assets 为可选的 linked_assets.LinkedAssets，提供时样式、logo和超过阈值的图片写入
+    公共资源目录并以链接引用，不再内联。
+    annotations 为可选的 annotate.ReportAnnotations，提供时总览图和牙齿图片使用绘制了检测框的版本。
+    报告按区块依次写出，图片分块编码后直接写入，内存占用与牙齿图片数量无关。
+    写入路径时返回该路径。启用 instrumentation 时各区块分别计时（见 instrumentation）。
+    """
+    assets_root = Path(assets_root)
+    report_id = getattr(out, 'name', '<stream>') if hasattr(out, 'write') else str(out)
+    with report_trace(report_id):
+        if logos is None:
+            logos = load_logos(logo_dir if logo_dir is not None else assets_root / '商标', cache)
+        
+        if hasattr(out, 'write'):
+            linked = linked_assets.for_report(None) if linked_assets is not None else None
+            write_report(counting_writer(out), result, assets_root, logos, cache, derivatives, cropper, linked,
+                         annotations)
+            return None
+        
+        output_path = Path(out)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        linked = linked_assets.for_report(output_path) if linked_assets is not None else None
+        derivatives = relocate_derivatives(derivatives, assets_root, output_path.parent)
+        with open(str(output_path), 'w', encoding='utf-8') as f:
+            write_report(counting_writer(f), result, assets_root, logos, cache, derivatives, cropper, linked,
+                         annotations)
+        return output_path
+
+# 按区块写出HTML报告
+def write_report(out, result_data, assets_root, logos, cache=None, derivatives=None, cropper=None, linked=None,
+                 annotations=None):
+    """将报告各区块依次写入类文件对象out；linked 为 linked_assets.ReportAssets 时使用外链资源，
+    annotations 为 annotate.ReportAnnotations 时图片带检测框"""
+    logo1_base64, logo2_base64 = logos
+    if linked is not None:
+        logo1_src = linked.logo_url(logo1_base64) if logo1_base64 else ''
+        logo2_src = linked.logo_url(logo2_base64) if logo2_base64 else ''
+    else:
+        logo1_src = f"data:image/png;base64,{logo1_base64 if logo1_base64 else ''}"
+        logo2_src = f"data:image/png;base64,{logo2_base64 if logo2_base64 else ''}"
+    
+    # 一次遍历建立所有区块共用的模型
+    with stage('report_model'):
+        model = as_report_model(result_data)
+    
+    # 生成封面总结信息
+    total_problem_teeth = len(model.problem_teeth)
+    total_diseases = model.total_diseases
+    
+    with stage('head_cover'):
+        if linked is not None:
+            out.write(f'{REPORT_HEAD_START}  <link rel="stylesheet" href="{linked.css_url(REPORT_CSS)}">\n{REPORT_HEAD_END}')
+        else:
+            out.write(REPORT_HEAD)
+        
+        # 封面
+        out.write(f'''  <!-- 封面 -->
+  <div class="page cover">
+    <img class="logo-large" src="{logo2_src}" alt="Logo">
+    <h1>口腔健康评估报告</h1>
+    <p class="subtitle">Oral Health Assessment Report</p>
+    
+    <div class="cover-summary">
+      <h2>📋 检测概览</h2>
+      <div class="stat">
+        <div class="stat-item">
+          <div class="stat-number">{total_problem_teeth}</div>
+          <div class="stat-label">问题牙齿</div>
+        </div>
+        <div class="stat-item">
+          <div class="stat-number">{total_diseases}</div>
+          <div class="stat-label">病变数量</div>
+        </div>
+      </div>
+      <p style="margin: 15px 0 0 0; color: #555; line-height: 1.6;">
+        本报告基于AI智能分析技术，对您的口腔健康状况进行了全面评估。
+        建议您根据报告结果，及时咨询专业口腔医生，制定个性化的治疗方案。
+      </p>
+    </div>
+  </div>
+
+  <!-- 报告内容 -->
+  <div class="page">
+    <div class="topbar"></div>
+    <div class="header">
+      <div>
+        <span class="badge">AI智能分析</span>
+        <h1>口腔健康<span class="report-tag">评估报告</span></h1>
+      </div>
+      <div><img class="logo" src="{logo1_src}" alt="Logo"></div>
+    </div>
+    
+    <div class="layout">
+      <div class="left">
+        ''')
+    
+    # 总结、病因分析与牙齿图表
+    with stage('summary_html'):
+        out.write(generate_summary_html(model))
+    out.write('''
+        
+        ''')
+    with stage('cause_analysis_html'):
+        out.write(generate_cause_analysis_html(model))
+    out.write('''
+        
+        <div class="section">
+          <h3>🦷 牙齿问题分布图</h3>
+          <div class="tooth-chart">
+            ''')
+    with stage('tooth_chart_svg'):
+        out.write(generate_tooth_chart_svg(model))
+    out.write('''
+          </div>
+          <p class="legend">注：黄色标记表示存在问题的牙齿</p>
+        </div>
+        
+        <div class="section">
+          <h3>📸 整体视图</h3>
+          <img ''')
+    
+    # 整体视图
+    overview_rel = result_data.get('overview_image_path') or '原始照片_overview.png'
+    overview_path = resolve_image_path(assets_root, overview_rel)
+    with stage('overview_image'):
+        annotated = annotations.overview() if annotations is not None else None
+        if annotated is not None:
+            write_encoded_src(out, annotated, annotations.mime_type, annotations.extension, linked)
+            placeholder = ''
+        else:
+            placeholder = write_img_src(out, str(overview_path), overview_rel, OVERVIEW_IMAGE_SIZES, derivatives,
+                                        cache, linked)
+    out.write(f''' alt="整体视图" style="{placeholder}width: 100%; height: auto; border-radius: 8px; border: 2px solid #C8E6C9;">
+''')
+    if annotated is not None and annotations.legend():
+        items = '　'.join(f'<span style="color: {color};">■</span> {name}' for name, color in annotations.legend())
+        out.write(f'          <p class="legend">检测框：{items}</p>\n')
+    out.write('''        </div>
+      </div>
+      
+      <div class="right">
+        <h3>🔍 详细检测结果</h3>
+        <div class="chips">
+''')
+    
+    # 添加问题牙齿标签
+    for tooth_num in model.problem_teeth:
+        out.write(f'          <span class="chip">{tooth_num}</span>\n')
+    
+    out.write('''        </div>
+        
+        <div class="grid">
+''')
+    
+    # 添加牙齿详细图片
+    with stage('tooth_grid'):
+        for record in model.records:
+            tooth_num = record.fdi
+            square_crop_path = record.square_crop_path
+            square_bbox = record.square_bbox
+        
+            # 有裁剪引擎时直接从总览图裁剪，裁剪图文件可以不存在
+            from_overview = cropper is not None and bool(square_bbox)
+            if square_crop_path or from_overview:
+                # 转换路径
+                img_path = resolve_image_path(assets_root, square_crop_path) if square_crop_path else None
+            
+                if from_overview or img_path.exists():
+                    disease_text = '、'.join([DISEASE_SHORT_NAMES[l] for l in record.labels if l in DISEASE_SHORT_NAMES])
+                
+                    out.write('''          <div class="cell">
+            <img ''')
+                    placeholder = ''
+                    annotated = annotations.tooth(record) if annotations is not None else None
+                    if annotated is not None:
+                        write_encoded_src(out, annotated, annotations.mime_type, annotations.extension, linked)
+                    elif from_overview and linked is not None:
+                        crop_data = cropper.encode(square_bbox)
+                        if linked.should_inline(len(crop_data)):
+                            out.write(f'src="{cropper.data_uri(square_bbox)}"')
+                        else:
+                            out.write(f'src="{linked.bytes_url(crop_data, cropper.extension)}"')
+                    elif from_overview:
+                        out.write(f'src="{cropper.data_uri(square_bbox)}"')
+                    else:
+                        placeholder = write_img_src(out, str(img_path), square_crop_path, CELL_IMAGE_SIZES,
+                                                    derivatives, cache, linked)
+                    style = f' style="{placeholder.strip()}"' if placeholder else ''
+                    out.write(f''' alt="牙齿 {tooth_num}"{style}>
+            <div class="meta">
+              <strong>{tooth_num}号牙</strong><br>
+              {disease_text}
+            </div>
+          </div>
+''')
+    
+    out.write('''        </div>
+      </div>
+    </div>
+    
+    <footer>
+      <p>本报告由AI智能分析系统生成，仅供参考。具体诊断和治疗方案请咨询专业口腔医生。</p>
+      <p style="margin-top: 10px; color: #4CAF50;">© 渡生科技 - 专业口腔健康解决方案</p>
+    </footer>
+  </div>
+</body>
+</html>''')
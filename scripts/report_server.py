@@ -0,0 +1,557 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""局域网报告服务器：基于asyncio的静态文件服务，替代 python -m http.server
+
+- 单进程事件循环并发处理大量连接，支持HTTP/1.1长连接；
+- 客户端支持时直接返回预压缩文件（precompress.py 生成的 .br / .gz）；
+- ETag（内容哈希）/If-None-Match 条件请求，未变化时返回304；
+- Range 请求（单个区间），便于大图片断点续传；
+- 带内容哈希的文件名（assets/ 中的资源、衍生图）返回长期缓存头，其余文件每次向服务器校验；
+- /metrics 返回Prometheus文本格式的请求统计；
+- 可选HTTPS（--certfile/--keyfile），通过局域网IP访问时离线缓存（Service Worker）需要HTTPS。
+
+用法示例：
+    python report_server.py ..
+    python report_server.py 输出目录 --port 8080
+    python report_server.py .. --port 8443 --certfile cert.pem --keyfile key.pem
+"""
+
+import argparse
+import asyncio
+import email.utils
+import mimetypes
+import os
+import posixpath
+import re
+import socket
+import ssl
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from image_derivatives import file_sha256
+from incremental_build import BUILD_MANIFEST_SUFFIX
+from linked_assets import HASH_LENGTH
+
+# 默认监听地址与端口
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8000
+
+# 长连接空闲超时（秒）与单个连接最多处理的请求数
+KEEPALIVE_TIMEOUT = 15.0
+KEEPALIVE_MAX_REQUESTS = 1000
+
+# 请求头与请求体的大小上限（字节）
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# 缓存头：带内容哈希的文件长期缓存，其余文件每次校验
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 带内容哈希的文件名：report.<哈希>.css、img.<哈希>.png、<哈希>-512.webp
+FINGERPRINT_PATTERN = re.compile(r'(?:^|\.)[0-9a-f]{%d}[.-]' % HASH_LENGTH)
+
+# 请求目录时依次尝试的文件
+DIRECTORY_INDEX = ('index.html', 'report.html')
+
+# 预压缩文件：Content-Encoding -> 扩展名，按优先顺序
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+# 状态码 -> 原因短语
+REASONS = {
+    200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request', 403: 'Forbidden',
+    404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required', 413: 'Payload Too Large',
+    416: 'Range Not Satisfiable', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('image/webp', '.webp')
+
+class BadRequest(Exception):
+    """请求格式错误，返回对应状态码后关闭连接"""
+
+    def __init__(self, status, message=''):
+        super().__init__(message)
+        self.status = status
+
+class Request:
+    """解析后的HTTP请求"""
+    __slots__ = ('method', 'target', 'path', 'query', 'version', 'headers', 'body')
+
+    def __init__(self, method, target, version, headers, body=b''):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+        parts = urlsplit(target)
+        self.path = unquote(parts.path)
+        self.query = parts.query
+
+    # 是否保持连接
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+
+class Response:
+    """待发送的响应：body 为bytes，或 file=(路径, 起始偏移, 长度)"""
+    __slots__ = ('status', 'headers', 'body', 'file')
+
+    def __init__(self, status, headers=None, body=b'', file=None):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+        self.file = file
+
+# 文本错误响应
+def error_response(status, message=None):
+    body = (message or REASONS.get(status, '')).encode('utf-8') + b'\n'
+    return Response(status, {'Content-Type': 'text/plain; charset=utf-8'}, body)
+
+# HTTP日期
+def http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+# 读取一个请求
+async def read_request(reader):
+    """读取并解析一个请求；连接已关闭时返回None，格式错误时抛出BadRequest"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise BadRequest(400, '请求不完整')
+        return None
+    except asyncio.LimitOverrunError:
+        raise BadRequest(431)
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise BadRequest(400, '请求行格式错误')
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise BadRequest(400, '不支持的HTTP版本')
+
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise BadRequest(400, '请求头格式错误')
+        name = name.strip().lower()
+        value = value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+    body = b''
+    if 'transfer-encoding' in headers:
+        raise BadRequest(411)
+    if 'content-length' in headers:
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise BadRequest(400, 'Content-Length 格式错误')
+        if length < 0:
+            raise BadRequest(400, 'Content-Length 格式错误')
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(413)
+        try:
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise BadRequest(400, '请求体不完整')
+    return Request(method, target, version, headers, body)
+
+# 解析 Accept-Encoding
+def accepted_encodings(header):
+    """返回客户端接受的编码集合（q=0 的除外）"""
+    accepted = set()
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.add(token)
+    return accepted
+
+# If-None-Match 是否匹配（弱比较）
+def etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    bare = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+# 解析 Range
+def parse_range(header, size):
+    """解析单个字节区间，返回 (起始, 长度)；不支持的格式返回None，无法满足时抛出BadRequest(416)"""
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first == '':
+            suffix = int(last)
+            if suffix <= 0:
+                raise BadRequest(416)
+            start = max(0, size - suffix)
+            end = size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise BadRequest(416)
+    end = min(end, size - 1)
+    return start, end - start + 1
+
+class FileInfo:
+    """静态文件的元数据（按 mtime/大小 缓存，文件变化后重新计算）"""
+    __slots__ = ('path', 'stamp', 'size', 'mtime', 'etag', 'content_type', 'cache_control')
+
+    def __init__(self, path, st, digest):
+        self.path = path
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.etag = f'"{digest[:32]}"'
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        self.content_type = content_type
+        fingerprinted = FINGERPRINT_PATTERN.search(os.path.basename(path))
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if fingerprinted else REVALIDATE_CACHE_CONTROL
+
+class ServerMetrics:
+    """请求统计，/metrics 以Prometheus文本格式输出"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.connections_open = 0
+        self.connections_total = 0
+        self.requests = {}
+        self.encodings = {}
+        self.bytes_sent = 0
+        self.request_seconds = 0.0
+        # 返回额外指标行的函数（如按需渲染服务的缓存统计）
+        self.collectors = []
+
+    def observe(self, status, encoding, nbytes, seconds):
+        self.requests[status] = self.requests.get(status, 0) + 1
+        if encoding:
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+        self.bytes_sent += nbytes
+        self.request_seconds += seconds
+
+    def render(self):
+        total = sum(self.requests.values())
+        lines = [
+            '# HELP report_server_uptime_seconds Seconds since the server started.',
+            '# TYPE report_server_uptime_seconds gauge',
+            f'report_server_uptime_seconds {time.time() - self.started:.3f}',
+            '# HELP report_server_connections_open Currently open client connections.',
+            '# TYPE report_server_connections_open gauge',
+            f'report_server_connections_open {self.connections_open}',
+            '# HELP report_server_connections_total Accepted client connections.',
+            '# TYPE report_server_connections_total counter',
+            f'report_server_connections_total {self.connections_total}',
+            '# HELP report_server_requests_total Requests served by status code.',
+            '# TYPE report_server_requests_total counter',
+        ]
+        lines += [f'report_server_requests_total{{status="{s}"}} {n}' for s, n in sorted(self.requests.items())]
+        lines += [
+            '# HELP report_server_encoded_responses_total Responses served from a precompressed variant.',
+            '# TYPE report_server_encoded_responses_total counter',
+        ]
+        lines += [f'report_server_encoded_responses_total{{encoding="{e}"}} {n}'
+                  for e, n in sorted(self.encodings.items())]
+        lines += [
+            '# HELP report_server_bytes_sent_total Response body bytes sent.',
+            '# TYPE report_server_bytes_sent_total counter',
+            f'report_server_bytes_sent_total {self.bytes_sent}',
+            '# HELP report_server_request_seconds Time spent handling requests.',
+            '# TYPE report_server_request_seconds summary',
+            f'report_server_request_seconds_sum {self.request_seconds:.6f}',
+            f'report_server_request_seconds_count {total}',
+        ]
+        for collect in self.collectors:
+            lines += collect()
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+class ReportServer:
+    """报告目录的静态文件服务器
+
+    routes 为 路径 -> 处理协程（参数为Request，返回Response），prefix_routes 为 (路径前缀, 处理协程)
+    列表，两者都优先于静态文件匹配。
+    """
+
+    def __init__(self, root, host=DEFAULT_HOST, port=DEFAULT_PORT, ssl_context=None):
+        self.root = Path(root).resolve()
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.metrics = ServerMetrics()
+        self.routes = {'/metrics': self._handle_metrics}
+        self.prefix_routes = []
+        # 绝对路径 -> FileInfo
+        self._files = {}
+        self._server = None
+
+    # 启动监听
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES, reuse_address=True,
+                                                  ssl=self.ssl_context)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # 处理一个连接（长连接上依次处理多个请求）
+    async def _handle_connection(self, reader, writer):
+        self.metrics.connections_open += 1
+        self.metrics.connections_total += 1
+        try:
+            for _ in range(KEEPALIVE_MAX_REQUESTS):
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except BadRequest as e:
+                    await self._send(writer, None, error_response(e.status, str(e) or None), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.keep_alive
+                start = time.perf_counter()
+                try:
+                    response = await self.dispatch(request)
+                except BadRequest as e:
+                    response = error_response(e.status, str(e) or None)
+                except Exception as e:
+                    print(f"处理请求失败: {request.method} {request.target}: {e}", file=sys.stderr)
+                    response = error_response(500)
+                sent = await self._send(writer, request, response, keep_alive)
+                self.metrics.observe(response.status, response.headers.get('Content-Encoding'), sent,
+                                     time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.metrics.connections_open -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    # 路由
+    async def dispatch(self, request):
+        handler = self.routes.get(request.path)
+        if handler is not None:
+            return await handler(request)
+        for prefix, handler in self.prefix_routes:
+            if request.path.startswith(prefix):
+                return await handler(request)
+        if request.method not in ('GET', 'HEAD'):
+            return Response(405, {'Allow': 'GET, HEAD'}, b'')
+        return await self.serve_file(request)
+
+    async def _handle_metrics(self, request):
+        return Response(200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+                              'Cache-Control': 'no-store'}, self.metrics.render())
+
+    # 将URL路径映射为根目录下的文件
+    def resolve(self, url_path):
+        """返回文件的绝对路径；越出根目录、含NUL、指向隐藏文件或增量构建清单时返回None，
+        目录返回其中的 index.html 或 report.html"""
+        if '\x00' in url_path:
+            return None
+        normalized = posixpath.normpath('/' + url_path.lstrip('/'))
+        parts = [p for p in normalized.split('/') if p]
+        if any(p.startswith('.') or p.endswith(('.tmp', BUILD_MANIFEST_SUFFIX)) for p in parts):
+            return None
+        path = self.root.joinpath(*parts)
+        if path.is_dir():
+            path = next((path / name for name in DIRECTORY_INDEX if (path / name).is_file()), path / DIRECTORY_INDEX[0])
+        return str(path)
+
+    # 文件元数据（首次访问或文件变化时在线程池中计算内容哈希）
+    async def file_info(self, path):
+        try:
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        info = self._files.get(path)
+        if info is None or info.stamp != (st.st_mtime_ns, st.st_size):
+            digest = await asyncio.get_running_loop().run_in_executor(None, file_sha256, path)
+            info = self._files[path] = FileInfo(path, st, digest)
+        return info
+
+    # 选择预压缩文件
+    def _precompressed(self, info, request):
+        """返回 (编码, 路径, 大小)；客户端不支持或压缩文件不是最新时返回None"""
+        accepted = accepted_encodings(request.headers.get('accept-encoding', ''))
+        for encoding, ext in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                st = os.stat(info.path + ext)
+            except OSError:
+                continue
+            if st.st_mtime_ns >= info.stamp[0]:
+                return encoding, info.path + ext, st.st_size
+        return None
+
+    # 静态文件
+    async def serve_file(self, request):
+        path = self.resolve(request.path)
+        info = await self.file_info(path) if path else None
+        if info is None:
+            return error_response(404)
+
+        headers = {
+            'Content-Type': info.content_type,
+            'Cache-Control': info.cache_control,
+            'Last-Modified': http_date(info.mtime),
+            'Accept-Ranges': 'bytes',
+        }
+        # Range 只作用于原始文件，不返回压缩版本
+        range_header = request.headers.get('range')
+        variant = None if range_header else self._precompressed(info, request)
+        headers['Vary'] = 'Accept-Encoding'
+
+        etag = info.etag if variant is None else f'{info.etag[:-1]}-{variant[0]}"'
+        headers['ETag'] = etag
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            if etag_matches(if_none_match, etag):
+                return Response(304, headers)
+        elif request.headers.get('if-modified-since'):
+            try:
+                since = email.utils.parsedate_to_datetime(request.headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and int(info.mtime) <= since:
+                return Response(304, headers)
+
+        if variant is not None:
+            headers['Content-Encoding'] = variant[0]
+            return Response(200, headers, file=(variant[1], 0, variant[2]))
+
+        if range_header and info.size and request.headers.get('if-range', etag) == etag:
+            try:
+                byte_range = parse_range(range_header, info.size)
+            except BadRequest:
+                return Response(416, {'Content-Range': f'bytes */{info.size}'}, b'')
+            if byte_range is not None:
+                start, length = byte_range
+                headers['Content-Range'] = f'bytes {start}-{start + length - 1}/{info.size}'
+                return Response(206, headers, file=(info.path, start, length))
+        return Response(200, headers, file=(info.path, 0, info.size))
+
+    # 发送响应，返回发送的正文字节数
+    async def _send(self, writer, request, response, keep_alive):
+        headers = dict(response.headers)
+        length = response.file[2] if response.file is not None else len(response.body)
+        if response.status == 304:
+            length = None
+        else:
+            headers['Content-Length'] = str(length)
+        headers['Date'] = http_date(None)
+        headers['Server'] = 'report-server'
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        if keep_alive:
+            headers['Keep-Alive'] = f'timeout={int(KEEPALIVE_TIMEOUT)}, max={KEEPALIVE_MAX_REQUESTS}'
+
+        version = request.version if request is not None else 'HTTP/1.1'
+        head = [f"{version} {response.status} {REASONS.get(response.status, 'Unknown')}"]
+        head += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+
+        if length is None or (request is not None and request.method == 'HEAD'):
+            await writer.drain()
+            return 0
+        if response.file is None:
+            writer.write(response.body)
+            await writer.drain()
+            return length
+
+        await writer.drain()
+        path, offset, count = response.file
+        with open(path, 'rb') as f:
+            if count:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+        return count
+
+# HTTPS上下文
+def create_ssl_context(certfile, keyfile=None):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+# 本机局域网IP（便于在手机上输入地址）
+def lan_address():
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('10.255.255.255', 1))
+            return s.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='局域网报告服务器')
+    parser.add_argument('root', nargs='?', default='.', help='报告所在目录（默认当前目录）')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--certfile', default=None, help='HTTPS证书（PEM）路径')
+    parser.add_argument('--keyfile', default=None, help='HTTPS私钥（PEM）路径（证书文件中已包含时可省略）')
+    args = parser.parse_args(argv)
+
+    ssl_context = create_ssl_context(args.certfile, args.keyfile) if args.certfile else None
+    server = ReportServer(args.root, args.host, args.port, ssl_context)
+    scheme = 'https' if ssl_context else 'http'
+
+    async def run():
+        await server.start()
+        print(f"报告服务器已启动: {server.root}")
+        print(f"  本机访问: {scheme}://127.0.0.1:{server.port}/report.html")
+        print(f"  局域网访问: {scheme}://{lan_address()}:{server.port}/report.html")
+        print(f"  统计信息: {scheme}://127.0.0.1:{server.port}/metrics")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n已停止")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""流式读取检测结果：逐条读取多病例 JSONL 和大型 JSON 文件并校验格式
+
+检测流水线每晚输出数万名患者的 JSONL（每行一份result），偶尔也有几百MB的单个JSON文件
+（result数组）。本模块逐条解析并产出记录，内存占用与文件大小无关：
+  - .jsonl / .ndjson（可为 .gz）按行读取；
+  - 其他文件按块读取，依次解码顶层数组中的元素（或首尾相接的多个JSON值）。
+每条记录按 diseased_teeth / diseases / bbox 的格式校验，不合格的记录报告位置后跳过（或抛出）。
+
+安装了 orjson（pip install orjson）时用它解析 JSONL 的每一行和单份 result.json，否则使用标准库 json。
+大型JSON文件的元素边界要在解码过程中确定，orjson 不支持从缓冲区中间解码一个值，
+因此这类文件始终使用标准库的 raw_decode，安装 orjson 后速度不变；需要加速时先转换为 JSONL。
+
+用法示例：
+    from result_stream import iter_results
+    for record in iter_results('dump.jsonl.gz'):
+        print(record.record_id, len(record.data['diseased_teeth']))
+"""
+
+import gzip
+import json
+import math
+import re
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库
+    orjson = None
+
+# 按行读取的文件扩展名（可再带 .gz）
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+# 大型JSON文件每次读取的字符数
+CHUNK_SIZE = 1024 * 1024
+
+# 解码失败的位置距缓冲区末尾不超过该字符数时，视为元素被块边界截断（否则为语法错误）
+TRUNCATION_MARGIN = 16
+
+# 记录中作为报告ID的字段（依次查找）
+ID_FIELDS = ('report_id', 'patient_id', 'id')
+
+# 牙位编号：FDI两位数，象限1~8、牙位1~8
+FDI_PATTERN = re.compile(r'[1-8][1-8]')
+
+# 报告ID中允许的字符，其余替换为下划线
+UNSAFE_ID_CHARS = re.compile(r'[^\w.-]')
+
+# 当前使用的JSON后端
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+class ResultSchemaError(ValueError):
+    """result 格式不符合要求；message 中包含出错字段的位置"""
+
+# 解析JSON
+def loads(data):
+    """解析JSON文本或字节串（安装了orjson时使用orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# 数值类型（不含bool）
+_NUMBER_TYPES = (int, float)
+
+# 是否为 [x1, y1, x2, y2]
+def _is_box(box):
+    if type(box) is not list or len(box) != 4:
+        return False
+    x1, y1, x2, y2 = box
+    for v in box:
+        if type(v) not in _NUMBER_TYPES or not math.isfinite(v):
+            return False
+    return x2 >= x1 and y2 >= y1
+
+# 疾病记录的错误
+def _disease_error(disease):
+    if type(disease) is not dict:
+        return '应为JSON对象'
+    if type(disease.get('label')) is not str:
+        return '.label: 应为字符串'
+    confidence = disease.get('confidence')
+    if confidence is not None and not (type(confidence) in _NUMBER_TYPES and 0 <= confidence <= 1):
+        return '.confidence: 应为0~1之间的数'
+    bbox = disease.get('bbox')
+    if bbox is not None and not _is_box(bbox):
+        return '.bbox: 应为4个数字 [x1, y1, x2, y2]，且右下角不小于左上角'
+    return None
+
+# 牙齿记录的错误
+def _tooth_error(tooth):
+    if type(tooth) is not dict:
+        return '应为JSON对象'
+    fdi = tooth.get('tooth_fdi')
+    if type(fdi) not in (int, str) or not FDI_PATTERN.fullmatch(str(fdi)):
+        return '.tooth_fdi: 应为FDI牙位编号（如 11、48）'
+    for key in ('square_bbox', 'tooth_bbox'):
+        box = tooth.get(key)
+        if box is not None and not _is_box(box):
+            return f'.{key}: 应为4个数字 [x1, y1, x2, y2]，且右下角不小于左上角'
+    crop_path = tooth.get('square_crop_path')
+    if crop_path is not None and type(crop_path) is not str:
+        return '.square_crop_path: 应为字符串'
+    if type(tooth.get('diseases', [])) is not list:
+        return '.diseases: 应为列表'
+    return None
+
+# 校验一份result
+def validate_result(data):
+    """校验result的结构，不合格时抛出 ResultSchemaError，合格时返回（整数牙位编号已改为字符串）
+
+    diseased_teeth 为列表；每颗牙的 tooth_fdi 为FDI两位数牙位编号，diseases 为列表；
+    每个疾病的 label 为字符串，confidence（可选）为0~1之间的数，bbox（可选）为4个数字；
+    square_bbox、tooth_bbox（可选）同为4个数字。出错位置只在出错时拼接。
+    """
+    if type(data) is not dict:
+        raise ResultSchemaError('result 应为JSON对象')
+    teeth = data.get('diseased_teeth', [])
+    if type(teeth) is not list:
+        raise ResultSchemaError('diseased_teeth: 应为列表')
+    for i, tooth in enumerate(teeth):
+        error = _tooth_error(tooth)
+        if error is not None:
+            raise ResultSchemaError(f"diseased_teeth[{i}]{error if error.startswith('.') else ': ' + error}")
+        if type(tooth['tooth_fdi']) is int:
+            tooth['tooth_fdi'] = str(tooth['tooth_fdi'])
+        for j, disease in enumerate(tooth.get('diseases', ())):
+            error = _disease_error(disease)
+            if error is not None:
+                where = f'diseased_teeth[{i}].diseases[{j}]'
+                raise ResultSchemaError(f"{where}{error if error.startswith('.') else ': ' + error}")
+    return data
+
+class ResultRecord:
+    """流中的一条记录：来源位置、报告ID和已校验的result数据"""
+    __slots__ = ('source', 'position', 'record_id', 'data')
+
+    def __init__(self, source, position, record_id, data):
+        self.source = source
+        self.position = position
+        self.record_id = record_id
+        self.data = data
+
+class InvalidRecord:
+    """流中不合格的一条记录"""
+    __slots__ = ('source', 'position', 'error')
+
+    def __init__(self, source, position, error):
+        self.source = source
+        self.position = position
+        self.error = error
+
+    def __str__(self):
+        return f'{self.source}:{self.position}: {self.error}'
+
+# 打开文本文件（.gz 自动解压）
+def open_text(path):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+# 是否按行读取
+def is_jsonl(path):
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] in JSONL_EXTENSIONS
+
+# 是否为可读取的数据文件
+def is_data_file(path):
+    """JSONL/NDJSON 或 JSON 文件（均可再带 .gz）"""
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] in JSONL_EXTENSIONS + ('.json',)
+
+# 逐行读取JSONL
+def iter_jsonl_values(f):
+    """产出 (行号, 值)；空行跳过，无法解析的行产出 (行号, ValueError)"""
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+# 按块解码大型JSON
+def iter_json_values(f, chunk_size=CHUNK_SIZE):
+    """产出 (序号, 值)：顶层为数组时依次产出数组元素，否则依次产出首尾相接的各个顶层值
+
+    每次只保留尚未解码的部分；单个元素超过缓冲区时继续读取，直到能完整解码。
+    遇到语法错误时抛出 ValueError（数组中出错后无法定位下一个元素）。
+    始终使用标准库 json 解码（见模块说明），不使用 orjson。
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+    # 数组中上一个元素之后是否还需要逗号
+    need_separator = False
+    index = 0
+    # 上次解码失败时缓冲区的长度，读入同样多的新内容后再重试，避免对大元素反复从头解码
+    retry_at = 0
+
+    while True:
+        # 跳过空白和数组分隔符
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = chunk, 0, not chunk
+        if pos >= len(buffer):
+            if in_array:
+                raise ValueError('JSON数组未结束')
+            return
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array:
+            if buffer[pos] == ']' and (need_separator or index == 0):
+                return
+            if need_separator:
+                if buffer[pos] != ',':
+                    raise ValueError(f'JSON数组第 {index} 个元素之后缺少逗号')
+                pos += 1
+                need_separator = False
+                continue
+
+        remaining = len(buffer) - pos
+        if not eof and remaining < retry_at:
+            chunk = f.read(max(chunk_size, retry_at - remaining))
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            # 未结束的字符串报告的是字符串起始位置，其余截断都在缓冲区末尾附近
+            truncated = e.pos >= len(buffer) - TRUNCATION_MARGIN or e.msg.startswith('Unterminated string')
+            if eof or not truncated:
+                raise
+            # 元素不完整：至少读入与未解码部分同样多的内容后再试
+            retry_at = remaining * 2
+            continue
+        # 顶层数字可能在块边界处被截断（如 "-7" 后面还有 ".5e3"），确认其后有足够的内容；其他值以括号或引号结束
+        if not eof and (end == len(buffer) or (isinstance(value, (int, float))
+                                               and len(buffer) - end < TRUNCATION_MARGIN)):
+            retry_at = remaining + TRUNCATION_MARGIN
+            continue
+        retry_at = 0
+        yield index, value
+        index += 1
+        need_separator = bool(in_array)
+        pos = end
+        if pos > chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+# 记录的报告ID
+def record_id_for(data, source, position):
+    """取记录中的 report_id / patient_id / id 字段，没有时为 <文件名>-<位置>；只保留文件名安全的字符"""
+    for field in ID_FIELDS:
+        value = data.get(field)
+        if value not in (None, ''):
+            record_id = UNSAFE_ID_CHARS.sub('_', str(value)).lstrip('.')
+            if record_id:
+                return record_id
+    return f"{Path(source).name.split('.')[0]}-{position:06d}"
+
+# 逐条读取并校验
+def iter_records(path, validate=True):
+    """产出 ResultRecord，不合格的记录产出 InvalidRecord（位置为行号或数组序号）"""
+    path = Path(path)
+    position = 0
+    with open_text(path) as f:
+        values = iter_jsonl_values(f) if is_jsonl(path) else iter_json_values(f)
+        try:
+            for position, value in values:
+                if isinstance(value, Exception):
+                    yield InvalidRecord(path, position, f'JSON解析失败: {value}')
+                    continue
+                try:
+                    data = validate_result(value) if validate else value
+                except ResultSchemaError as e:
+                    yield InvalidRecord(path, position, e)
+                    continue
+                yield ResultRecord(path, position, record_id_for(data, path, position), data)
+        except ValueError as e:
+            # 整体解码的文件出现语法错误后无法继续，报告后停止读取该文件
+            yield InvalidRecord(path, position, f'JSON解析失败，停止读取该文件: {e}')
+
+# 逐条读取合格的记录
+def iter_results(paths, on_invalid=None):
+    """依次读取一个或多个文件，产出合格的 ResultRecord
+
+    on_invalid 为None时遇到不合格的记录抛出 ResultSchemaError，否则以 InvalidRecord 调用它后继续。
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    for path in paths:
+        for record in iter_records(path):
+            if isinstance(record, InvalidRecord):
+                if on_invalid is None:
+                    raise ResultSchemaError(str(record))
+                on_invalid(record)
+                continue
+            yield record
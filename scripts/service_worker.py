@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""为 report.html 生成离线缓存用的 Service Worker（sw.js）
+
+预缓存清单由页面实际引用的文件生成：
+  - 报告页面本身，以及页面中静态引用的图片、样式（src/href/srcset，不含页面脚本中拼出的地址）；
+  - 页面读取的数据文件：stamp_report.py 写入的带哈希文件名，未写入时为 result.json / view_model.json，
+    以及 derivatives.json；
+  - result 引用的总览图和牙齿图片，及其衍生图；
+  - 牙齿分布图按各牙状态使用的 images/Processed image/<编号>/{normal,single,multiple}.png；
+    页面写入了精灵图坐标（sprite_atlas.py）时只缓存精灵图。
+每个条目带内容哈希（revision）。首次访问时缓存全部条目，之后文件名带哈希的文件直接从缓存加载，
+报告页面、result.json 等其余文件先从网络取得最新内容，离开诊所局域网后回退到缓存离线查看。任一文件变化后 sw.js 随之变化，浏览器安装新版本时只重新
+下载变化的文件。
+
+Service Worker 只在 HTTPS 或 localhost 下可用，通过局域网IP访问时需要使用
+report_server.py 的 --certfile/--keyfile 启用HTTPS。
+
+用法示例：
+    python stamp_report.py ../report.html ../result.json   # 可选，先写入带哈希的数据文件名
+    python service_worker.py ../report.html ../result.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from image_derivatives import MANIFEST_NAME, file_sha256, load_manifest, referenced_images
+from linked_assets import HASH_LENGTH
+from report_renderer import load_result_json
+from sprite_atlas import CHART_IMAGE_DIR, read_atlas
+from stamp_report import DATA_FILES_PATTERN
+from view_model import SIMPLE_TO_FDI, VIEW_MODEL_NAME, build_view_model
+
+# 输出文件名（位于报告页面旁，作用域为页面所在目录）
+SERVICE_WORKER_NAME = 'sw.js'
+
+# 缓存名前缀，激活新版本时删除同前缀的旧缓存
+CACHE_PREFIX = 'report-precache-'
+
+# 页面中静态引用本地文件的属性
+REFERENCE_PATTERN = re.compile(r'''\b(?:src|href|srcset)\s*=\s*["']([^"']+)["']''')
+
+# 恒牙FDI编号
+PERMANENT_FDI = [f'{q}{n}' for q in (1, 2, 3, 4) for n in range(1, 9)]
+
+# Service Worker 脚本模板
+SERVICE_WORKER_TEMPLATE = '''// 由 scripts/service_worker.py 生成，请勿手工修改
+const CACHE_PREFIX = '%(cache_prefix)s';
+const CACHE_NAME = '%(cache_name)s';
+const PRECACHE_MANIFEST = %(manifest)s;
+// 文件名带内容哈希的文件内容不会变化，直接从缓存返回
+const FINGERPRINT_PATTERN = /(?:^|\\.)[0-9a-f]{%(hash_length)d}[.-]/;
+
+// 地址 -> 缓存键（带revision参数，内容未变的文件在新版本中直接复用）
+const PRECACHE_KEYS = new Map(PRECACHE_MANIFEST.map(entry => {
+  const url = new URL(entry.url, self.location).href;
+  return [url, `${url}${url.includes('?') ? '&' : '?'}__rev=${entry.revision}`];
+}));
+
+self.addEventListener('install', event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE_NAME);
+    await Promise.all(Array.from(PRECACHE_KEYS, async ([url, key]) => {
+      const cached = await caches.match(key);
+      if (cached) {
+        await cache.put(key, cached);
+        return;
+      }
+      const response = await fetch(url, { cache: 'no-cache' });
+      if (!response.ok) throw new Error(`${url}: HTTP ${response.status}`);
+      await cache.put(key, response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    const names = await caches.keys();
+    await Promise.all(names
+      .filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+      .map(name => caches.delete(name)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', event => {
+  if (event.request.method !== 'GET') return;
+  const url = new URL(event.request.url);
+  url.hash = '';
+  const key = PRECACHE_KEYS.get(url.href);
+  if (!key) return;
+  event.respondWith((async () => {
+    const cache = await caches.open(CACHE_NAME);
+    if (FINGERPRINT_PATTERN.test(url.pathname.split('/').pop())) {
+      return (await cache.match(key)) || fetch(event.request);
+    }
+    // 页面、result.json 等不带哈希的文件优先从网络取得最新内容，离线时使用缓存
+    try {
+      const response = await fetch(event.request, { cache: 'no-cache' });
+      if (response.ok) await cache.put(key, response.clone());
+      return response;
+    } catch (error) {
+      const cached = await cache.match(key);
+      if (cached) return cached;
+      throw error;
+    }
+  })());
+});
+'''
+
+# 是否为页面目录下的本地地址
+def _is_local(url):
+    return not (url.startswith(('#', '/', 'data:', 'blob:', 'mailto:', 'javascript:')) or '://' in url)
+
+# 页面中静态引用的本地文件
+def page_references(html):
+    """返回页面中 src/href/srcset 引用的本地地址（忽略脚本模板中拼接的地址）"""
+    urls = []
+    for value in REFERENCE_PATTERN.findall(html):
+        if '${' in value:
+            continue
+        for candidate in value.split(','):
+            url = candidate.strip().split(' ')[0]
+            if url and _is_local(url):
+                urls.append(url)
+    return urls
+
+# 牙齿分布图使用的图片
+def chart_images(result_data, html=''):
+    """按页面的规则（无问题/单个问题/多个问题，其余象限镜像使用1象限的图片）返回用到的图片
+
+    页面写入了精灵图坐标时只返回精灵图。路径相对于页面所在目录。
+    """
+    atlas = read_atlas(html)
+    if atlas:
+        return [atlas['image']]
+    teeth = build_view_model(result_data)['teeth']
+    fdi_to_simple = {fdi: simple for simple, fdi in SIMPLE_TO_FDI.items()}
+    paths = []
+    for fdi in PERMANENT_FDI:
+        data = teeth.get(fdi) or teeth.get(fdi_to_simple.get(fdi))
+        state = 'normal' if not data else ('multiple' if data['count'] > 1 else 'single')
+        paths.append(f"{CHART_IMAGE_DIR}/1{fdi[1]}/{state}.png")
+    return list(dict.fromkeys(paths))
+
+# 页面读取的数据文件
+def data_files(html, data_dir):
+    """返回页面会请求的数据文件（相对于result所在目录）"""
+    match = DATA_FILES_PATTERN.search(html)
+    stamped = None
+    if match:
+        try:
+            stamped = json.loads(match.group(0)[len(match.group(1)):-1])
+        except ValueError:
+            stamped = None
+    if stamped:
+        files = [os.path.basename(name) for name in stamped.values() if name]
+    else:
+        files = ['result.json'] + ([VIEW_MODEL_NAME] if (data_dir / VIEW_MODEL_NAME).exists() else [])
+    if (data_dir / MANIFEST_NAME).exists():
+        files.append(MANIFEST_NAME)
+    return files
+
+# 收集预缓存地址
+def precache_urls(report_path, result_path):
+    """返回页面运行时会请求的全部本地地址（相对于页面所在目录）"""
+    report_path = Path(report_path)
+    result_path = Path(result_path)
+    data_dir = result_path.parent
+    html = report_path.read_text(encoding='utf-8')
+    result_data = load_result_json(result_path)
+
+    rel_dir = os.path.relpath(data_dir.resolve(), report_path.resolve().parent).replace(os.sep, '/')
+    prefix = '' if rel_dir == '.' else f'{rel_dir}/'
+
+    data_relative = data_files(html, data_dir)
+    data_relative += referenced_images(result_data)
+    manifest = load_manifest(data_dir / MANIFEST_NAME)
+    if manifest:
+        for image in referenced_images(result_data):
+            entry = manifest['images'].get(image)
+            if entry:
+                data_relative += [v['path'] for v in entry['variants']]
+
+    urls = [report_path.name] + page_references(html) + chart_images(result_data, html)
+    urls += [prefix + url for url in data_relative]
+    return list(dict.fromkeys(urls))
+
+# 生成预缓存清单
+def build_precache_manifest(report_path, result_path):
+    """返回 ([{'url', 'revision'}], 缺失的地址列表)"""
+    page_dir = Path(report_path).resolve().parent
+    entries = []
+    missing = []
+    for url in precache_urls(report_path, result_path):
+        path = page_dir / url
+        if not path.is_file():
+            missing.append(url)
+            continue
+        entries.append({'url': url, 'revision': file_sha256(path)[:HASH_LENGTH]})
+    return entries, missing
+
+# 写出 sw.js
+def write_service_worker(report_path, result_path, output_path=None):
+    """在报告页面旁写出 sw.js，返回 (路径, 条目数, 缺失的地址列表)；内容未变化时不重写"""
+    entries, missing = build_precache_manifest(report_path, result_path)
+    manifest = json.dumps(entries, ensure_ascii=False, indent=2)
+    cache_name = CACHE_PREFIX + hashlib.sha256(manifest.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    script = SERVICE_WORKER_TEMPLATE % {'cache_prefix': CACHE_PREFIX, 'cache_name': cache_name,
+                                        'manifest': manifest, 'hash_length': HASH_LENGTH}
+
+    output_path = Path(output_path) if output_path else Path(report_path).parent / SERVICE_WORKER_NAME
+    try:
+        unchanged = output_path.read_text(encoding='utf-8') == script
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(script)
+        os.replace(tmp_path, output_path)
+    return output_path, len(entries), missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为 report.html 生成离线缓存 Service Worker')
+    parser.add_argument('report', help='report.html 路径')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--output', default=None, help='输出路径（默认报告旁的 sw.js）')
+    args = parser.parse_args(argv)
+
+    output_path, count, missing = write_service_worker(args.report, args.result, args.output)
+    for url in missing:
+        print(f"警告: 文件不存在，未加入预缓存: {url}", file=sys.stderr)
+    print(f"Service Worker 已生成: {output_path}（预缓存 {count} 个文件）")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
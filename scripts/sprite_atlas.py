@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""把牙齿分布图用到的 images/Processed image/<编号>/{normal,single,multiple}.png 打包成一张精灵图
+
+牙齿分布图每颗牙使用一张状态图，完整的上下颌要请求二十多张小图片。本脚本把全部状态图
+缩小到显示所需的尺寸（默认最长边240像素，约为图中显示尺寸的2倍）后打包成一张精灵图，
+按内容哈希命名（images/sprites/tooth-atlas.<哈希>.png，浏览器可长期缓存），并把各状态图
+在精灵图中的坐标写入 report.html 的 TOOTH_SPRITE_ATLAS 常量。页面据此从精灵图中截取
+各牙的图片，只需一次请求；未写入坐标时仍逐张引用原图片。
+
+同目录中的 Original file.psd、Original image.* 等源文件不会打包，也不会出现在
+deploy_bundle.py 导出的发布目录中。需要 Pillow（pip install Pillow）。
+
+用法示例：
+    python sprite_atlas.py ../report.html
+    python sprite_atlas.py ../report.html --max-size 320 --format webp
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow为可选依赖，仅生成精灵图时需要
+    Image = None
+
+from linked_assets import HASH_LENGTH
+
+# 状态图目录（相对于报告页面）和状态名
+CHART_IMAGE_DIR = 'images/Processed image'
+TOOTH_STATES = ('normal', 'single', 'multiple')
+
+# 精灵图输出目录（相对于报告页面）和文件名前缀
+ATLAS_DIR = 'images/sprites'
+ATLAS_NAME = 'tooth-atlas'
+
+# 状态图最长边（像素）；分布图中每颗牙显示在约120像素的方框内
+DEFAULT_MAX_SIZE = 240
+
+# 状态图之间的间距（像素），避免缩放采样时混入相邻图片的边缘
+SPRITE_PADDING = 2
+
+# PNG调色板颜色数；状态图是纯色块的示意图，量化为256色后看不出差别，文件约为真彩色的1/5
+DEFAULT_COLORS = 256
+
+# 输出格式 -> (Pillow格式名, 扩展名, 保存参数)
+OUTPUT_FORMATS = {
+    'png': ('PNG', '.png', {'optimize': True}),
+    'webp': ('WEBP', '.webp', {'quality': 90, 'method': 6}),
+}
+
+# 页面中保存精灵图坐标的常量
+ATLAS_PATTERN = re.compile(r'^(\s*const TOOTH_SPRITE_ATLAS = ).*;$', re.MULTILINE)
+
+# 收集状态图
+def collect_sprites(chart_dir):
+    """返回 [(键 '<编号>/<状态>', 路径)]，按编号和状态排序；只收集状态图，忽略源文件"""
+    chart_dir = Path(chart_dir)
+    sprites = []
+    for tooth_dir in sorted(p for p in chart_dir.iterdir() if p.is_dir() and not p.name.startswith('.')):
+        for state in TOOTH_STATES:
+            path = tooth_dir / f'{state}.png'
+            if path.is_file():
+                sprites.append((f'{tooth_dir.name}/{state}', path))
+    return sprites
+
+# 排布精灵图
+def pack_shelves(sizes, padding=SPRITE_PADDING):
+    """按高度从大到小逐行排布，返回 (精灵图宽, 高, [(x, y)])；宽度取接近正方形的值"""
+    if not sizes:
+        return 0, 0, []
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    atlas_width = max(max(w for w, _ in sizes) + padding, math.ceil(math.sqrt(area * 1.1)))
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w + padding > atlas_width:
+            x, y = 0, y + shelf_height
+            shelf_height = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h + padding)
+    return atlas_width, y + shelf_height, positions
+
+# 生成精灵图
+def build_atlas(chart_dir, max_size=DEFAULT_MAX_SIZE, fmt='png', colors=DEFAULT_COLORS):
+    """返回 (精灵图字节串, {'width', 'height', 'sprites': {键: [x, y, 宽, 高]}})
+
+    colors 为PNG调色板颜色数（保留透明度），为0时输出真彩色。
+    """
+    if Image is None:
+        raise RuntimeError('生成精灵图需要安装 Pillow：pip install Pillow')
+    images = []
+    for key, path in collect_sprites(chart_dir):
+        with Image.open(path) as image:
+            sprite = image.convert('RGBA')
+        sprite.thumbnail((max_size, max_size), Image.LANCZOS)
+        images.append((key, sprite))
+    if not images:
+        raise ValueError(f'{chart_dir} 中没有状态图')
+
+    width, height, positions = pack_shelves([sprite.size for _, sprite in images])
+    atlas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    sprites = {}
+    for (key, sprite), (x, y) in zip(images, positions):
+        atlas.paste(sprite, (x, y))
+        sprites[key] = [x, y, sprite.width, sprite.height]
+
+    pil_format, _, options = OUTPUT_FORMATS[fmt]
+    if pil_format == 'PNG' and colors:
+        atlas = atlas.quantize(colors, method=Image.FASTOCTREE)
+    buffer = io.BytesIO()
+    atlas.save(buffer, pil_format, **options)
+    return buffer.getvalue(), {'width': width, 'height': height, 'sprites': sprites}
+
+# 写出精灵图
+def write_atlas(data, out_dir, ext):
+    """按内容哈希命名写出精灵图并删除旧版本，返回路径"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = f'{ATLAS_NAME}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+    target = out_dir / name
+    if not target.exists():
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    stale = re.compile(r'^%s\.[0-9a-f]{%d}\.(?:png|webp)$' % (re.escape(ATLAS_NAME), HASH_LENGTH))
+    for sibling in out_dir.iterdir():
+        if sibling.name != name and stale.match(sibling.name):
+            sibling.unlink()
+    return target
+
+# 读取页面中的精灵图坐标
+def read_atlas(html):
+    """返回页面 TOOTH_SPRITE_ATLAS 常量的值，未写入时返回None"""
+    match = ATLAS_PATTERN.search(html)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0)[len(match.group(1)):-1])
+    except ValueError:
+        return None
+
+# 生成精灵图并写入页面
+def stamp_atlas(report_path, chart_dir=None, out_dir=None, max_size=DEFAULT_MAX_SIZE, fmt='png',
+                colors=DEFAULT_COLORS):
+    """生成精灵图并把坐标写入report.html，返回 (写入页面的坐标信息, 精灵图字节数)"""
+    report_path = Path(report_path)
+    page_dir = report_path.resolve().parent
+    chart_dir = Path(chart_dir) if chart_dir else page_dir / CHART_IMAGE_DIR
+    out_dir = Path(out_dir) if out_dir else page_dir / ATLAS_DIR
+
+    data, atlas = build_atlas(chart_dir, max_size, fmt, colors)
+    target = write_atlas(data, out_dir, OUTPUT_FORMATS[fmt][1])
+    atlas = dict(image=os.path.relpath(target.resolve(), page_dir).replace(os.sep, '/'), **atlas)
+
+    html = report_path.read_text(encoding='utf-8')
+    if not ATLAS_PATTERN.search(html):
+        raise ValueError(f'{report_path} 中没有 TOOTH_SPRITE_ATLAS 常量')
+    value = json.dumps(atlas, ensure_ascii=False, separators=(',', ':'))
+    stamped = ATLAS_PATTERN.sub(lambda m: f"{m.group(1)}{value};", html, count=1)
+    if stamped != html:
+        tmp_path = f"{report_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(stamped)
+        os.replace(tmp_path, report_path)
+    return atlas, len(data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把牙齿分布图的状态图打包为精灵图')
+    parser.add_argument('report', help='report.html 路径')
+    parser.add_argument('--chart-dir', default=None, help=f'状态图目录（默认页面旁的 {CHART_IMAGE_DIR}）')
+    parser.add_argument('-o', '--out-dir', default=None, help=f'精灵图输出目录（默认页面旁的 {ATLAS_DIR}）')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE, help='状态图最长边（像素）')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='png', help='输出格式')
+    parser.add_argument('--colors', type=int, default=DEFAULT_COLORS, help='PNG调色板颜色数（0表示真彩色）')
+    args = parser.parse_args(argv)
+
+    atlas, size = stamp_atlas(args.report, args.chart_dir, args.out_dir, args.max_size, args.format,
+                              args.colors)
+    print(f"精灵图已生成: {atlas['image']}（{len(atlas['sprites'])} 张状态图，"
+          f"{atlas['width']}x{atlas['height']}，{size / 1024:.1f} KB）")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
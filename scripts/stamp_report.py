@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""为 report.html 读取的数据文件生成带内容哈希的副本，并把文件名写入页面
+
+report.html 在浏览器中读取 result.json（以及 view_model.json）。执行本脚本后：
+  - 在result旁写出 result.<哈希>.json、view_model.<哈希>.json（内容不变则文件名不变）；
+  - 删除旧的带哈希副本；
+  - 将页面中的 REPORT_DATA_FILES 常量改为这些文件名。
+页面随后请求带哈希的文件，浏览器和CDN可以长期缓存（report_server 对这类文件名返回
+immutable 缓存头），重复打开报告不再重新下载数据；result 更新后重新执行即可。
+未执行本脚本时，页面请求原文件并通过 ETag 校验缓存。
+
+用法示例：
+    python stamp_report.py ../report.html ../result.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from linked_assets import HASH_LENGTH
+from view_model import VIEW_MODEL_NAME
+
+# 页面中保存数据文件名的常量
+DATA_FILES_PATTERN = re.compile(r'^(\s*const REPORT_DATA_FILES = ).*;$', re.MULTILINE)
+
+# 原子写出
+def _write_bytes(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# 写出带哈希的副本
+def fingerprint_copy(path):
+    """写出 <名>.<哈希><扩展名> 并删除同名的旧副本，返回新文件名"""
+    path = Path(path)
+    data = path.read_bytes()
+    name = f"{path.stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{path.suffix}"
+    target = path.with_name(name)
+    if not target.exists():
+        _write_bytes(target, data)
+
+    stale = re.compile(r'^%s\.[0-9a-f]{%d}%s$' % (re.escape(path.stem), HASH_LENGTH, re.escape(path.suffix)))
+    for sibling in path.parent.iterdir():
+        if sibling.name != name and stale.match(sibling.name):
+            sibling.unlink()
+    return name
+
+# 更新页面中的数据文件名
+def stamp_report(report_path, result_path):
+    """生成带哈希的数据文件并写入report.html，返回 {'result': 文件名, 'viewModel': 文件名或None}"""
+    report_path = Path(report_path)
+    result_path = Path(result_path)
+    files = {'result': fingerprint_copy(result_path), 'viewModel': None}
+    view_model_path = result_path.parent / VIEW_MODEL_NAME
+    if view_model_path.exists():
+        files['viewModel'] = fingerprint_copy(view_model_path)
+
+    # 页面中的路径相对于页面所在目录
+    rel_dir = os.path.relpath(result_path.resolve().parent, report_path.resolve().parent).replace(os.sep, '/')
+    if rel_dir != '.':
+        files = {key: f"{rel_dir}/{name}" if name else None for key, name in files.items()}
+
+    html = report_path.read_text(encoding='utf-8')
+    if not DATA_FILES_PATTERN.search(html):
+        raise ValueError(f'{report_path} 中没有 REPORT_DATA_FILES 常量')
+    value = json.dumps(files, ensure_ascii=False)
+    stamped = DATA_FILES_PATTERN.sub(lambda m: f"{m.group(1)}{value};", html, count=1)
+    if stamped != html:
+        _write_bytes(report_path, stamped.encode('utf-8'))
+    return files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为 report.html 的数据文件生成带内容哈希的副本')
+    parser.add_argument('report', help='report.html 路径')
+    parser.add_argument('result', help='result.json 路径（同目录下的 view_model.json 一并处理）')
+    args = parser.parse_args(argv)
+
+    files = stamp_report(args.report, args.result)
+    print(f"数据文件: {files['result']}")
+    if files['viewModel']:
+        print(f"视图模型: {files['viewModel']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
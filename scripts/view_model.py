@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""为 report.html 预先计算视图模型（view_model.json）
+
+report.html 原本在每次打开时于浏览器端遍历 diseased_teeth，分别构建疾病分组、
+统计数字、牙齿数据映射和治疗方案映射。这里在Python端一次算好并写到 result.json
+旁边，页面直接读取；找不到或版本不符时页面回退到原来的客户端聚合。
+
+这里的名称映射与计算规则需与 report.html 中的对应函数保持一致：
+DISEASE_NAMES / FDI_TO_POSITION / SIMPLE_TO_FDI、generateCauseAnalysis()、
+updateSummaryStats()、updateToothDistributionChart()、updateTreatmentChart()。
+
+用法示例：
+    python view_model.py ../result.json
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+# 视图模型版本号，修改结构时递增（report.html 中的 VIEW_MODEL_VERSION 需同步修改）
+VIEW_MODEL_VERSION = 1
+
+# 视图模型文件名（位于result.json旁）
+VIEW_MODEL_NAME = 'view_model.json'
+
+# 疾病类型中文映射（同 report.html 的 DISEASE_NAMES）
+PAGE_DISEASE_NAMES = {
+    'tooth abrasion': '磨损',
+    'general_caries': '龋齿',
+    'twisted tooth': '扭转',
+    'crown': '全冠',
+    'tilted tooth': '倾斜',
+    'gingivitis': '牙龈炎',
+    'periodontitis': '牙周炎'
+}
+
+# FDI牙齿编号到中文位置的映射（同 report.html 的 FDI_TO_POSITION）
+FDI_TO_POSITION = {}
+for _quadrant, _side in (('1', '右上'), ('2', '左上'), ('3', '左下'), ('4', '右下')):
+    for _num, _name in enumerate(('中切牙', '侧切牙', '尖牙', '第一前磨牙', '第二前磨牙',
+                                  '第一磨牙', '第二磨牙', '第三磨牙'), start=1):
+        FDI_TO_POSITION[f'{_quadrant}{_num}'] = _side + _name
+for _quadrant, _side in (('5', '右上'), ('6', '左上'), ('7', '左下'), ('8', '右下')):
+    for _num, _name in enumerate(('乳中切牙', '乳侧切牙', '乳尖牙', '第一乳磨牙', '第二乳磨牙'), start=1):
+        FDI_TO_POSITION[f'{_quadrant}{_num}'] = _side + _name
+
+# 简化编号（1-32）到FDI的映射（同 report.html 的 SIMPLE_TO_FDI）
+SIMPLE_TO_FDI = {
+    str(i + 1): f'{quadrant}{tooth}'
+    for i, (quadrant, tooth) in enumerate((q, t) for q in (1, 2, 3, 4) for t in range(1, 9))
+}
+
+# 获取牙齿位置描述
+def tooth_position(fdi):
+    """同 report.html 的 getToothPosition()"""
+    if fdi in FDI_TO_POSITION:
+        return FDI_TO_POSITION[fdi]
+    return FDI_TO_POSITION.get(SIMPLE_TO_FDI.get(fdi, fdi), f'{fdi}号牙')
+
+# 治疗方案（同 updateTreatmentChart() 中的规则）
+def tooth_treatment(labels):
+    if 'general_caries' in labels:
+        return '根管治疗+洗牙'
+    if 'twisted tooth' in labels:
+        return '正畸+洗牙'
+    if 'tooth abrasion' in labels:
+        return '线上问诊'
+    return ''
+
+# 数字排序键（同 JS 中 sort((a, b) => a - b)）
+def _numeric_key(value):
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+# 构建视图模型
+def build_view_model(result_data, source_sha256=None):
+    """一次遍历 diseased_teeth，生成页面所需的全部分组、统计和映射"""
+    diseased_teeth = result_data.get('diseased_teeth', [])
+
+    disease_groups = {}
+    disease_count = {}
+    teeth = {}
+    treatments = {}
+    problem_teeth = []
+    total_problems = 0
+
+    for tooth in diseased_teeth:
+        fdi = tooth.get('tooth_fdi')
+        position = tooth_position(fdi)
+        image = tooth.get('square_crop_path') or None
+        labels = [d.get('label') for d in tooth.get('diseases', [])]
+        names = [PAGE_DISEASE_NAMES.get(label, label) for label in labels]
+
+        if fdi not in problem_teeth:
+            problem_teeth.append(fdi)
+        total_problems += len(labels)
+
+        for label, name in zip(labels, names):
+            # 疾病分组（generateCauseAnalysis）
+            group = disease_groups.setdefault(label, {'name': name, 'teeth': [], 'images': []})
+            if not any(t['fdi'] == fdi for t in group['teeth']):
+                group['teeth'].append({'fdi': fdi, 'position': position, 'image': image})
+            if image and image not in group['images']:
+                group['images'].append(image)
+
+            # 按疾病名称统计（updateSummaryStats）
+            count = disease_count.setdefault(name, {'count': 0, 'teeth': []})
+            count['count'] += 1
+            if fdi not in count['teeth']:
+                count['teeth'].append(fdi)
+
+        # 牙齿数据映射，同一牙齿以首条记录为准（updateToothDistributionChart）
+        if fdi not in teeth:
+            unique_names = list(dict.fromkeys(names))
+            teeth[fdi] = {'fdi': fdi, 'position': position, 'diseases': unique_names, 'count': len(unique_names)}
+
+        # 治疗方案映射，同一牙齿以末条记录为准（updateTreatmentChart）
+        treatment = tooth_treatment(labels)
+        if treatment:
+            treatments[fdi] = treatment
+
+    for count in disease_count.values():
+        count['teeth'].sort(key=_numeric_key)
+
+    return {
+        'version': VIEW_MODEL_VERSION,
+        'source_sha256': source_sha256,
+        'diseased_teeth': diseased_teeth,
+        'overview_image_path': result_data.get('overview_image_path') or result_data.get('image'),
+        'disease_groups': disease_groups,
+        'disease_count': disease_count,
+        'teeth': teeth,
+        'treatments': treatments,
+        'problem_teeth': problem_teeth,
+        'total_problems': total_problems,
+        'health_score': max(50, 100 - len(problem_teeth) * 3 - total_problems),
+    }
+
+# 读取result并在旁边写出视图模型
+def write_view_model(result_path, output_path=None):
+    """写出 view_model.json 并返回其路径"""
+    result_path = Path(result_path)
+    raw = result_path.read_bytes()
+    view_model = build_view_model(json.loads(raw.decode('utf-8')), hashlib.sha256(raw).hexdigest())
+    output_path = Path(output_path) if output_path else result_path.parent / VIEW_MODEL_NAME
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(view_model, f, ensure_ascii=False, separators=(',', ':'))
+    return output_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为 report.html 生成预计算视图模型')
+    parser.add_argument('result', help='result.json 路径')
+    parser.add_argument('-o', '--output', default=None, help='输出路径（默认 result旁的 view_model.json）')
+    args = parser.parse_args(argv)
+
+    output_path = write_view_model(args.result, args.output)
+    print(f"视图模型已生成: {output_path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""监视收件目录，检测结果写入后自动生成报告并放入发件目录
+
+常驻进程：Linux上使用inotify监视收件目录（含子目录），其他平台或inotify不可用时退回
+定时轮询。文件写入后需静默 debounce 秒、且大小和修改时间不再变化才进入队列，避免读到
+写了一半的result；同一目录下的图片继续写入也会推迟该目录的渲染。报告由常驻的进程池
+渲染（并发数有上限，不会每份报告启动一个解释器），先写到发件目录中的临时文件再原子替换。
+每份报告旁写有构建清单（见 incremental_build），重启或文件被touch时不会重复渲染。
+
+用法示例：
+    python watch_inbox.py 收件目录 发件目录
+    python watch_inbox.py 收件目录 发件目录 -j 4 --debounce 2 --poll
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import batch_generate
+from incremental_build import is_up_to_date, manifest_path_for
+from precompress import precompress_file
+
+# 默认静默时间（秒）与轮询间隔（秒）
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# inotify_event 结构体头部：wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """基于inotify的递归目录监视（通过ctypes调用libc，无需额外依赖）"""
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError('当前平台不支持inotify')
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self.root = Path(root)
+        self._dirs = {}
+        self._add_tree(self.root)
+
+    # 添加单个目录的监视
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'无法监视目录: {directory}')
+        self._dirs[wd] = Path(directory)
+
+    # 递归添加目录树，返回树中已有的文件（监视建立前可能已经写入）
+    def _add_tree(self, directory):
+        files = []
+        for current, dirnames, filenames in os.walk(directory):
+            self._add_watch(current)
+            files.extend(Path(current) / name for name in filenames)
+        return files
+
+    # 等待并返回发生变化的文件路径
+    def poll(self, timeout):
+        """最多等待timeout秒，返回变化的文件路径列表；事件队列溢出时返回整棵树的文件"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return [p for p in self.root.rglob('*') if p.is_file()]
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.extend(self._add_tree(path))
+            else:
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """定时扫描目录树，按 (mtime_ns, 大小) 判断文件变化"""
+
+    def __init__(self, root, interval=DEFAULT_POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self._seen = {}
+        self._next_scan = 0.0
+
+    # 等待并返回发生变化的文件路径
+    def poll(self, timeout):
+        delay = self._next_scan - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+            if time.monotonic() < self._next_scan:
+                return []
+        self._next_scan = time.monotonic() + self.interval
+
+        changed = []
+        seen = {}
+        for current, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = Path(current) / name
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                seen[path] = (st.st_mtime_ns, st.st_size)
+                if self._seen.get(path) != seen[path]:
+                    changed.append(path)
+        self._seen = seen
+        return changed
+
+    def close(self):
+        pass
+
+# 创建监视器
+def create_watcher(root, force_polling=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """优先使用inotify，不可用时退回轮询"""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify不可用（{e}），改用轮询", file=sys.stderr)
+    return PollingWatcher(root, poll_interval)
+
+# 在工作进程中渲染并移入发件目录
+def _render_to_outbox(result_path, output_path, precompress=False):
+    """先渲染到临时文件，再连同构建清单一起原子替换到最终位置；precompress 为True时写出 .gz/.br"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    staging_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    _, _, elapsed = batch_generate._render_one(result_path, staging_path)
+    os.replace(staging_path, output_path)
+    staging_manifest = manifest_path_for(staging_path)
+    if staging_manifest.exists():
+        os.replace(staging_manifest, manifest_path_for(output_path))
+    if precompress:
+        precompress_file(output_path)
+    return result_path, output_path, elapsed
+
+class InboxDaemon:
+    """收件目录监视与渲染调度"""
+
+    def __init__(self, inbox, outbox, pattern='result.json', workers=None, debounce=DEFAULT_DEBOUNCE,
+                 logo_dir=None, cache_dir=None, force_polling=False, poll_interval=DEFAULT_POLL_INTERVAL,
+                 instrument_options=None, precompress=False):
+        self.inbox = Path(inbox).resolve()
+        self.outbox = Path(outbox).resolve()
+        self.pattern = pattern
+        self.workers = workers or os.cpu_count() or 1
+        self.debounce = debounce
+        self.logo_dir = logo_dir
+        self.cache_dir = cache_dir if cache_dir is not None else self.outbox / batch_generate.INCREMENTAL_CACHE_DIR
+        self.force_polling = force_polling
+        self.poll_interval = poll_interval
+        self.build_options = {'merge': None, 'crop_source_width': None, 'inline_threshold': None}
+        self.instrument_options = instrument_options
+        self.precompress = precompress
+        # result路径 -> (最近一次活动时间, 上次观察到的 (mtime_ns, 大小))
+        self._pending = {}
+        # result路径 -> Future；渲染期间再次变化的result记入 _dirty，完成后重新排队
+        self._running = {}
+        self._dirty = set()
+        self._stopping = False
+
+    # 将变化的文件映射为需要渲染的result
+    def _results_for(self, path):
+        """result本身变化时返回它；同目录下其他文件（图片等）变化时返回该目录中的result"""
+        if path.name.endswith('.tmp') or self.outbox in path.parents:
+            return []
+        if fnmatch.fnmatch(path.name, self.pattern):
+            return [path]
+        try:
+            return [p for p in path.parent.iterdir() if fnmatch.fnmatch(p.name, self.pattern) and p.is_file()]
+        except OSError:
+            return []
+
+    # 记录文件活动
+    def _touch(self, paths, now):
+        for path in paths:
+            for result_path in self._results_for(Path(path)):
+                self._pending[result_path] = (now, self._signature(result_path))
+
+    # 文件签名
+    @staticmethod
+    def _signature(path):
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    # 取出已静默足够时间且不再变化的result
+    def _ready(self, now):
+        ready = []
+        for result_path, (last_activity, last_signature) in list(self._pending.items()):
+            if now - last_activity < self.debounce:
+                continue
+            signature = self._signature(result_path)
+            if signature is None:
+                del self._pending[result_path]
+            elif signature != last_signature:
+                # 静默期内大小或修改时间仍有变化，再等一个周期
+                self._pending[result_path] = (now, signature)
+            else:
+                del self._pending[result_path]
+                ready.append(result_path)
+        return ready
+
+    # 提交渲染任务
+    def _submit(self, executor, result_path):
+        if result_path in self._running:
+            self._dirty.add(result_path)
+            return
+        output_path = batch_generate.output_path_for(self.outbox, result_path.relative_to(self.inbox))
+        if is_up_to_date(output_path, self.build_options):
+            return
+        self._running[result_path] = executor.submit(_render_to_outbox, str(result_path), str(output_path),
+                                                     self.precompress)
+
+    # 收集已完成的任务
+    def _reap(self, now):
+        for result_path, future in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[result_path]
+            try:
+                _, output_path, elapsed = future.result()
+                print(f"报告已生成: {output_path}（{elapsed * 1000:.0f} ms）")
+            except Exception as e:
+                print(f"生成报告失败: {result_path}: {e}", file=sys.stderr)
+            if result_path in self._dirty:
+                self._dirty.discard(result_path)
+                self._pending[result_path] = (now, None)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    # 主循环
+    def run(self):
+        """监视收件目录直到收到SIGINT/SIGTERM；启动时先处理收件目录中已有的result"""
+        self.outbox.mkdir(parents=True, exist_ok=True)
+        watcher = create_watcher(self.inbox, self.force_polling, self.poll_interval)
+        print(f"开始监视 {self.inbox}（{type(watcher).__name__}），报告输出到 {self.outbox}")
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        initial = [p for p in self.inbox.rglob(self.pattern) if p.is_file()]
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=batch_generate._init_worker,
+                                 initargs=(self.logo_dir, self.cache_dir, None, None, self.build_options,
+                                           self.instrument_options)) as executor:
+            for result_path in initial:
+                self._submit(executor, result_path)
+            try:
+                while not self._stopping:
+                    changed = watcher.poll(min(self.debounce, 0.5) if self._pending or self._running else 1.0)
+                    now = time.monotonic()
+                    self._touch(changed, now)
+                    for result_path in self._ready(now):
+                        self._submit(executor, result_path)
+                    self._reap(now)
+            finally:
+                watcher.close()
+        print("已停止监视")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='监视收件目录并自动生成报告')
+    parser.add_argument('inbox', help='检测结果写入的收件目录')
+    parser.add_argument('outbox', help='报告输出的发件目录（不能位于收件目录内）')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='并发渲染的进程数（默认等于CPU核数）')
+    parser.add_argument('--pattern', default='result.json', help='匹配result文件的通配符')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, help='文件静默多少秒后才开始渲染')
+    parser.add_argument('--poll', action='store_true', help='强制使用轮询而不是inotify')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='轮询间隔（秒）')
+    parser.add_argument('--logo-dir', default=None, help='商标图片目录')
+    parser.add_argument('--cache-dir', default=None, help='已编码图片的磁盘缓存目录（默认位于发件目录中）')
+    parser.add_argument('--precompress', action='store_true', help='为生成的报告写出 .gz/.br 预压缩文件')
+    parser.add_argument('--metrics-log', default=None, help="每份报告的分阶段统计JSON日志路径（'-'表示标准错误）")
+    parser.add_argument('--prometheus', default=None, help='Prometheus文本格式统计文件路径（可含 {pid}，每个进程一份）')
+    args = parser.parse_args(argv)
+
+    daemon = InboxDaemon(args.inbox, args.outbox, args.pattern, args.workers, args.debounce,
+                         args.logo_dir, args.cache_dir, args.poll, args.poll_interval,
+                         (args.metrics_log, args.prometheus) if args.metrics_log or args.prometheus else None,
+                         args.precompress)
+    daemon.run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())